@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import portfolio, auth
+from app.api.v1.endpoints import portfolio, auth, dashboard
 
 api_router = APIRouter()
 
@@ -13,4 +13,10 @@ api_router.include_router(
     portfolio.router,
     prefix="/portfolios",
     tags=["portfolios"]
-) 
\ No newline at end of file
+)
+
+api_router.include_router(
+    dashboard.router,
+    prefix="/dashboard",
+    tags=["dashboard"]
+)
@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.security import (
+    verify_password, get_password_hash, create_access_token,
+    oauth2_scheme, revoke_access_token
+)
 from app.models.portfolio import User
 from app.schemas.portfolio import UserCreate, User as UserSchema
 from datetime import timedelta
@@ -14,7 +18,7 @@ router = APIRouter()
 async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     # Check if user exists
     result = await db.execute(
-        User.__table__.select().where(User.email == user.email)
+        select(User.id).where(User.email == user.email)
     )
     if result.scalar_one_or_none():
         raise HTTPException(
@@ -41,7 +45,7 @@ async def login(
 ):
     # Find user
     result = await db.execute(
-        User.__table__.select().where(User.email == form_data.username)
+        select(User).where(User.email == form_data.username)
     )
     user = result.scalar_one_or_none()
     
@@ -55,11 +59,21 @@ async def login(
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.id},
+        data={"sub": str(user.id)},
         expires_delta=access_token_expires
     )
     
     return {
         "access_token": access_token,
         "token_type": "bearer"
-    } 
\ No newline at end of file
+    }
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    """Revoke the caller's access token, on every worker"""
+    if not await revoke_access_token(db, token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
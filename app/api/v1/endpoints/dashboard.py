@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import Dict, Any
+from app.core.database import get_db
+from app.models.portfolio import Portfolio as PortfolioModel
+from app.schemas.portfolio import CURRENCY_PATTERN
+from app.api.v1.endpoints.portfolio import get_current_user_id
+from app.services.fx import FxService
+from app.services.valuation import create_valuation_service
+
+router = APIRouter()
+
+@router.get("/", response_model=Dict[str, Any])
+async def get_dashboard(
+    currency: str = Query("USD", pattern=CURRENCY_PATTERN),
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """
+    Value every portfolio of the current user at once.
+    Two queries load portfolios and holdings, and the deduplicated symbol set is
+    priced in one batched fetch, whatever the number of portfolios.
+    Amounts are reported in `currency`.
+    """
+    result = await db.execute(
+        select(PortfolioModel)
+        .options(selectinload(PortfolioModel.holdings))
+        .where(PortfolioModel.user_id == current_user_id)
+        .order_by(PortfolioModel.id)
+    )
+    portfolios = result.scalars().all()
+    
+    valuation_service = await create_valuation_service()
+    if valuation_service is None:
+        raise HTTPException(status_code=503, detail="Market data services unavailable")
+    try:
+        return await valuation_service.value_portfolios(portfolios, currency, FxService(db))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
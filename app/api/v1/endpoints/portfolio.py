@@ -1,19 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Dict, Any
-from app.core.database import get_db
+from sqlalchemy.orm import selectinload
+from pydantic import TypeAdapter
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+from datetime import date, datetime
+import json
+from app.core.database import get_db, AsyncSessionLocal
+from app.core.responses import orm_response
+from app.core.config import settings
 from app.schemas.portfolio import (
     Portfolio, PortfolioCreate, PortfolioWithHoldings,
     Holding, HoldingCreate, PlatformCredential, PlatformCredentialCreate,
-    PortfolioRead, SyncResponse
+    PortfolioRead, SyncResponse,
+    BulkHoldingsCreate, BulkTransactionsCreate, BulkWriteResponse, OptimizationRequest, BacktestRequest,
+    RiskRequest,
+    CURRENCY_PATTERN
 )
-from app.models.portfolio import Portfolio as PortfolioModel, User
+from app.models.portfolio import AssetType, Platform, Portfolio as PortfolioModel, User
 from app.models.portfolio import Holding as HoldingModel
 from app.models.portfolio import PlatformCredential as PlatformCredentialModel
 from app.core.security import decode_access_token, get_current_user
 from fastapi.security import OAuth2PasswordBearer
-from app.services.ai_insights import generate_portfolio_insights, analyze_transaction_history
+from app.services.ai_insights import (
+    analyze_transaction_history,
+    stream_portfolio_insights, stream_transaction_analysis
+)
 from app.services.portfolio_sync import PortfolioSyncService
+from app.services.returns import ReturnsService
+from app.services.portfolio_optimizer import PortfolioOptimizer
+from app.services.backtest import BacktestService
+from app.services.exposure import ExposureService
+from app.services.rolling_metrics import RollingMetricsService
+from app.services.risk import RiskService
+from app.services.bulk_writes import BulkWriteService, BulkWriteError
+from app.services.diversification import diversification_metrics, stored_correlation_structure
+from app.services.insight_cache import InsightCache, insights_cache_key, cached_portfolio_insights
+from app.services.insight_jobs import insight_job_queue
+from app.services.portfolio_version import (
+    bump_portfolio_version, portfolio_etag, portfolio_list_etag, etag_matches
+)
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -26,7 +53,7 @@ async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return payload.get("sub")
+    return int(payload["sub"])
 
 @router.post("/", response_model=Portfolio)
 async def create_portfolio(
@@ -43,26 +70,107 @@ async def create_portfolio(
     await db.refresh(db_portfolio)
     return db_portfolio
 
+def _etag_headers(etag: str) -> Dict[str, str]:
+    # Clients may keep the representation but must revalidate it every time
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_etag_headers(etag))
+
+# Adapters for the hot read endpoints, built once
+_portfolio_list_adapter = TypeAdapter(List[PortfolioRead])
+_portfolio_with_holdings_adapter = TypeAdapter(PortfolioWithHoldings)
+
 @router.get("/", response_model=List[PortfolioRead])
 async def get_portfolios(
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
 ):
     """Get all portfolios for the current user"""
+    # Unchanged lists are answered from the (id, version) index alone
+    result = await db.execute(
+        select(PortfolioModel.id, PortfolioModel.version)
+        .where(PortfolioModel.user_id == current_user_id)
+        .order_by(PortfolioModel.id)
+    )
+    etag = portfolio_list_etag(result.all())
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    
     result = await db.execute(
-        Portfolio.__table__.select().where(Portfolio.user_id == current_user.id)
+        select(PortfolioModel)
+        .options(selectinload(PortfolioModel.holdings))
+        .where(PortfolioModel.user_id == current_user_id)
+        .order_by(PortfolioModel.id)
     )
     portfolios = result.scalars().all()
-    return portfolios
+    etag = portfolio_list_etag((p.id, p.version) for p in portfolios)
+    return orm_response(_portfolio_list_adapter, portfolios, headers=_etag_headers(etag))
+
+async def _returns(db: AsyncSession, portfolios: List[PortfolioModel], start: Optional[date], end: Optional[date],
+                   include_holdings: bool, currency: str) -> Dict[str, Any]:
+    try:
+        return await ReturnsService(db).portfolio_returns(portfolios, start, end, include_holdings, currency)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Declared before /{portfolio_id} so "returns" and "exposure" are not taken for ids
+@router.get("/returns", response_model=Dict[str, Any])
+async def get_user_returns(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    currency: str = Query("USD", pattern=CURRENCY_PATTERN),
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """Time- and money-weighted returns across all of the user's portfolios, and per portfolio"""
+    result = await db.execute(
+        select(PortfolioModel)
+        .options(selectinload(PortfolioModel.holdings))
+        .where(PortfolioModel.user_id == current_user_id)
+        .order_by(PortfolioModel.id)
+    )
+    return await _returns(db, list(result.scalars().all()), start, end, False, currency)
+
+@router.get("/exposure", response_model=Dict[str, Any])
+async def get_user_exposure(
+    currency: str = Query("USD", pattern=CURRENCY_PATTERN),
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """
+    Consolidated exposure across all of the user's portfolios per symbol, asset type
+    and platform, valued at the latest stored closes, with overlapping symbols flagged
+    """
+    try:
+        return await ExposureService(db).consolidated_exposure(current_user_id, currency)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{portfolio_id}", response_model=PortfolioWithHoldings)
 async def read_portfolio(
     portfolio_id: int,
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     result = await db.execute(
-        PortfolioModel.select().where(
+        select(PortfolioModel.version).where(
+            PortfolioModel.id == portfolio_id,
+            PortfolioModel.user_id == current_user_id
+        )
+    )
+    version = result.scalar_one_or_none()
+    if version is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    if etag_matches(if_none_match, portfolio_etag(portfolio_id, version)):
+        return _not_modified(portfolio_etag(portfolio_id, version))
+    
+    result = await db.execute(
+        select(PortfolioModel)
+        .options(selectinload(PortfolioModel.holdings))
+        .where(
             PortfolioModel.id == portfolio_id,
             PortfolioModel.user_id == current_user_id
         )
@@ -70,7 +178,11 @@ async def read_portfolio(
     portfolio = result.scalar_one_or_none()
     if portfolio is None:
         raise HTTPException(status_code=404, detail="Portfolio not found")
-    return portfolio
+    return orm_response(
+        _portfolio_with_holdings_adapter,
+        portfolio,
+        headers=_etag_headers(portfolio_etag(portfolio.id, portfolio.version))
+    )
 
 @router.post("/{portfolio_id}/holdings", response_model=Holding)
 async def create_holding(
@@ -81,7 +193,7 @@ async def create_holding(
 ):
     # Verify portfolio ownership
     result = await db.execute(
-        PortfolioModel.select().where(
+        select(PortfolioModel.id).where(
             PortfolioModel.id == portfolio_id,
             PortfolioModel.user_id == current_user_id
         )
@@ -90,66 +202,126 @@ async def create_holding(
     if portfolio is None:
         raise HTTPException(status_code=404, detail="Portfolio not found")
     
-    db_holding = HoldingModel(**holding.dict())
+    db_holding = HoldingModel(
+        **holding.dict(exclude={"asset_type", "platform"}),
+        portfolio_id=portfolio_id,
+        # The columns store the model enums, not the schema's string enums
+        asset_type=AssetType(holding.asset_type.value),
+        platform=Platform(holding.platform.value)
+    )
     db.add(db_holding)
+    await bump_portfolio_version(db, portfolio_id)
     await db.commit()
     await db.refresh(db_holding)
     return db_holding
 
-@router.get("/{portfolio_id}/insights", response_model=Dict[str, Any])
-async def get_portfolio_insights(
-    portfolio_id: int,
-    db: AsyncSession = Depends(get_db),
-    current_user_id: int = Depends(get_current_user_id)
-):
-    # Verify portfolio ownership and get portfolio data
+async def _verify_portfolio_owner(db: AsyncSession, portfolio_id: int, user_id: int):
     result = await db.execute(
-        PortfolioModel.select().where(
+        select(PortfolioModel.id).where(
             PortfolioModel.id == portfolio_id,
-            PortfolioModel.user_id == current_user_id
+            PortfolioModel.user_id == user_id
         )
     )
-    portfolio = result.scalar_one_or_none()
-    if portfolio is None:
+    if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Portfolio not found")
-    
-    # Convert portfolio to dict for AI analysis
-    portfolio_data = {
-        "id": portfolio.id,
-        "name": portfolio.name,
-        "holdings": [
-            {
-                "asset_symbol": h.asset_symbol,
-                "asset_type": h.asset_type.value,
-                "quantity": h.quantity,
-                "average_price": h.average_price,
-                "platform": h.platform.value
-            }
-            for h in portfolio.holdings
-        ]
-    }
-    
-    insights = await generate_portfolio_insights(portfolio_data)
-    return insights
 
-@router.get("/{portfolio_id}/transaction-analysis", response_model=Dict[str, Any])
-async def get_transaction_analysis(
+def _check_batch_size(items: List[Any]):
+    if len(items) > settings.BULK_WRITE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batches are limited to {settings.BULK_WRITE_MAX_ITEMS} items"
+        )
+
+@router.post("/{portfolio_id}/holdings/bulk", response_model=BulkWriteResponse)
+async def create_holdings_bulk(
     portfolio_id: int,
+    batch: BulkHoldingsCreate,
     db: AsyncSession = Depends(get_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
-    # Verify portfolio ownership and get transactions
+    """
+    Create many holdings in one statement.
+    In `atomic` mode any invalid item rejects the whole batch with 422;
+    in `best_effort` mode valid items are written and failures reported per item.
+    """
+    _check_batch_size(batch.items)
+    await _verify_portfolio_owner(db, portfolio_id, current_user_id)
+    try:
+        return await BulkWriteService(db).create_holdings(portfolio_id, batch.items, batch.mode)
+    except BulkWriteError as e:
+        raise HTTPException(status_code=422, detail=e.response.model_dump())
+
+@router.post("/{portfolio_id}/transactions/bulk", response_model=BulkWriteResponse)
+async def create_transactions_bulk(
+    portfolio_id: int,
+    batch: BulkTransactionsCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """Create many transactions for holdings of this portfolio; same `mode` semantics as holdings"""
+    _check_batch_size(batch.items)
+    await _verify_portfolio_owner(db, portfolio_id, current_user_id)
+    try:
+        return await BulkWriteService(db).create_transactions(portfolio_id, batch.items, batch.mode)
+    except BulkWriteError as e:
+        raise HTTPException(status_code=422, detail=e.response.model_dump())
+
+async def _get_owned_portfolio(db: AsyncSession, portfolio_id: int, user_id: int, with_transactions: bool = False) -> PortfolioModel:
+    """The user's portfolio with holdings (and their transactions) loaded up front"""
+    holdings = selectinload(PortfolioModel.holdings)
     result = await db.execute(
-        PortfolioModel.select().where(
+        select(PortfolioModel)
+        .options(holdings.selectinload(HoldingModel.transactions) if with_transactions else holdings)
+        .where(
             PortfolioModel.id == portfolio_id,
-            PortfolioModel.user_id == current_user_id
+            PortfolioModel.user_id == user_id
         )
     )
     portfolio = result.scalar_one_or_none()
     if portfolio is None:
         raise HTTPException(status_code=404, detail="Portfolio not found")
-    
-    # Collect all transactions from all holdings
+    return portfolio
+
+async def _portfolio_insights_data(db: AsyncSession, portfolio: PortfolioModel) -> Dict[str, Any]:
+    """Convert portfolio to dict for AI analysis, valued at cost basis, with concentration and correlation metrics"""
+    holdings = [
+        {
+            "symbol": h.asset_symbol,
+            "asset_type": h.asset_type.value,
+            "quantity": h.quantity,
+            "average_price": h.average_price,
+            "platform": h.platform.value,
+            "current_value": (h.quantity or 0) * (h.average_price or 0),
+            "gain_loss_percentage": 0.0
+        }
+        for h in portfolio.holdings
+    ]
+    total_value = sum(h["current_value"] for h in holdings)
+    top_holdings = sorted(holdings, key=lambda h: h["current_value"], reverse=True)[:3]
+    weights: Dict[str, float] = {}
+    for h in holdings:
+        symbol = h["symbol"].upper()
+        weights[symbol] = weights.get(symbol, 0.0) + (h["current_value"] / total_value if total_value else 0.0)
+    structure = await stored_correlation_structure(
+        db, [h.asset_symbol.upper() for h in portfolio.holdings if h.asset_type != AssetType.CASH]
+    )
+    return {
+        "id": portfolio.id,
+        "name": portfolio.name,
+        "holdings": holdings,
+        "total_value": total_value,
+        "diversification": {
+            "number_of_holdings": len(holdings),
+            "top_holdings": [
+                {"symbol": h["symbol"], "percentage": h["current_value"] / total_value * 100 if total_value else 0.0}
+                for h in top_holdings
+            ],
+            **diversification_metrics(weights, structure)
+        }
+    }
+
+def _portfolio_transactions(portfolio: PortfolioModel) -> List[Dict[str, Any]]:
+    """Collect all transactions from all holdings"""
     transactions = []
     for holding in portfolio.holdings:
         for tx in holding.transactions:
@@ -161,10 +333,248 @@ async def get_transaction_analysis(
                 "timestamp": tx.timestamp,
                 "platform": tx.platform.value
             })
+    return transactions
+
+def _sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _sse_response(request: Request, events: AsyncIterator[Tuple[str, Any]], on_result=None) -> StreamingResponse:
+    """
+    Forward (event, data) pairs as server-sent events.
+    The upstream generator is closed as soon as the client disconnects.
+    """
+    async def stream():
+        # Flush headers immediately so the client sees the first byte without waiting on the model
+        yield _sse_event("start", {"started_at": datetime.utcnow().isoformat()})
+        try:
+            async for event, data in events:
+                if await request.is_disconnected():
+                    break
+                if event == "result" and on_result is not None:
+                    data = await on_result(data)
+                yield _sse_event(event, data)
+        except Exception as e:
+            yield _sse_event("error", {"error": str(e)})
+        finally:
+            await events.aclose()
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/{portfolio_id}/returns", response_model=Dict[str, Any])
+async def get_portfolio_returns(
+    portfolio_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    currency: Optional[str] = Query(None, pattern=CURRENCY_PATTERN),
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """
+    Time- and money-weighted returns of the portfolio and each holding.
+    The range defaults to all history and the currency to the portfolio's.
+    """
+    portfolio = await _get_owned_portfolio(db, portfolio_id, current_user_id)
+    return await _returns(db, [portfolio], start, end, True, currency or portfolio.currency)
+
+@router.post("/{portfolio_id}/optimize", response_model=Dict[str, Any])
+async def optimize_portfolio(
+    portfolio_id: int,
+    request: OptimizationRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """
+    Mean-variance optimization of the portfolio's holdings and any candidate symbols:
+    minimum-variance, max-Sharpe and target-return weights, and the efficient frontier.
+    The currency defaults to the portfolio's.
+    """
+    portfolio = await _get_owned_portfolio(db, portfolio_id, current_user_id)
+    try:
+        return await PortfolioOptimizer(db).optimize_portfolio(
+            portfolio,
+            symbols=request.symbols,
+            lookback_days=request.lookback_days,
+            min_weight=request.min_weight,
+            max_weight=request.max_weight,
+            target_return=request.target_return,
+            risk_free_rate=request.risk_free_rate,
+            frontier_points=request.frontier_points,
+            currency=request.currency or portfolio.currency
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{portfolio_id}/backtest", response_model=Dict[str, Any])
+async def backtest_portfolio(
+    portfolio_id: int,
+    request: BacktestRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """
+    Replay the portfolio's current allocation (or the given target weights) over
+    daily history with calendar or drift-threshold rebalancing and transaction
+    costs: equity curve, turnover, drawdowns and risk metrics, against buy-and-hold.
+    """
+    portfolio = await _get_owned_portfolio(db, portfolio_id, current_user_id)
+    try:
+        return await BacktestService(db).backtest_portfolio(
+            portfolio,
+            weights=request.weights,
+            frequency=request.frequency,
+            threshold=request.threshold,
+            cost_bps=request.cost_bps,
+            start=request.start,
+            end=request.end,
+            initial_value=request.initial_value,
+            risk_free_rate=request.risk_free_rate,
+            currency=request.currency or portfolio.currency
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{portfolio_id}/risk", response_model=Dict[str, Any])
+async def get_portfolio_risk(
+    portfolio_id: int,
+    request: RiskRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """
+    Historical and Monte Carlo Value at Risk and CVaR of the portfolio's current
+    holdings per horizon and confidence level. Pass the reported seed back to
+    reproduce a simulation.
+    """
+    portfolio = await _get_owned_portfolio(db, portfolio_id, current_user_id)
+    try:
+        return await RiskService(db).value_at_risk(
+            portfolio,
+            confidence_levels=request.confidence_levels,
+            horizons=request.horizons,
+            lookback_days=request.lookback_days,
+            paths=request.paths,
+            seed=request.seed,
+            currency=request.currency or portfolio.currency
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{portfolio_id}/rolling-metrics", response_model=Dict[str, Any])
+async def get_rolling_metrics(
+    portfolio_id: int,
+    window: int = Query(63, ge=5, le=756),
+    benchmark: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """
+    Rolling volatility, beta and correlation against the benchmark (SPY by default),
+    and Sharpe ratio over `window` daily bars, as chart series per non-cash holding
+    """
+    portfolio = await _get_owned_portfolio(db, portfolio_id, current_user_id)
+    symbols = [h.asset_symbol for h in portfolio.holdings if h.asset_type != AssetType.CASH]
+    series = await RollingMetricsService(db).series(symbols, window, benchmark, start, end)
+    return {
+        "portfolio_id": portfolio.id,
+        "window": window,
+        "benchmark": (benchmark or settings.ROLLING_BENCHMARK).upper(),
+        "symbols": series
+    }
+
+@router.get("/{portfolio_id}/insights", response_model=Dict[str, Any])
+async def get_portfolio_insights(
+    portfolio_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    # Verify portfolio ownership and get portfolio data
+    portfolio = await _get_owned_portfolio(db, portfolio_id, current_user_id)
+    portfolio_data = await _portfolio_insights_data(db, portfolio)
+    
+    # Serve unchanged portfolios from the shared insight cache
+    return await cached_portfolio_insights(db, portfolio_data)
+
+@router.get("/{portfolio_id}/insights/stream")
+async def stream_portfolio_insights_events(
+    portfolio_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """Server-sent events: `token` while the analysis is generated, then `result`"""
+    portfolio = await _get_owned_portfolio(db, portfolio_id, current_user_id)
+    portfolio_data = await _portfolio_insights_data(db, portfolio)
+    cache_key = insights_cache_key(portfolio_data)
+    
+    cached = await InsightCache(db).get(cache_key)
+    if cached is not None:
+        async def cached_events():
+            yield "result", {**cached, "cached": True}
+        return _sse_response(request, cached_events())
+    
+    async def store(insights: Dict[str, Any]) -> Dict[str, Any]:
+        # The request session may already be closed once streaming starts
+        async with AsyncSessionLocal() as session:
+            await InsightCache(session).set(cache_key, insights)
+        return {**insights, "cached": False}
     
-    analysis = await analyze_transaction_history(transactions)
+    return _sse_response(request, stream_portfolio_insights(portfolio_data), on_result=store)
+
+@router.post("/{portfolio_id}/insights/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_insight_job(
+    portfolio_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """
+    Queue insight generation; a pending job for the same portfolio is reused.
+    Job state lives in the process that accepted the job: with more than one
+    uvicorn worker, polling may reach another worker and get a 404.
+    """
+    portfolio = await _get_owned_portfolio(db, portfolio_id, current_user_id)
+    job = insight_job_queue.submit(portfolio_id, current_user_id, await _portfolio_insights_data(db, portfolio))
+    return job.to_dict()
+
+@router.get("/{portfolio_id}/insights/jobs/{job_id}")
+async def get_insight_job(
+    portfolio_id: int,
+    job_id: str,
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """Status of a job, and its result once finished; 404 on a worker other than the one that accepted it"""
+    job = insight_job_queue.get(job_id)
+    if job is None or job.portfolio_id != portfolio_id or job.user_id != current_user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.get("/{portfolio_id}/transaction-analysis", response_model=Dict[str, Any])
+async def get_transaction_analysis(
+    portfolio_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    # Verify portfolio ownership and get transactions
+    portfolio = await _get_owned_portfolio(db, portfolio_id, current_user_id, with_transactions=True)
+    analysis = await analyze_transaction_history(_portfolio_transactions(portfolio))
     return analysis
 
+@router.get("/{portfolio_id}/transaction-analysis/stream")
+async def stream_transaction_analysis_events(
+    portfolio_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """Server-sent events: `summary` (local aggregates), `token` while the analysis is generated, then `result`"""
+    portfolio = await _get_owned_portfolio(db, portfolio_id, current_user_id, with_transactions=True)
+    return _sse_response(request, stream_transaction_analysis(_portfolio_transactions(portfolio)))
+
 @router.post("/sync", response_model=SyncResponse)
 async def sync_portfolios(
     current_user: User = Depends(get_current_user),
@@ -8,24 +8,99 @@ class Settings(BaseSettings):
     VERSION: str = "1.0.0"
     API_V1_STR: str = "/api/v1"
     
+    # Observability
+    METRICS_ENABLED: bool = True
+    PROFILING_TOKEN: Optional[str] = None  # Admin secret for the X-Profile-Token header
+    PROFILING_SAMPLE_RATE: float = 0.0  # Fraction of requests profiled automatically
+    PROFILING_INTERVAL_SECONDS: float = 0.001
+    PROFILING_OUTPUT_DIR: str = "profiles"
+    LOOP_BLOCK_THRESHOLD_MS: Optional[int] = None  # Log the loop's stack when blocked this long
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATE: float = 1.0  # Fraction of new traces recorded; joined traces always are
+    TRACING_EXPORT_PATH: str = "traces.jsonl"
+    
     # Database
     DATABASE_URL: str
+    DATABASE_ECHO: bool = False  # Log every statement; far too noisy under load
     
     # Security
     JWT_SECRET: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    TOKEN_REVOCATION_MAX_SIZE: int = 10000  # Revoked tokens remembered singly before falling back to per-user revocation
+    TOKEN_REVOCATION_SYNC_SECONDS: float = 1  # How often each worker loads revocations made by the others
+    
+    # Bulk writes
+    BULK_WRITE_MAX_ITEMS: int = 5000
     
-    # External APIs
+    # External APIs (base URLs are overridable to point at local stand-ins)
     OPENAI_API_KEY: Optional[str] = None
+    OPENAI_BASE_URL: Optional[str] = None
+    COINGECKO_BASE_URL: str = "https://api.coingecko.com/api/v3"
+    FX_BASE_URL: str = "https://api.frankfurter.app"  # ECB reference rates
+    FX_CACHE_TTL_SECONDS: int = 3600
+    
+    # Latest-price cache
+    QUOTE_CACHE_BACKEND: str = "shared"  # shared (one table per host, across workers), local (per worker) or none
+    QUOTE_CACHE_PATH: Optional[str] = None  # Defaults to /dev/shm/portfolio-quotes; suffixed with the table layout
+    QUOTE_CACHE_SLOTS: int = 65536
+    QUOTE_CACHE_TTL_SECONDS: float = 15
+    
+    # Crypto price routing (Gemini and CoinGecko)
+    CRYPTO_PRICE_PROVIDERS: str = "coingecko,gemini"  # Preference order while providers are equally healthy
+    CRYPTO_PRICE_TIMEOUT_SECONDS: float = 10  # A provider slower than this counts as failed
+    CRYPTO_HEDGE_PERCENTILE: float = 95  # Of the provider's recent latencies, waited before hedging
+    CRYPTO_HEDGE_DEFAULT_MS: float = 500  # Until a provider has enough latency samples
+    CRYPTO_HEDGE_MIN_MS: float = 50
+    CRYPTO_HEDGE_MAX_MS: float = 2000
+    CRYPTO_LATENCY_WINDOW: int = 200  # Recent calls kept per provider
+    CRYPTO_BREAKER_FAILURES: int = 5  # Consecutive failures that open a provider's circuit
+    CRYPTO_BREAKER_COOLDOWN_SECONDS: float = 30  # Before a single trial call may close it again
+    
+    # Rolling-window metrics
+    ROLLING_BENCHMARK: str = "SPY"
+    ROLLING_HISTORY_DAYS: int = 1825  # How far back a symbol's series starts
+    ROLLING_STATE_MAX_ENTRIES: int = 10000  # In-memory window states kept for O(1) updates
+    
+    # Monte Carlo VaR
+    RISK_WORKERS: Optional[int] = None  # Simulation processes; defaults to the CPU count
+    RISK_CHUNK_PATHS: int = 10000  # Paths per task, each with its own seeded stream
+    RISK_INLINE_MAX_DRAWS: int = 2000000  # Simulations up to this many paths x assets run in a thread instead
+    
+    # Diversification
+    DIVERSIFICATION_LOOKBACK_DAYS: int = 365
+    DIVERSIFICATION_CLUSTER_CORRELATION: float = 0.7  # Holdings averaging at least this correlation form one group
+    DIVERSIFICATION_CACHE_MAX_ENTRIES: int = 1000  # Correlation structures kept per symbol set
+    
+    # AI insights cache
+    INSIGHTS_CACHE_TTL_SECONDS: int = 3600
+    INSIGHTS_CACHE_MAX_ENTRIES: int = 5000
+    INSIGHTS_WEIGHT_TOLERANCE: float = 0.01
+    INSIGHTS_VALUE_TOLERANCE: float = 0.05  # Relative change in total value that still hits the cache
+    SENTIMENT_CACHE_TTL_SECONDS: int = 1800
+    SENTIMENT_BATCH_SIZE: int = 20
+    
+    # Transaction analysis prompts
+    TRANSACTION_PROMPT_TOKEN_BUDGET: int = 3000
+    TRANSACTION_PROMPT_TAIL_SIZE: int = 50
+    TRANSACTION_MAP_REDUCE_THRESHOLD: int = 5000
+    TRANSACTION_MAP_MAX_CHUNKS: int = 8
+    
+    # Insight jobs
+    LLM_MAX_CONCURRENCY: int = 8
+    INSIGHT_JOB_WORKERS: int = 4
+    INSIGHT_JOB_RETENTION_SECONDS: int = 3600
     
     # Alpaca (for stocks/ETFs)
     ALPACA_API_KEY: Optional[str] = None
     ALPACA_SECRET_KEY: Optional[str] = None
+    ALPACA_BASE_URL: str = "https://paper-api.alpaca.markets"  # Market data URL comes from APCA_API_DATA_URL
     
     # Gemini (for crypto)
     GEMINI_API_KEY: str
     GEMINI_API_SECRET: str
+    GEMINI_BASE_URL: str = "https://api.gemini.com/v1"
     
     class Config:
         env_file = ".env"
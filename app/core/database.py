@@ -7,7 +7,7 @@ ASYNC_DATABASE_URL = settings.DATABASE_URL.replace(
     "postgresql://", "postgresql+asyncpg://", 1
 )
 
-engine = create_async_engine(ASYNC_DATABASE_URL, echo=True)
+engine = create_async_engine(ASYNC_DATABASE_URL, echo=settings.DATABASE_ECHO)
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
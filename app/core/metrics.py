@@ -0,0 +1,181 @@
+from typing import Iterator
+from contextlib import contextmanager
+from functools import lru_cache
+import asyncio
+import hashlib
+import re
+import time
+from prometheus_client import Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from app.core.tracing import span
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status",
+    ["method", "route", "status"]
+)
+PROVIDER_LATENCY = Histogram(
+    "provider_request_duration_seconds",
+    "Outbound market-data / AI provider call latency",
+    ["provider", "endpoint", "outcome"],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Database statement latency by statement fingerprint",
+    ["fingerprint"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache and result (hit/miss)",
+    ["cache", "result"]
+)
+PRICE_ROUTES = Counter(
+    "price_route_events_total",
+    "Crypto price router hedges, failovers and circuit-breaker trips by provider",
+    ["provider", "event"]
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Delay between when a periodic loop callback was due and when it ran",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+def render_metrics() -> bytes:
+    return generate_latest(REGISTRY)
+
+@contextmanager
+def track_provider(provider: str, endpoint: str) -> Iterator[None]:
+    """Time and trace an outbound provider call; works around awaits as well as blocking calls"""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        with span(f"{provider}.{endpoint}", **{"provider": provider, "provider.endpoint": endpoint}):
+            yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        PROVIDER_LATENCY.labels(provider, endpoint, outcome).observe(time.perf_counter() - start)
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc(count)
+
+def record_price_route(provider: str, event: str):
+    PRICE_ROUTES.labels(provider, event).inc()
+
+def route_template(scope) -> str:
+    """
+    Full path template of the matched route, e.g. /api/v1/portfolios/{portfolio_id}.
+    Routes from included routers may carry only their router-relative path, so the
+    prefix is recovered from the part of the request path before the route's match.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    regex = getattr(route, "path_regex", None)
+    if template is None:
+        return "unmatched"
+    path = scope.get("path", "")
+    if regex is None or regex.match(path):
+        return template
+    for i in range(len(path) - 1, 0, -1):
+        if path[i] == "/" and regex.match(path[i:]):
+            return path[:i] + template
+    return template
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency by route template (not raw path, to bound label cardinality)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(
+                scope["method"],
+                route_template(scope),
+                str(status_code)
+            ).observe(time.perf_counter() - start)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAM_LISTS = re.compile(r"\(\s*(?:\?|%\(\w+\)s|\$\d+|__\[POSTCOMPILE_\w+\])(?:\s*,\s*(?:\?|%\(\w+\)s|\$\d+))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=2048)
+def statement_fingerprint(statement: str) -> str:
+    """Normalize a SQL statement so executions differing only in literals share a label"""
+    fingerprint = _LITERALS.sub("?", statement)
+    fingerprint = _PARAM_LISTS.sub("(...)", fingerprint)
+    fingerprint = _WHITESPACE.sub(" ", fingerprint).strip()
+    if len(fingerprint) > 200:
+        # Long select lists share prefixes; keep the label readable but unique
+        fingerprint = f"{fingerprint[:180]}... #{hashlib.sha1(fingerprint.encode()).hexdigest()[:8]}"
+    return fingerprint
+
+def instrument_engine(engine):
+    """Record statement latency and expose pool usage for an AsyncEngine"""
+    from sqlalchemy import event
+
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_metrics_start", None)
+        if start is not None:
+            DB_QUERY_LATENCY.labels(statement_fingerprint(statement)).observe(time.perf_counter() - start)
+
+    REGISTRY.register(_PoolCollector(sync_engine.pool))
+
+class _PoolCollector:
+    """Reads connection pool state at scrape time"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def collect(self):
+        connections = GaugeMetricFamily("db_pool_connections", "Database pool connections by state", labels=["state"])
+        saturation = GaugeMetricFamily("db_pool_saturation", "Checked-out connections over the pool's capacity")
+        if not hasattr(self.pool, "checkedout"):
+            # e.g. NullPool / StaticPool
+            yield connections
+            yield saturation
+            return
+
+        checked_out = self.pool.checkedout()
+        connections.add_metric(["checked_out"], checked_out)
+        connections.add_metric(["checked_in"], self.pool.checkedin())
+        connections.add_metric(["overflow"], max(self.pool.overflow(), 0))
+        capacity = self.pool.size() + max(getattr(self.pool, "_max_overflow", 0), 0)
+        saturation.add_metric([], checked_out / capacity if capacity > 0 else 0)
+        yield connections
+        yield saturation
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """Sample how late the loop wakes a sleeping task; runs until cancelled"""
+    loop = asyncio.get_running_loop()
+    while True:
+        due = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - due, 0))
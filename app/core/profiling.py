@@ -0,0 +1,150 @@
+from typing import Optional
+from datetime import datetime
+import asyncio
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import traceback
+import uuid
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_TOKEN_HEADER = "x-profile-token"
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware attaching a sampling profiler (pyinstrument) to single requests.
+
+    A request is profiled when it carries `X-Profile` together with an
+    `X-Profile-Token` matching PROFILING_TOKEN, or when it is picked by
+    PROFILING_SAMPLE_RATE. Profiles are written as speedscope JSON
+    (flame-graph compatible) to PROFILING_OUTPUT_DIR and named in the
+    `X-Profile-Id` response header; `X-Profile: return` sends the profile back
+    instead of the normal response body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = self._profile_mode(scope)
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        from pyinstrument import Profiler
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        profile_id = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        response_start = {}
+        # Only this request's task is sampled; other requests on the loop are not attributed to it
+        profiler = Profiler(interval=settings.PROFILING_INTERVAL_SECONDS, async_mode="enabled")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response_start.update(message)
+                if mode == "store":
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            if mode == "store":
+                await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+
+        profile = profiler.output(SpeedscopeRenderer())
+        if mode == "store":
+            await asyncio.to_thread(self._store, profile_id, scope, profile)
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"x-profile-id", profile_id.encode()),
+                (b"x-profiled-status", str(response_start.get("status", 500)).encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": profile.encode()})
+
+    @staticmethod
+    def _profile_mode(scope) -> Optional[str]:
+        """'return', 'store' or None (not profiled)"""
+        headers = dict(scope.get("headers", []))
+        requested = headers.get(PROFILE_HEADER.encode())
+        token = headers.get(PROFILE_TOKEN_HEADER.encode())
+        if requested is not None and settings.PROFILING_TOKEN and token is not None and hmac.compare_digest(
+            token, settings.PROFILING_TOKEN.encode()
+        ):
+            return "return" if requested.strip().lower() == b"return" else "store"
+        if settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return "store"
+        return None
+
+    @staticmethod
+    def _store(profile_id: str, scope, profile: str):
+        os.makedirs(settings.PROFILING_OUTPUT_DIR, exist_ok=True)
+        route = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        path = os.path.join(settings.PROFILING_OUTPUT_DIR, f"{profile_id}-{scope['method']}-{route}.speedscope.json")
+        with open(path, "w") as f:
+            f.write(profile)
+        logger.info("Stored request profile %s", path)
+
+class LoopBlockWatchdog:
+    """
+    Logs the event loop thread's stack whenever the loop has not run a
+    heartbeat callback for longer than the threshold, i.e. something is
+    blocking it. Detection runs in a separate daemon thread.
+    """
+
+    def __init__(self, threshold_ms: int):
+        self.threshold = threshold_ms / 1000
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat()
+        self._thread = threading.Thread(target=self._watch, name="loop-block-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _beat(self):
+        self._last_beat = time.monotonic()
+        if not self._stopped.is_set():
+            self._loop.call_later(self.threshold / 2, self._beat)
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stopped.wait(self.threshold / 4):
+            beat = self._last_beat
+            blocked_for = time.monotonic() - beat
+            # One report per block: the heartbeat value identifies the stall
+            if blocked_for > self.threshold and beat != reported_beat:
+                reported_beat = beat
+                frame = sys._current_frames().get(self._loop_thread_id)
+                stack = "".join(traceback.format_stack(frame)) if frame else "<unavailable>"
+                logger.warning(
+                    "Event loop blocked for at least %.0f ms; loop thread stack:\n%s",
+                    blocked_for * 1000, stack
+                )
@@ -0,0 +1,18 @@
+from typing import Any, Dict, Optional
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (datetimes, enums and numpy values handled natively)"""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+def orm_response(adapter: TypeAdapter, rows: Any, headers: Optional[Dict[str, str]] = None) -> ORJSONResponse:
+    """
+    Validate preloaded ORM rows once and render them with orjson.
+    Returning a Response skips FastAPI's second validation pass and jsonable_encoder.
+    """
+    content = adapter.dump_python(adapter.validate_python(rows, from_attributes=True))
+    return ORJSONResponse(content, headers=headers)
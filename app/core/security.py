@@ -1,17 +1,120 @@
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import hashlib
+import threading
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.metrics import record_cache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_db
-from app.models.portfolio import User
+from app.core.database import AsyncSessionLocal, get_db
+from app.models.portfolio import RevokedToken, User
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Revocations are re-read this far back on every sync, so rows committed late
+# (or stamped by a worker whose clock lags) are still picked up
+REVOCATION_SYNC_OVERLAP = timedelta(seconds=30)
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of already-verified JWT payloads.
+    Entries are keyed by a SHA-256 digest of the token and expire at the token's `exp`.
+    Also keeps this process's copy of the revocation list consulted before a
+    token is (re)verified; RevocationSync keeps it in step with the shared table.
+    """
+
+    def __init__(self, max_size: int, max_revoked: int):
+        self.max_size = max_size
+        self.max_revoked = max_revoked
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._revoked_tokens: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()  # digest -> (exp, sub)
+        self._revoked_users: Dict[str, float] = {}  # sub -> revoked at
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, digest: str) -> Optional[dict]:
+        """Return the cached payload for a token digest, dropping it if expired"""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return payload
+
+    def put(self, digest: str, payload: dict):
+        """Cache a verified payload until its `exp`"""
+        expires_at = float(payload.get("exp", 0))
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            self._entries[digest] = (expires_at, payload)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, digest: str, payload: Optional[dict] = None) -> bool:
+        """Check the token and, when a payload is given, its subject against the revocation list"""
+        with self._lock:
+            if digest in self._revoked_tokens:
+                return True
+            if payload is None:
+                return False
+            revoked_at = self._revoked_users.get(str(payload.get("sub")))
+            return revoked_at is not None and float(payload.get("iat", 0)) <= revoked_at
+
+    def revoke(self, digest: str, payload: dict):
+        """Revoke a single verified token (e.g. on logout)"""
+        self.revoke_many([(digest, payload)])
+
+    def revoke_many(self, revocations: List[Tuple[str, dict]]):
+        """Revoke tokens by digest, given each one's payload (at least `sub` and `exp`)"""
+        now = time.time()
+        with self._lock:
+            for digest, payload in revocations:
+                self._entries.pop(digest, None)
+                self._revoked_tokens[digest] = (float(payload.get("exp", 0)), str(payload.get("sub")))
+            # Revoked tokens only need remembering until they would have expired anyway
+            for key in [k for k, (exp, _) in self._revoked_tokens.items() if exp <= now]:
+                del self._revoked_tokens[key]
+            # A subject revoked longer ago than a token lives has no tokens left to reject
+            lifetime = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+            for sub in [k for k, revoked_at in self._revoked_users.items() if revoked_at + lifetime <= now]:
+                del self._revoked_users[sub]
+            # Over the cap, the oldest revocations widen to their subject's tokens
+            # issued so far, which still rejects them in a single entry per user
+            while len(self._revoked_tokens) > self.max_revoked:
+                _, (_, sub) = self._revoked_tokens.popitem(last=False)
+                self._revoke_user(sub, now)
+
+    def _revoke_user(self, sub: str, revoked_at: float):
+        """Call with the lock held"""
+        self._revoked_users[sub] = revoked_at
+        for key in [k for k, (_, payload) in self._entries.items() if str(payload.get("sub")) == sub]:
+            del self._entries[key]
+
+    def revoke_user(self, sub: str):
+        """Revoke every token issued to a subject so far"""
+        with self._lock:
+            self._revoke_user(sub, time.time())
+
+token_cache = VerifiedTokenCache(settings.TOKEN_CACHE_MAX_SIZE, settings.TOKEN_REVOCATION_MAX_SIZE)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -27,17 +130,103 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": time.time()})
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 def decode_access_token(token: str) -> Optional[dict]:
-    """Decode and verify a JWT access token"""
+    """Decode and verify a JWT access token, reusing previously verified payloads"""
+    digest = VerifiedTokenCache.digest(token)
+    payload = token_cache.get(digest)
+    record_cache("jwt", payload is not None)
+    if payload is not None:
+        return payload
+
+    if token_cache.is_revoked(digest):
+        return None
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
         return None
+    if token_cache.is_revoked(digest, payload):
+        return None
+
+    token_cache.put(digest, payload)
+    return payload
+
+async def revoke_access_token(db: AsyncSession, token: str) -> bool:
+    """
+    Revoke a valid token so it is rejected for the rest of its lifetime; False
+    if it does not verify. This worker rejects it at once, the others from
+    their next revocation sync.
+    """
+    payload = decode_access_token(token)
+    if payload is None:
+        return False
+    digest = VerifiedTokenCache.digest(token)
+    now = datetime.utcnow()
+    await db.execute(
+        insert(RevokedToken).values(
+            token_digest=digest,
+            user_id=str(payload.get("sub")),
+            expires_at=datetime.utcfromtimestamp(float(payload.get("exp", 0))),
+            revoked_at=now
+        ).on_conflict_do_nothing(index_elements=["token_digest"])
+    )
+    # Revoked tokens only need remembering until they would have expired anyway
+    await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+    await db.commit()
+    token_cache.revoke(digest, payload)
+    return True
+
+class RevocationSync:
+    """
+    Background task that applies revocations recorded by other workers to this
+    process's token cache every TOKEN_REVOCATION_SYNC_SECONDS. The first pass
+    loads every unexpired revocation; later ones re-read the recent rows.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._synced_at: Optional[datetime] = None
+
+    def start(self):
+        """Spawn the sync task on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def sync(self):
+        """Apply the revocations recorded since the previous sync"""
+        started = datetime.utcnow()
+        query = select(RevokedToken.token_digest, RevokedToken.user_id, RevokedToken.expires_at).where(
+            RevokedToken.expires_at > started
+        )
+        if self._synced_at is not None:
+            query = query.where(RevokedToken.revoked_at >= self._synced_at - REVOCATION_SYNC_OVERLAP)
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(query.order_by(RevokedToken.revoked_at))).all()
+        token_cache.revoke_many([
+            (digest, {"sub": sub, "exp": expires_at.replace(tzinfo=timezone.utc).timestamp()})
+            for digest, sub, expires_at in rows
+            if not token_cache.is_revoked(digest)
+        ])
+        self._synced_at = started
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                print(f"Error syncing token revocations: {str(e)}")
+            await asyncio.sleep(settings.TOKEN_REVOCATION_SYNC_SECONDS)
+
+revocation_sync = RevocationSync()
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
@@ -59,7 +248,7 @@ async def get_current_user(
         raise credentials_exception
     
     result = await db.execute(
-        User.__table__.select().where(User.id == user_id)
+        select(User).where(User.id == int(user_id))
     )
     user = result.scalar_one_or_none()
     
@@ -0,0 +1,242 @@
+from typing import Any, Dict, Iterator, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import queue
+import random
+import re
+import threading
+import time
+import orjson
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+class Span:
+    """A timed operation within a trace; children point at their parent by span_id"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes", "start", "end", "status", "_start_perf")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.status = "ok"
+        self._start_perf = time.perf_counter()
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def finish(self):
+        self.end = self.start + (time.perf_counter() - self._start_perf)
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": (self.end - self.start) * 1000 if self.end is not None else None,
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+class SpanContext:
+    """Enough of a span to parent work started elsewhere (another task, a queued job)"""
+
+    __slots__ = ("trace_id", "span_id")
+
+    def __init__(self, trace_id: str, span_id: Optional[str]):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+class SpanExporter:
+    """Receives finished spans; subclass and pass to set_exporter to ship spans elsewhere"""
+
+    def export(self, span: Span):
+        raise NotImplementedError
+
+    def shutdown(self):
+        pass
+
+class JsonLinesExporter(SpanExporter):
+    """Appends one JSON object per finished span to a file, written from a background thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        self._queue.put(span.to_dict())
+
+    def shutdown(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _write(self):
+        with open(self.path, "ab") as f:
+            while True:
+                record = self._queue.get()
+                batch = [record]
+                # Drain whatever else is waiting so a burst costs one flush
+                while record is not None:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(record)
+                f.write(b"".join(orjson.dumps(r) + b"\n" for r in batch if r is not None))
+                f.flush()
+                if batch[-1] is None:
+                    return
+
+_exporter: Optional[SpanExporter] = None
+# The active span, or a SpanContext when continuing a trace started elsewhere
+_current: ContextVar[Optional[Any]] = ContextVar("current_span", default=None)
+
+def set_exporter(exporter: Optional[SpanExporter]):
+    """Install the exporter; None disables tracing"""
+    global _exporter
+    if _exporter is not None and _exporter is not exporter:
+        _exporter.shutdown()
+    _exporter = exporter
+
+def configure_tracing():
+    """Install the default JSON-lines exporter when tracing is enabled"""
+    if settings.TRACING_ENABLED and _exporter is None:
+        set_exporter(JsonLinesExporter(settings.TRACING_EXPORT_PATH))
+
+def shutdown_tracing():
+    set_exporter(None)
+
+def current_span() -> Optional[Span]:
+    active = _current.get()
+    return active if isinstance(active, Span) else None
+
+def current_context() -> Optional[SpanContext]:
+    """Capture the active trace position so work run outside this task can join it"""
+    active = _current.get()
+    if active is None:
+        return None
+    return SpanContext(active.trace_id, active.span_id)
+
+@contextmanager
+def span(name: str, parent: Optional[SpanContext] = None, root: bool = True, **attributes) -> Iterator[Optional[Span]]:
+    """
+    Trace the enclosed block as a child of the active span (or of `parent`).
+    Without either, a new sampled trace is started unless root is False.
+    Safe around awaits: tasks created inside inherit the span through contextvars.
+    """
+    parent = parent or _current.get()
+    if _exporter is None or (parent is None and (not root or random.random() >= settings.TRACING_SAMPLE_RATE)):
+        yield None
+        return
+
+    if parent is None:
+        current = Span(name, f"{random.getrandbits(128):032x}", None, attributes)
+    else:
+        current = Span(name, parent.trace_id, parent.span_id, attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        current.finish()
+        _export(current)
+
+def _export(finished: Span):
+    exporter = _exporter
+    if exporter is None:
+        return
+    try:
+        exporter.export(finished)
+    except Exception as e:
+        logger.warning("Span export failed: %s", e)
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """W3C traceparent header -> SpanContext, so callers can join their own trace"""
+    if not header:
+        return None
+    match = _TRACEPARENT.match(header.strip().lower())
+    if not match:
+        return None
+    return SpanContext(match.group(1), match.group(2))
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span for each request, named by route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        from app.core.metrics import route_template
+
+        if scope["type"] != "http" or _exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers", []))
+        traceparent = headers.get(b"traceparent")
+        parent = parse_traceparent(traceparent.decode("latin-1") if traceparent else None)
+
+        with span("http.request", parent=parent, **{"http.method": scope["method"]}) as request_span:
+            if request_span is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    request_span.set_attribute("http.status_code", message["status"])
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-trace-id", request_span.trace_id.encode())]}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                request_span.name = f"{scope['method']} {route_template(scope)}"
+
+def instrument_engine(engine):
+    """Trace every statement run through an AsyncEngine under the active span"""
+    from sqlalchemy import event
+    from app.core.metrics import statement_fingerprint
+
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        # Statements outside a traced operation (pool pings, startup DDL) are not traced
+        manager = span("db.query", root=False, **{"db.statement": statement_fingerprint(statement), "db.executemany": executemany})
+        if manager.__enter__() is not None:
+            context._trace_span = manager
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        manager = getattr(context, "_trace_span", None)
+        if manager is not None:
+            context._trace_span = None
+            manager.__exit__(None, None, None)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        context = exception_context.execution_context
+        manager = getattr(context, "_trace_span", None) if context is not None else None
+        if manager is not None:
+            context._trace_span = None
+            error = exception_context.original_exception
+            try:
+                manager.__exit__(type(error), error, None)
+            except BaseException:
+                pass
@@ -1,15 +1,27 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import Settings, settings
 from app.api.v1.api import api_router
 from app.core.database import init_db, engine, Base
+from app.core.responses import ORJSONResponse
+from app.services.insight_jobs import insight_job_queue
+from app.core.security import revocation_sync
+from app.services.risk import shutdown_risk_pool
+from app.core.metrics import (
+    MetricsMiddleware, instrument_engine, monitor_event_loop_lag,
+    render_metrics, CONTENT_TYPE
+)
+from app.core.profiling import ProfilingMiddleware, LoopBlockWatchdog
+from app.core import tracing
+import asyncio
 from sqlalchemy import text
 from datetime import datetime
 
 app = FastAPI(
     title="Portfolio Tracker API",
     description="API for tracking investment portfolios across multiple platforms",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware configuration
@@ -29,6 +41,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine)
+
+if settings.PROFILING_TOKEN or settings.PROFILING_SAMPLE_RATE > 0:
+    app.add_middleware(ProfilingMiddleware)
+
+if settings.TRACING_ENABLED:
+    app.add_middleware(tracing.TracingMiddleware)
+    tracing.instrument_engine(engine)
+
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
@@ -39,6 +62,27 @@ async def startup_event():
         await conn.run_sync(Base.metadata.create_all)
     # Initialize database connections
     await init_db()
+    tracing.configure_tracing()
+    # Start the insight job workers
+    insight_job_queue.start()
+    # Apply logouts handled by other workers
+    revocation_sync.start()
+    if settings.METRICS_ENABLED:
+        app.state.loop_lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    if settings.LOOP_BLOCK_THRESHOLD_MS:
+        app.state.loop_block_watchdog = LoopBlockWatchdog(settings.LOOP_BLOCK_THRESHOLD_MS)
+        app.state.loop_block_watchdog.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await insight_job_queue.stop()
+    await revocation_sync.stop()
+    shutdown_risk_pool()
+    if settings.METRICS_ENABLED:
+        app.state.loop_lag_monitor.cancel()
+    if settings.LOOP_BLOCK_THRESHOLD_MS:
+        app.state.loop_block_watchdog.stop()
+    tracing.shutdown_tracing()
 
 @app.get("/health")
 async def health_check():
@@ -54,6 +98,13 @@ async def health_check():
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Service unhealthy: {str(e)}")
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
 @app.get("/")
 async def root():
     return {
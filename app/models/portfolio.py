@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum
+from sqlalchemy import Boolean, Column, Integer, String, Float, Date, DateTime, ForeignKey, Enum, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -33,10 +33,15 @@ class Portfolio(Base):
     __tablename__ = "portfolios"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     name = Column(String)
     description = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped on every holding, transaction or sync write; served as the ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Reporting currency; valuation and returns default to it
+    currency = Column(String(3), nullable=False, default="USD", server_default="USD")
     
     user = relationship("User", back_populates="portfolios")
     holdings = relationship("Holding", back_populates="portfolio")
@@ -45,13 +50,18 @@ class Holding(Base):
     __tablename__ = "holdings"
 
     id = Column(Integer, primary_key=True, index=True)
-    portfolio_id = Column(Integer, ForeignKey("portfolios.id"))
+    # Every per-portfolio and per-user holdings lookup goes through this join
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id"), index=True)
     asset_symbol = Column(String, index=True)
     asset_type = Column(Enum(AssetType))
     quantity = Column(Float)
     average_price = Column(Float)
     platform = Column(Enum(Platform))
+    # Currency of average_price and transaction prices (and of the balance, for cash)
+    currency = Column(String(3), nullable=False, default="USD", server_default="USD")
     last_updated = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     portfolio = relationship("Portfolio", back_populates="holdings")
     transactions = relationship("Transaction", back_populates="holding")
@@ -81,4 +91,82 @@ class PlatformCredential(Base):
     refresh_token = Column(String, nullable=True)
     expires_at = Column(DateTime, nullable=True)
     
-    user = relationship("User", back_populates="platform_credentials") 
\ No newline at end of file
+    user = relationship("User", back_populates="platform_credentials")
+
+class InsightCacheEntry(Base):
+    __tablename__ = "insight_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, index=True)
+    payload = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)
+    last_accessed = Column(DateTime, default=datetime.utcnow, index=True)
+    hits = Column(Integer, default=0)
+
+class RevokedToken(Base):
+    """A logged-out access token, shared so every worker rejects it until it expires"""
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    token_digest = Column(String(64), unique=True, index=True)  # SHA-256 of the token
+    user_id = Column(String)  # The token's subject
+    expires_at = Column(DateTime, index=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class PriceHistory(Base):
+    __tablename__ = "price_history"
+    __table_args__ = (UniqueConstraint("symbol", "date"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String, index=True)
+    date = Column(Date)
+    close = Column(Float)
+    source = Column(String)  # alpaca, coingecko
+
+class PriceHistoryFetch(Base):
+    """Dates already asked of a provider for a symbol, so ranges it has no closes for are not fetched again"""
+    __tablename__ = "price_history_fetches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String, unique=True, index=True)
+    fetched_from = Column(Date, nullable=True)  # Union of the successfully fetched ranges
+    fetched_through = Column(Date, nullable=True)
+    attempted_at = Column(DateTime, default=datetime.utcnow)
+    failed = Column(Boolean, default=False)  # Whether the last attempt raised
+
+class HoldingValuation(Base):
+    """Cached end-of-day state of a holding; rows from a transaction's date on are dropped when it changes"""
+    __tablename__ = "holding_valuations"
+    __table_args__ = (UniqueConstraint("holding_id", "date"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    holding_id = Column(Integer, ForeignKey("holdings.id"), index=True)
+    date = Column(Date)
+    quantity = Column(Float)
+    market_value = Column(Float)
+    net_flow = Column(Float)  # Buys minus sells at transaction prices
+
+class FxRate(Base):
+    __tablename__ = "fx_rates"
+    __table_args__ = (UniqueConstraint("currency", "date"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    currency = Column(String(3), index=True)
+    date = Column(Date)
+    rate = Column(Float)  # Units of currency per US dollar
+
+class RollingMetric(Base):
+    """One point of a symbol's rolling-window statistics against a benchmark, for a window of `window_size` bars"""
+    __tablename__ = "rolling_metrics"
+    __table_args__ = (UniqueConstraint("symbol", "benchmark", "window_size", "date"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String)
+    benchmark = Column(String)
+    window_size = Column(Integer)
+    date = Column(Date)
+    volatility = Column(Float)  # Annualized
+    beta = Column(Float, nullable=True)
+    correlation = Column(Float, nullable=True)
+    sharpe = Column(Float, nullable=True)  # Annualized, against a zero rate
@@ -1,9 +1,12 @@
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional, Dict
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field
+from typing import Annotated, Any, List, Optional, Dict
+from datetime import date, datetime
 from enum import Enum
 from app.models.portfolio import AssetType, Platform
 
+# ISO 4217 code, upper case
+CURRENCY_PATTERN = r"^[A-Z]{3}$"
+
 class Platform(str, Enum):
     GEMINI = "gemini"
     FIDELITY = "fidelity"
@@ -31,6 +34,7 @@ class User(UserBase):
 class PortfolioBase(BaseModel):
     name: str
     description: Optional[str] = None
+    currency: str = Field("USD", pattern=CURRENCY_PATTERN)
 
 class PortfolioCreate(PortfolioBase):
     pass
@@ -50,9 +54,11 @@ class HoldingBase(BaseModel):
     quantity: float
     average_price: float
     platform: Platform
+    currency: str = Field("USD", pattern=CURRENCY_PATTERN)
 
 class HoldingCreate(HoldingBase):
-    portfolio_id: int
+    # The portfolio comes from the path, like the bulk endpoints
+    pass
 
 class Holding(HoldingBase):
     id: int
@@ -110,6 +116,79 @@ class PortfolioWithHoldings(Portfolio):
 class HoldingWithTransactions(Holding):
     transactions: List[Transaction]
 
+class BulkMode(str, Enum):
+    ATOMIC = "atomic"
+    BEST_EFFORT = "best_effort"
+
+class BulkHoldingsCreate(BaseModel):
+    # Items are validated one by one so best-effort writes can report per-item errors
+    items: List[Dict[str, Any]]
+    mode: BulkMode = BulkMode.ATOMIC
+
+class BulkTransactionItem(TransactionBase):
+    holding_id: int
+    timestamp: Optional[datetime] = None
+
+class BulkTransactionsCreate(BaseModel):
+    items: List[Dict[str, Any]]
+    mode: BulkMode = BulkMode.ATOMIC
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: str  # created, failed, skipped
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkWriteResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkItemResult]
+
+class OptimizationRequest(BaseModel):
+    # Candidate symbols to consider alongside the portfolio's holdings
+    symbols: List[str] = Field(default_factory=list, max_length=500)
+    lookback_days: int = Field(730, ge=60, le=3650)
+    min_weight: float = Field(0.0, ge=0.0, le=1.0)
+    max_weight: float = Field(1.0, gt=0.0, le=1.0)
+    target_return: Optional[float] = None
+    risk_free_rate: float = 0.0
+    frontier_points: int = Field(20, ge=2, le=100)
+    currency: Optional[str] = Field(None, pattern=CURRENCY_PATTERN)
+
+class RebalanceFrequency(str, Enum):
+    NEVER = "never"
+    WEEKLY = "weekly"
+    MONTHLY = "monthly"
+    QUARTERLY = "quarterly"
+    ANNUALLY = "annually"
+
+class BacktestRequest(BaseModel):
+    # Target weights by symbol, summing to 1; defaults to the portfolio's current allocation
+    weights: Optional[Dict[str, float]] = None
+    frequency: RebalanceFrequency = RebalanceFrequency.MONTHLY
+    # Also rebalance whenever a weight drifts this far from its target
+    threshold: Optional[float] = Field(None, gt=0.0, lt=1.0)
+    cost_bps: float = Field(10.0, ge=0.0, le=1000.0)
+    start: Optional[date] = None
+    end: Optional[date] = None
+    initial_value: float = Field(10_000.0, gt=0.0)
+    risk_free_rate: float = 0.0
+    currency: Optional[str] = Field(None, pattern=CURRENCY_PATTERN)
+
+class RiskRequest(BaseModel):
+    confidence_levels: List[Annotated[float, Field(ge=0.5, lt=1.0)]] = Field(
+        default_factory=lambda: [0.95, 0.99], min_length=1, max_length=10
+    )
+    # Trading days
+    horizons: List[Annotated[int, Field(ge=1, le=252)]] = Field(
+        default_factory=lambda: [1, 10], min_length=1, max_length=10
+    )
+    lookback_days: int = Field(730, ge=60, le=3650)
+    paths: int = Field(100_000, ge=1_000, le=1_000_000)
+    # Same seed, same simulated paths; a random one is chosen and reported when omitted
+    seed: Optional[int] = Field(None, ge=0)
+    currency: Optional[str] = Field(None, pattern=CURRENCY_PATTERN)
+
 class Token(BaseModel):
     access_token: str
     token_type: str
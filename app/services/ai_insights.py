@@ -1,111 +1,190 @@
 from openai import AsyncOpenAI
 from app.core.config import settings
-from typing import List, Dict, Any
+from app.core.metrics import track_provider, record_cache
+from typing import List, Dict, Any, Tuple, AsyncIterator
+import asyncio
 import json
-import openai
+import time
 from datetime import datetime, timedelta
+from app.services.transaction_summary import (
+    summarize_transactions, summarize_with_positions, estimate_tokens, format_summary, format_trade_tail
+)
 
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+
+INSIGHTS_MODEL = "gpt-4-turbo-preview"
+# Bump whenever the insights/sentiment prompts change so cached results are not reused
+INSIGHTS_PROMPT_VERSION = "3"
+
+INSIGHTS_SYSTEM_PROMPT = "You are a professional portfolio analyst providing insights."
+
+def _correlation_summary(diversification: Dict) -> str:
+    """Concentration and correlated-group lines for the prompt, when the metrics are available"""
+    if diversification.get("effective_holdings") is None:
+        return ""
+    summary = (
+        f"\n    HHI {diversification['hhi']:.3f}, "
+        f"effective number of holdings {diversification['effective_holdings']:.1f}"
+    )
+    if diversification.get("diversification_ratio") is not None:
+        summary += (
+            f", diversification ratio {diversification['diversification_ratio']:.2f}, "
+            f"effective independent groups {diversification['effective_groups']:.1f}"
+        )
+    groups = [g for g in diversification.get("correlated_groups", []) if len(g["symbols"]) > 1]
+    if groups:
+        summary += "\n    Highly correlated groups: " + "; ".join(
+            f"{', '.join(g['symbols'])} ({g['weight'] * 100:.1f}%, avg correlation {g['average_correlation']:.2f})"
+            for g in groups
+        )
+    return summary
+
+def _build_insights_prompt(portfolio_data: Dict) -> str:
+    """Render the portfolio analysis prompt"""
+    # Prepare portfolio summary
+    holdings_summary = "\n".join([
+        f"- {holding['symbol']}: ${holding['current_value']:,.2f} "
+        f"({holding['gain_loss_percentage']:.1f}% return)"
+        for holding in portfolio_data['holdings']
+    ])
+    
+    diversification = portfolio_data['diversification']
+    diversification_summary = (
+        f"Portfolio has {diversification['number_of_holdings']} holdings. "
+        f"Top holdings: " + ", ".join([
+            f"{h['symbol']} ({h['percentage']:.1f}%)"
+            for h in diversification['top_holdings']
+        ])
+    ) + _correlation_summary(diversification)
+    
+    return f"""
+    Analyze this investment portfolio and provide insights:
+    
+    Portfolio Summary:
+    Total Value: ${portfolio_data['total_value']:,.2f}
+    {holdings_summary}
+    
+    Diversification:
+    {diversification_summary}
+    
+    Please provide:
+    1. Key portfolio strengths and concerns
+    2. Diversification recommendations
+    3. Potential opportunities based on current market conditions
+    4. Risk assessment
+    5. Suggested actions for portfolio optimization
+    
+    Format the response as a structured JSON with these sections.
+    """
+
+def _insights_result(analysis: str, sentiment: Dict) -> Dict:
+    return {
+        "portfolio_analysis": analysis,
+        "market_sentiment": sentiment,
+        "generated_at": datetime.utcnow().isoformat(),
+        "next_review_recommended": (datetime.utcnow() + timedelta(days=7)).isoformat()
+    }
 
 async def generate_portfolio_insights(portfolio_data: Dict) -> Dict:
     """Generate AI-powered insights for the portfolio"""
     try:
-        # Prepare portfolio summary
-        holdings_summary = "\n".join([
-            f"- {holding['symbol']}: ${holding['current_value']:,.2f} "
-            f"({holding['gain_loss_percentage']:.1f}% return)"
-            for holding in portfolio_data['holdings']
-        ])
-        
-        diversification_summary = (
-            f"Portfolio has {portfolio_data['diversification']['number_of_holdings']} holdings. "
-            f"Top holdings: " + ", ".join([
-                f"{h['symbol']} ({h['percentage']:.1f}%)"
-                for h in portfolio_data['diversification']['top_holdings']
-            ])
-        )
-        
-        # Generate insights using OpenAI
-        prompt = f"""
-        Analyze this investment portfolio and provide insights:
-        
-        Portfolio Summary:
-        Total Value: ${portfolio_data['total_value']:,.2f}
-        {holdings_summary}
+        prompt = _build_insights_prompt(portfolio_data)
         
-        Diversification:
-        {diversification_summary}
-        
-        Please provide:
-        1. Key portfolio strengths and concerns
-        2. Diversification recommendations
-        3. Potential opportunities based on current market conditions
-        4. Risk assessment
-        5. Suggested actions for portfolio optimization
-        
-        Format the response as a structured JSON with these sections.
-        """
-        
-        response = await openai.ChatCompletion.acreate(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {"role": "system", "content": "You are a professional portfolio analyst providing insights."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1000
+        # The analysis and the market sentiment are independent, so run them concurrently
+        response, sentiment = await asyncio.gather(
+            _complete(
+                model=INSIGHTS_MODEL,
+                messages=[
+                    {"role": "system", "content": INSIGHTS_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=1000
+            ),
+            analyze_market_sentiment(portfolio_data['holdings'])
         )
         
         # Parse and structure the AI response
-        insights = response.choices[0].message.content
-        
-        # Generate market sentiment analysis
-        sentiment = await analyze_market_sentiment(portfolio_data['holdings'])
-        
-        return {
-            "portfolio_analysis": insights,
-            "market_sentiment": sentiment,
-            "generated_at": datetime.utcnow().isoformat(),
-            "next_review_recommended": (datetime.utcnow() + timedelta(days=7)).isoformat()
-        }
+        return _insights_result(response.choices[0].message.content, sentiment)
     except Exception as e:
         return {
             "error": f"Failed to generate portfolio insights: {str(e)}",
             "generated_at": datetime.utcnow().isoformat()
         }
 
-async def analyze_market_sentiment(holdings: List[Dict]) -> Dict:
-    """Analyze market sentiment for portfolio holdings"""
+async def stream_portfolio_insights(portfolio_data: Dict) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Streaming variant of generate_portfolio_insights.
+    Yields ("token", text) as the analysis is generated, then ("result", insights).
+    Closing the generator early aborts the upstream completion.
+    """
+    prompt = _build_insights_prompt(portfolio_data)
+    sentiment_task = asyncio.create_task(analyze_market_sentiment(portfolio_data['holdings']))
     try:
-        symbols = [holding['symbol'] for holding in holdings]
-        symbols_str = ", ".join(symbols)
-        
-        prompt = f"""
-        Analyze current market sentiment and trends for these stocks: {symbols_str}
-        
-        Consider:
-        1. Recent market news and events
-        2. Industry trends
-        3. Technical indicators
-        4. Market sentiment indicators
-        
-        Provide a structured analysis with sentiment scores and key factors.
-        """
-        
-        response = await openai.ChatCompletion.acreate(
-            model="gpt-4-turbo-preview",
+        analysis = []
+        async for token in _stream_completion(
+            model=INSIGHTS_MODEL,
             messages=[
-                {"role": "system", "content": "You are a market sentiment analyst."},
+                {"role": "system", "content": INSIGHTS_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
-            max_tokens=800
-        )
+            max_tokens=1000
+        ):
+            analysis.append(token)
+            yield "token", token
         
-        sentiment_analysis = response.choices[0].message.content
+        sentiment = await sentiment_task
+        yield "result", _insights_result("".join(analysis), sentiment)
+    finally:
+        sentiment_task.cancel()
+
+# Caps concurrent LLM calls per process, whether they come from requests or insight jobs
+_llm_slots = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+
+async def _complete(**kwargs):
+    """Create a chat completion once an LLM slot is free"""
+    async with _llm_slots:
+        with track_provider("openai", kwargs.get("model", "chat")):
+            return await client.chat.completions.create(**kwargs)
+
+async def _stream_completion(**kwargs) -> AsyncIterator[str]:
+    """Yield content deltas of a chat completion, closing the HTTP stream when abandoned"""
+    async with _llm_slots:
+        # Time to first token; the rest of the stream is paced by the model
+        with track_provider("openai", f"{kwargs.get('model', 'chat')}:stream"):
+            stream = await client.chat.completions.create(stream=True, **kwargs)
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+
+# Per-symbol sentiment shared by every portfolio holding the symbol: symbol -> (fetched at, sentiment)
+_sentiment_cache: Dict[str, Tuple[float, Dict]] = {}
+# Symbols currently being analyzed, so concurrent requests wait instead of asking again
+_sentiment_inflight: Dict[str, asyncio.Future] = {}
+
+async def analyze_market_sentiment(holdings: List[Dict]) -> Dict:
+    """
+    Analyze market sentiment for portfolio holdings.
+    Assembled from per-symbol results; only symbols not analyzed within
+    SENTIMENT_CACHE_TTL_SECONDS trigger LLM calls.
+    """
+    try:
+        symbols = list(dict.fromkeys(holding['symbol'] for holding in holdings))
+        sentiments, refreshed = await _get_symbol_sentiments(symbols)
+        
+        scores = [
+            s["sentiment_score"] for s in sentiments.values()
+            if isinstance(s.get("sentiment_score"), (int, float))
+        ]
         
         return {
-            "sentiment_analysis": sentiment_analysis,
+            "sentiment_analysis": sentiments,
+            "average_sentiment_score": sum(scores) / len(scores) if scores else None,
+            "refreshed_symbols": refreshed,
             "analyzed_at": datetime.utcnow().isoformat()
         }
     except Exception as e:
@@ -114,28 +193,120 @@ async def analyze_market_sentiment(holdings: List[Dict]) -> Dict:
             "analyzed_at": datetime.utcnow().isoformat()
         }
 
-async def analyze_transaction_history(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """
-    Analyze transaction history to identify patterns and provide recommendations.
+async def _get_symbol_sentiments(symbols: List[str]) -> Tuple[Dict[str, Dict], List[str]]:
+    """Return sentiment per symbol from the cache, analyzing only stale or unseen symbols"""
+    now = time.monotonic()
+    results: Dict[str, Dict] = {}
+    waiting: Dict[str, asyncio.Future] = {}
+    missing: List[str] = []
+    
+    for symbol in symbols:
+        entry = _sentiment_cache.get(symbol)
+        fresh = entry is not None and now - entry[0] < settings.SENTIMENT_CACHE_TTL_SECONDS
+        record_cache("sentiment", fresh)
+        if fresh:
+            results[symbol] = entry[1]
+        elif symbol in _sentiment_inflight:
+            waiting[symbol] = _sentiment_inflight[symbol]
+        else:
+            missing.append(symbol)
+    
+    if missing:
+        future = asyncio.get_running_loop().create_future()
+        for symbol in missing:
+            _sentiment_inflight[symbol] = future
+        try:
+            batches = [
+                missing[i:i + settings.SENTIMENT_BATCH_SIZE]
+                for i in range(0, len(missing), settings.SENTIMENT_BATCH_SIZE)
+            ]
+            fetched: Dict[str, Dict] = {}
+            for batch_result in await asyncio.gather(*[_fetch_symbol_sentiments(b) for b in batches]):
+                fetched.update(batch_result)
+            
+            fetched_at = time.monotonic()
+            for symbol, sentiment in fetched.items():
+                _sentiment_cache[symbol] = (fetched_at, sentiment)
+            _prune_sentiment_cache(fetched_at)
+            future.set_result(fetched)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Waiters re-raise it; don't warn when there are none
+            raise
+        finally:
+            for symbol in missing:
+                _sentiment_inflight.pop(symbol, None)
+            if not future.done():
+                # Cancelled (e.g. a streaming client went away): waiters fetch for themselves
+                future.cancel()
+        results.update(fetched)
+    
+    abandoned: List[str] = []
+    for symbol, pending in waiting.items():
+        try:
+            # Shielded, so cancelling this request leaves the shared future to its owner
+            fetched = await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise
+            abandoned.append(symbol)
+            continue
+        if symbol in fetched:
+            results[symbol] = fetched[symbol]
+    if abandoned:
+        retried, _ = await _get_symbol_sentiments(abandoned)
+        results.update(retried)
+    
+    return {symbol: results[symbol] for symbol in symbols if symbol in results}, missing
+
+async def _fetch_symbol_sentiments(symbols: List[str]) -> Dict[str, Dict]:
+    """Ask the LLM for sentiment on a batch of symbols, one JSON entry per symbol"""
+    prompt = f"""
+    Analyze current market sentiment and trends for these assets: {", ".join(symbols)}
+    
+    Consider:
+    1. Recent market news and events
+    2. Industry trends
+    3. Technical indicators
+    4. Market sentiment indicators
+    
+    Respond with a JSON object keyed by symbol. Each value must contain
+    "sentiment_score" (a number from -1 bearish to 1 bullish), "outlook"
+    (one sentence) and "key_factors" (a list of short strings).
     """
-    # Prepare transaction data for the prompt
-    transaction_summary = []
-    for tx in transactions:
-        summary = (
-            f"{tx['transaction_type'].upper()}: {tx['asset_symbol']} "
-            f"Quantity: {tx['quantity']}, Price: ${tx['price']:.2f}, "
-            f"Date: {tx['timestamp']}"
-        )
-        transaction_summary.append(summary)
     
-    transactions_text = "\n".join(transaction_summary)
+    response = await _complete(
+        model=INSIGHTS_MODEL,
+        messages=[
+            {"role": "system", "content": "You are a market sentiment analyst."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.7,
+        max_tokens=200 * len(symbols),
+        response_format={"type": "json_object"}
+    )
     
-    prompt = f"""Analyze the following trading history and provide insights:
+    data = json.loads(response.choices[0].message.content)
+    analyzed_at = datetime.utcnow().isoformat()
+    upper = {str(key).upper(): value for key, value in data.items()}
+    return {
+        symbol: {**upper[symbol.upper()], "analyzed_at": analyzed_at}
+        for symbol in symbols
+        if isinstance(upper.get(symbol.upper()), dict)
+    }
+
+def _prune_sentiment_cache(now: float):
+    """Drop expired per-symbol sentiment"""
+    expired = [
+        symbol for symbol, (fetched_at, _) in _sentiment_cache.items()
+        if now - fetched_at >= settings.SENTIMENT_CACHE_TTL_SECONDS
+    ]
+    for symbol in expired:
+        del _sentiment_cache[symbol]
 
-Transaction History:
-{transactions_text}
+TRANSACTION_ANALYSIS_MODEL = "gpt-4"
 
-Please provide:
+TRANSACTION_ANALYSIS_SECTIONS = """Please provide:
 1. Trading Patterns Analysis
 2. Performance Metrics
 3. Behavioral Insights
@@ -144,21 +315,139 @@ Please provide:
 
 Format the response as JSON with these sections as keys."""
 
-    response = await client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are a professional trading analyst providing transaction insights."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.7,
+TRANSACTION_SYSTEM_PROMPT = "You are a professional trading analyst providing transaction insights."
+
+async def _build_transaction_prompt(transactions: List[Dict[str, Any]], summary: Dict[str, Any]) -> Tuple[str, str]:
+    """Render the transaction analysis prompt within the token budget; returns (prompt, mode)"""
+    budget = settings.TRANSACTION_PROMPT_TOKEN_BUDGET
+    if len(transactions) > settings.TRANSACTION_MAP_REDUCE_THRESHOLD:
+        mode = "map_reduce"
+        period_notes = await _map_transaction_periods(transactions, budget)
+        context = f"Period analyses (oldest first):\n{period_notes}"
+    else:
+        mode = "single"
+        context = ""
+    
+    # Aggregates get the larger share of the budget; recent trades fill what is left
+    instructions_tokens = estimate_tokens(TRANSACTION_ANALYSIS_SECTIONS) + estimate_tokens(context)
+    remaining = max(budget - instructions_tokens, 0)
+    aggregates_text = format_summary(summary, remaining * 2 // 3)
+    tail_text = format_trade_tail(
+        transactions,
+        settings.TRANSACTION_PROMPT_TAIL_SIZE,
+        remaining - estimate_tokens(aggregates_text)
     )
     
+    prompt = f"""Analyze the following trading history and provide insights:
+
+Per-symbol aggregates (CSV):
+{aggregates_text}
+
+{context}
+
+Most recent trades:
+{tail_text}
+
+{TRANSACTION_ANALYSIS_SECTIONS}"""
+    return prompt, mode
+
+def _transaction_insights(content: str, summary: Dict[str, Any], mode: str) -> Dict[str, Any]:
     try:
-        insights = json.loads(response.choices[0].message.content)
+        insights = json.loads(content)
     except json.JSONDecodeError:
         insights = {
             "error": "Failed to parse AI response",
-            "raw_response": response.choices[0].message.content
+            "raw_response": content
         }
     
-    return insights 
\ No newline at end of file
+    if isinstance(insights, dict):
+        insights["summary"] = summary
+        insights["analysis_mode"] = mode
+    return insights
+
+async def analyze_transaction_history(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Analyze transaction history to identify patterns and provide recommendations.
+    The prompt carries locally computed per-symbol aggregates and a sampled tail of
+    recent trades within TRANSACTION_PROMPT_TOKEN_BUDGET; histories larger than
+    TRANSACTION_MAP_REDUCE_THRESHOLD are summarized per period first (map-reduce).
+    """
+    summary = summarize_transactions(transactions)
+    if not transactions:
+        return {"error": "No transactions to analyze", "summary": summary}
+    
+    prompt, mode = await _build_transaction_prompt(transactions, summary)
+    response = await _complete(
+        model=TRANSACTION_ANALYSIS_MODEL,
+        messages=[
+            {"role": "system", "content": TRANSACTION_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.7,
+    )
+    
+    return _transaction_insights(response.choices[0].message.content, summary, mode)
+
+async def stream_transaction_analysis(transactions: List[Dict[str, Any]]) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Streaming variant of analyze_transaction_history.
+    Yields ("summary", aggregates) straight away, ("token", text) while the
+    analysis is generated, then ("result", insights).
+    """
+    summary = summarize_transactions(transactions)
+    yield "summary", summary
+    if not transactions:
+        yield "result", {"error": "No transactions to analyze", "summary": summary}
+        return
+    
+    prompt, mode = await _build_transaction_prompt(transactions, summary)
+    content = []
+    async for token in _stream_completion(
+        model=TRANSACTION_ANALYSIS_MODEL,
+        messages=[
+            {"role": "system", "content": TRANSACTION_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.7,
+    ):
+        content.append(token)
+        yield "token", token
+    
+    yield "result", _transaction_insights("".join(content), summary, mode)
+
+async def _map_transaction_periods(transactions: List[Dict[str, Any]], token_budget: int) -> str:
+    """Summarize consecutive periods of a very large history concurrently and join the notes"""
+    ordered = sorted(transactions, key=lambda tx: tx["timestamp"])
+    chunk_count = min(-(-len(ordered) // settings.TRANSACTION_MAP_REDUCE_THRESHOLD), settings.TRANSACTION_MAP_MAX_CHUNKS)
+    chunk_size = -(-len(ordered) // chunk_count)
+    chunks = [ordered[i:i + chunk_size] for i in range(0, len(ordered), chunk_size)]
+    # Every note has to fit in the reduce prompt next to the overall aggregates
+    note_tokens = max(token_budget // (3 * len(chunks)), 50)
+    
+    # Aggregates are local and cheap; positions open at the end of a period carry their cost basis into the next
+    period_summaries = []
+    positions = None
+    for chunk in chunks:
+        period, positions = summarize_with_positions(chunk, positions)
+        period_summaries.append(format_summary(period, token_budget))
+    
+    async def summarize_period(period_summary: str) -> str:
+        response = await _complete(
+            model=TRANSACTION_ANALYSIS_MODEL,
+            messages=[
+                {"role": "system", "content": TRANSACTION_SYSTEM_PROMPT},
+                {"role": "user", "content": (
+                    "Summarize the trading behaviour, performance and notable patterns in this "
+                    f"period in at most {note_tokens * 3 // 4} words:\n\n{period_summary}"
+                )}
+            ],
+            temperature=0.3,
+            max_tokens=note_tokens
+        )
+        return response.choices[0].message.content.strip()
+    
+    notes = await asyncio.gather(*[summarize_period(period_summary) for period_summary in period_summaries])
+    return "\n".join(
+        f"- {chunk[0]['timestamp']} to {chunk[-1]['timestamp']}: {note}"
+        for chunk, note in zip(chunks, notes)
+    )
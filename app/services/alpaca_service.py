@@ -1,23 +1,28 @@
 from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import asyncio
 import alpaca_trade_api as tradeapi
 from app.core.config import settings
+from app.core.metrics import track_provider
+from app.services.quote_cache import cached_quotes
 
 class AlpacaService:
     def __init__(self):
         self.api = tradeapi.REST(
             key_id=settings.ALPACA_API_KEY,
             secret_key=settings.ALPACA_SECRET_KEY,
-            base_url='https://paper-api.alpaca.markets'  # Use paper trading URL for market data
+            base_url=settings.ALPACA_BASE_URL  # Paper trading URL by default
         )
     
     async def get_stock_price(self, symbol: str) -> Dict:
         """Get current stock price and basic info"""
         try:
             # Get latest trade
-            trade = self.api.get_latest_trade(symbol)
+            with track_provider("alpaca", "latest_trade"):
+                trade = self.api.get_latest_trade(symbol)
             # Get company info
-            asset = self.api.get_asset(symbol)
+            with track_provider("alpaca", "asset"):
+                asset = self.api.get_asset(symbol)
             
             return {
                 "symbol": symbol,
@@ -32,7 +37,8 @@ class AlpacaService:
     async def get_stock_bars(self, symbol: str, timeframe: str = '1D', limit: int = 30) -> List[Dict]:
         """Get historical price bars"""
         try:
-            bars = self.api.get_bars(symbol, timeframe, limit=limit)
+            with track_provider("alpaca", "bars"):
+                bars = self.api.get_bars(symbol, timeframe, limit=limit)
             return [
                 {
                     "timestamp": bar.t,
@@ -47,11 +53,24 @@ class AlpacaService:
         except Exception as e:
             raise Exception(f"Failed to fetch price bars for {symbol}: {str(e)}")
     
+    async def get_daily_closes(self, symbol: str, start: date, end: date) -> Dict[date, float]:
+        """Daily closing prices between two dates (inclusive), off the event loop"""
+        try:
+            with track_provider("alpaca", "bars"):
+                bars = await asyncio.to_thread(
+                    self.api.get_bars, symbol, "1Day", start=start.isoformat(), end=end.isoformat()
+                )
+            return {bar.t.date(): float(bar.c) for bar in bars}
+        except Exception as e:
+            raise Exception(f"Failed to fetch daily closes for {symbol}: {str(e)}")
+
     async def get_multiple_stocks(self, symbols: List[str]) -> List[Dict]:
         """Get current prices for multiple stocks"""
         try:
-            trades = self.api.get_latest_trades(symbols)
-            assets = {asset.symbol: asset for asset in self.api.list_assets()}
+            with track_provider("alpaca", "latest_trades"):
+                trades = self.api.get_latest_trades(symbols)
+            with track_provider("alpaca", "assets"):
+                assets = {asset.symbol: asset for asset in self.api.list_assets()}
             
             results = []
             for symbol in symbols:
@@ -66,6 +85,21 @@ class AlpacaService:
             return results
         except Exception as e:
             raise Exception(f"Failed to fetch multiple stock prices: {str(e)}")
+    
+    async def get_latest_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """Latest trade prices, from the quote cache shared by all workers where fresh"""
+        if not symbols:
+            return {}
+        return await cached_quotes("alpaca", symbols, self._fetch_latest_prices)
+
+    async def _fetch_latest_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """Get latest trade prices for many symbols in one request, off the event loop"""
+        try:
+            with track_provider("alpaca", "latest_trades"):
+                trades = await asyncio.to_thread(self.api.get_latest_trades, symbols)
+            return {symbol: float(trade.price) for symbol, trade in trades.items()}
+        except Exception as e:
+            raise Exception(f"Failed to fetch latest stock prices: {str(e)}")
 
 async def create_alpaca_service() -> Optional[AlpacaService]:
     """Create an Alpaca service instance"""
@@ -0,0 +1,226 @@
+from typing import Dict, List, Optional, Tuple
+from datetime import date, timedelta
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.portfolio import AssetType, Portfolio
+from app.schemas.portfolio import RebalanceFrequency
+from app.services.fx import PRICE_CURRENCY
+from app.services.price_history import PriceHistoryService, periods_per_year, shared_history
+
+# Days of drift checked per array operation between rebalances
+DRIFT_CHUNK_DAYS = 63
+# Ten years
+DEFAULT_LOOKBACK_DAYS = 3653
+# Drawdown episodes reported, deepest first
+TOP_DRAWDOWNS = 5
+# Date ordinal of 1970-01-01, the numpy datetime64 epoch
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def calendar_rebalance_days(days: np.ndarray, frequency: RebalanceFrequency) -> np.ndarray:
+    """Mask of the first trading day of each week, month, quarter or year (never the first day)"""
+    if frequency == RebalanceFrequency.NEVER:
+        return np.zeros(len(days), dtype=bool)
+    if frequency == RebalanceFrequency.WEEKLY:
+        # Ordinal 1 is a Monday
+        periods = (days - 1) // 7
+    else:
+        months = (days - _EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        periods = {
+            RebalanceFrequency.MONTHLY: months,
+            RebalanceFrequency.QUARTERLY: months // 3,
+            RebalanceFrequency.ANNUALLY: months // 12
+        }[frequency]
+    mask = np.zeros(len(days), dtype=bool)
+    mask[1:] = periods[1:] != periods[:-1]
+    return mask
+
+def _rebalance(value: float, held: np.ndarray, weights: np.ndarray, cost_rate: float) -> Tuple[float, float]:
+    """
+    Value after trading to `weights` and paying `cost_rate` on the traded amount,
+    which itself depends on that value (a fast-converging fixed point).
+    Returns (value after costs, amount traded).
+    """
+    after = value
+    for _ in range(4):
+        traded = float(np.abs(weights * after - held).sum())
+        after = value - cost_rate * traded
+    return after, traded
+
+def simulate_rebalancing(closes: np.ndarray, weights: np.ndarray, calendar: np.ndarray,
+                         threshold: Optional[float] = None, cost_rate: float = 0.0,
+                         initial_value: float = 10_000.0) -> Dict[str, np.ndarray]:
+    """
+    Daily value of a portfolio bought at `weights` on the first day and traded
+    back to them on `calendar` days, or as soon as any weight drifts more than
+    `threshold` from its target. Share counts only change on rebalance days, so
+    each stretch between them is valued as one (days x assets) array product.
+    Returns value, one-way turnover and costs per day, and the rebalance mask.
+    """
+    count = len(closes)
+    values = np.empty(count)
+    turnover = np.zeros(count)
+    costs = np.zeros(count)
+    rebalanced = np.zeros(count, dtype=bool)
+    scheduled = np.flatnonzero(calendar)
+
+    values[0], _ = _rebalance(initial_value, np.zeros_like(weights), weights, cost_rate)
+    costs[0] = initial_value - values[0]
+    shares = weights * values[0] / closes[0]
+    day = 0
+    while day < count - 1:
+        upcoming = scheduled[np.searchsorted(scheduled, day, side="right"):]
+        next_scheduled = int(upcoming[0]) if len(upcoming) else count
+        event = None
+        position = day + 1
+        while position <= min(next_scheduled, count - 1):
+            stop = min(position + DRIFT_CHUNK_DAYS, next_scheduled + 1, count)
+            held = closes[position:stop] * shares
+            stretch = held.sum(axis=1)
+            values[position:stop] = stretch
+            if threshold is not None:
+                drifted = np.flatnonzero(np.abs(held / stretch[:, None] - weights).max(axis=1) > threshold)
+                if len(drifted):
+                    event = position + int(drifted[0])
+                    break
+            position = stop
+        if event is None:
+            if next_scheduled >= count:
+                break
+            event = next_scheduled
+
+        held = closes[event] * shares
+        value = float(held.sum())
+        values[event], traded = _rebalance(value, held, weights, cost_rate)
+        turnover[event] = traded / value / 2
+        costs[event] = value - values[event]
+        rebalanced[event] = True
+        shares = weights * values[event] / closes[event]
+        day = event
+    return {"values": values, "turnover": turnover, "costs": costs, "rebalanced": rebalanced}
+
+def drawdown_periods(values: np.ndarray, days: np.ndarray, top: int = TOP_DRAWDOWNS) -> List[Dict]:
+    """Deepest peak-to-trough declines, with the day the prior peak was regained (None if not yet)"""
+    peaks = np.maximum.accumulate(values)
+    underwater = values < peaks
+    if not underwater.any():
+        return []
+    edges = np.diff(underwater.astype(np.int8), prepend=0, append=0)
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    drawdown = values / peaks - 1
+    depths = np.minimum.reduceat(drawdown, starts)
+    periods = []
+    for episode in np.argsort(depths)[:top]:
+        start, end = starts[episode], ends[episode]
+        trough = start + int(np.argmin(drawdown[start:end]))
+        periods.append({
+            "peak": date.fromordinal(int(days[start - 1])),
+            "trough": date.fromordinal(int(days[trough])),
+            "recovery": date.fromordinal(int(days[end])) if end < len(values) else None,
+            "depth": float(depths[episode])
+        })
+    return periods
+
+def performance_metrics(values: np.ndarray, days: np.ndarray, risk_free_rate: float = 0.0) -> Dict:
+    """Return, risk and drawdown statistics of a daily value series"""
+    returns = values[1:] / values[:-1] - 1
+    per_year = periods_per_year(days)
+    years = (days[-1] - days[0]) / 365.25
+    annualized = float((values[-1] / values[0]) ** (1 / years) - 1) if years > 0 else None
+    volatility = float(returns.std(ddof=1) * np.sqrt(per_year)) if len(returns) > 1 else None
+    excess = returns - risk_free_rate / per_year
+    downside = float(np.sqrt(np.mean(np.minimum(excess, 0) ** 2)) * np.sqrt(per_year)) if len(returns) else None
+    max_drawdown = float((values / np.maximum.accumulate(values) - 1).min())
+    return {
+        "total_return": float(values[-1] / values[0] - 1),
+        "annualized_return": annualized,
+        "annualized_volatility": volatility,
+        "sharpe_ratio": float(excess.mean() * per_year / volatility) if volatility else None,
+        "sortino_ratio": float(excess.mean() * per_year / downside) if downside else None,
+        "max_drawdown": max_drawdown,
+        "calmar_ratio": annualized / -max_drawdown if annualized is not None and max_drawdown < 0 else None,
+        "best_day": float(returns.max()) if len(returns) else None,
+        "worst_day": float(returns.min()) if len(returns) else None
+    }
+
+class BacktestService:
+    """
+    Replays a portfolio's current allocation, or given target weights, over
+    daily closes in local price history under a calendar or drift-threshold
+    rebalancing rule with proportional transaction costs, next to buy-and-hold.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.price_history = PriceHistoryService(db)
+
+    async def backtest_portfolio(self, portfolio: Portfolio, weights: Optional[Dict[str, float]] = None,
+                                 frequency: RebalanceFrequency = RebalanceFrequency.MONTHLY,
+                                 threshold: Optional[float] = None, cost_bps: float = 10.0,
+                                 start: Optional[date] = None, end: Optional[date] = None,
+                                 initial_value: float = 10_000.0, risk_free_rate: float = 0.0,
+                                 currency: str = PRICE_CURRENCY) -> Dict:
+        """Backtest of target weights, by default the current value weights of the portfolio's non-cash holdings"""
+        end = min(end or date.today(), date.today() - timedelta(days=1))
+        start = start or end - timedelta(days=DEFAULT_LOOKBACK_DAYS)
+        if start >= end:
+            raise ValueError("start must be before end")
+        if weights:
+            targets = {symbol.upper(): float(w) for symbol, w in weights.items()}
+            if any(w < 0 for w in targets.values()):
+                raise ValueError("Target weights must not be negative")
+            if abs(sum(targets.values()) - 1) > 1e-6:
+                raise ValueError("Target weights must sum to 1")
+        else:
+            targets = {}
+            for holding in portfolio.holdings:
+                if holding.asset_type != AssetType.CASH:
+                    targets[holding.asset_symbol] = targets.get(holding.asset_symbol, 0.0) + holding.quantity
+        if not targets:
+            raise ValueError("Portfolio has no assets to backtest")
+
+        symbols = sorted(targets)
+        days, closes = await self.price_history.aligned_closes(symbols, start, end, currency)
+        days, closes, assets, excluded = shared_history(days, closes, symbols)
+        if weights and excluded:
+            raise ValueError(f"No price history for {', '.join(excluded)}")
+        if len(days) < 2:
+            raise ValueError("Not enough shared price history to backtest")
+        if weights:
+            target = np.array([targets[s] for s in assets])
+        else:
+            # Current value weights of the holdings, at the latest close
+            held = np.array([targets[s] for s in assets]) * closes[-1]
+            target = held / held.sum()
+
+        calendar = calendar_rebalance_days(days, frequency)
+        strategy = simulate_rebalancing(closes, target, calendar, threshold, cost_bps / 10_000, initial_value)
+        buy_and_hold = simulate_rebalancing(closes, target, np.zeros(len(days), dtype=bool), None,
+                                            cost_bps / 10_000, initial_value)
+        years = (days[-1] - days[0]) / 365.25
+
+        def report(run: Dict[str, np.ndarray]) -> Dict:
+            return {
+                **performance_metrics(run["values"], days, risk_free_rate),
+                "final_value": float(run["values"][-1]),
+                "rebalances": int(run["rebalanced"].sum()),
+                "turnover": float(run["turnover"].sum()),
+                "annualized_turnover": float(run["turnover"].sum() / years),
+                "costs": float(run["costs"].sum()),
+                "drawdowns": drawdown_periods(run["values"], days),
+                "equity_curve": [
+                    {"date": date.fromordinal(int(d)), "value": float(v)} for d, v in zip(days, run["values"])
+                ]
+            }
+
+        return {
+            "portfolio_id": portfolio.id,
+            "currency": currency,
+            "start": date.fromordinal(int(days[0])),
+            "end": date.fromordinal(int(days[-1])),
+            "observations": len(days),
+            "rule": {"frequency": frequency.value, "threshold": threshold, "cost_bps": cost_bps},
+            "weights": {s: float(w) for s, w in zip(assets, target)},
+            "excluded_symbols": excluded,
+            "strategy": report(strategy),
+            "buy_and_hold": report(buy_and_hold)
+        }
@@ -0,0 +1,167 @@
+from typing import Any, Dict, List, Optional, Tuple, Type
+from datetime import date, datetime
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.portfolio import (
+    AssetType, Platform, Holding, Transaction
+)
+from app.schemas.portfolio import (
+    BulkItemResult, BulkMode, BulkTransactionItem, BulkWriteResponse, HoldingBase
+)
+from app.services.portfolio_version import bump_portfolio_version
+from app.services.returns import invalidate_valuations
+
+class BulkWriteError(Exception):
+    """Raised when an all-or-nothing batch has invalid items; nothing was written"""
+
+    def __init__(self, response: BulkWriteResponse):
+        super().__init__(f"{response.failed} invalid items in batch")
+        self.response = response
+
+def _validate(schema: Type[BaseModel], items: List[Dict[str, Any]]) -> Tuple[List[Optional[BaseModel]], List[Optional[str]]]:
+    """Validate every item, collecting per-item errors instead of stopping at the first"""
+    parsed: List[Optional[BaseModel]] = []
+    errors: List[Optional[str]] = []
+    for item in items:
+        try:
+            parsed.append(schema.model_validate(item))
+            errors.append(None)
+        except ValidationError as e:
+            parsed.append(None)
+            errors.append("; ".join(
+                f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+            ))
+    return parsed, errors
+
+class BulkWriteService:
+    """Batch inserts of holdings and transactions into an already-authorized portfolio"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create_holdings(self, portfolio_id: int, items: List[Dict[str, Any]], mode: BulkMode) -> BulkWriteResponse:
+        parsed, errors = _validate(HoldingBase, items)
+
+        seen = set()
+        for i, holding in enumerate(parsed):
+            if holding is None:
+                continue
+            key = (holding.asset_symbol.upper(), holding.platform.value)
+            if holding.quantity < 0 or holding.average_price < 0:
+                errors[i] = "quantity and average_price must not be negative"
+            elif key in seen:
+                errors[i] = f"duplicate holding {holding.asset_symbol} on {holding.platform.value} in batch"
+            else:
+                seen.add(key)
+
+        now = datetime.utcnow()
+        return await self._insert(
+            Holding,
+            portfolio_id,
+            errors,
+            mode,
+            [
+                {
+                    "portfolio_id": portfolio_id,
+                    "asset_symbol": holding.asset_symbol,
+                    "asset_type": AssetType(holding.asset_type.value),
+                    "quantity": holding.quantity,
+                    "average_price": holding.average_price,
+                    "platform": Platform(holding.platform.value),
+                    "currency": holding.currency,
+                    "last_updated": now,
+                    "created_at": now,
+                    "updated_at": now
+                }
+                if holding is not None else None
+                for holding in parsed
+            ]
+        )
+
+    async def create_transactions(self, portfolio_id: int, items: List[Dict[str, Any]], mode: BulkMode) -> BulkWriteResponse:
+        parsed, errors = _validate(BulkTransactionItem, items)
+
+        # One lookup resolves which referenced holdings belong to this portfolio
+        holding_ids = {tx.holding_id for tx in parsed if tx is not None}
+        result = await self.db.execute(
+            select(Holding.id).where(
+                Holding.portfolio_id == portfolio_id,
+                Holding.id.in_(holding_ids)
+            )
+        )
+        owned = set(result.scalars().all())
+
+        for i, tx in enumerate(parsed):
+            if tx is None:
+                continue
+            if tx.holding_id not in owned:
+                errors[i] = f"holding {tx.holding_id} not found in portfolio"
+            elif tx.transaction_type.lower() not in ("buy", "sell"):
+                errors[i] = "transaction_type must be 'buy' or 'sell'"
+            elif tx.quantity <= 0 or tx.price < 0:
+                errors[i] = "quantity must be positive and price must not be negative"
+
+        now = datetime.utcnow()
+        if not (any(errors) and mode == BulkMode.ATOMIC):
+            # Cached daily valuations from each transaction's date on no longer hold
+            changed_from: Dict[int, date] = {}
+            for tx, error in zip(parsed, errors):
+                if error is None:
+                    day = (tx.timestamp or now).date()
+                    changed_from[tx.holding_id] = min(day, changed_from.get(tx.holding_id, day))
+            await invalidate_valuations(self.db, changed_from)
+        return await self._insert(
+            Transaction,
+            portfolio_id,
+            errors,
+            mode,
+            [
+                {
+                    "holding_id": tx.holding_id,
+                    "transaction_type": tx.transaction_type.lower(),
+                    "quantity": tx.quantity,
+                    "price": tx.price,
+                    "timestamp": tx.timestamp or now,
+                    "platform": Platform(tx.platform.value)
+                }
+                if tx is not None else None
+                for tx in parsed
+            ]
+        )
+
+    async def _insert(self, model, portfolio_id: int, errors: List[Optional[str]], mode: BulkMode, rows: List[Optional[Dict]]) -> BulkWriteResponse:
+        """Insert the valid rows in one multi-row statement and report per-item results"""
+        failed = sum(error is not None for error in errors)
+        if failed and mode == BulkMode.ATOMIC:
+            raise BulkWriteError(BulkWriteResponse(
+                created=0,
+                failed=failed,
+                results=[
+                    BulkItemResult(index=i, status="failed" if error else "skipped", error=error)
+                    for i, error in enumerate(errors)
+                ]
+            ))
+
+        valid = [i for i, error in enumerate(errors) if error is None]
+        ids: List[int] = []
+        if valid:
+            result = await self.db.execute(
+                insert(model).returning(model.id, sort_by_parameter_order=True),
+                [rows[i] for i in valid]
+            )
+            ids = list(result.scalars().all())
+            await bump_portfolio_version(self.db, portfolio_id)
+            await self.db.commit()
+
+        created_ids = dict(zip(valid, ids))
+        return BulkWriteResponse(
+            created=len(ids),
+            failed=failed,
+            results=[
+                BulkItemResult(index=i, status="created", id=created_ids[i])
+                if error is None else
+                BulkItemResult(index=i, status="failed", error=error)
+                for i, error in enumerate(errors)
+            ]
+        )
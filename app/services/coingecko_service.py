@@ -1,9 +1,35 @@
 from typing import Dict, List, Optional
 import aiohttp
 from datetime import datetime, timedelta
+from app.core.config import settings
+from app.core.metrics import track_provider
+
+# CoinGecko identifies coins by id rather than ticker
+COINGECKO_IDS = {
+    "BTC": "bitcoin",
+    "ETH": "ethereum",
+    "SOL": "solana",
+    "LTC": "litecoin",
+    "BCH": "bitcoin-cash",
+    "DOGE": "dogecoin",
+    "ADA": "cardano",
+    "DOT": "polkadot",
+    "AVAX": "avalanche-2",
+    "LINK": "chainlink",
+    "MATIC": "matic-network",
+    "UNI": "uniswap",
+    "XRP": "ripple",
+    "USDC": "usd-coin",
+    "USDT": "tether",
+    "DAI": "dai",
+}
+
+def coin_id_for_symbol(symbol: str) -> str:
+    """Map a ticker to its CoinGecko id, falling back to the lower-cased ticker"""
+    return COINGECKO_IDS.get(symbol.upper(), symbol.lower())
 
 class CoinGeckoService:
-    BASE_URL = "https://api.coingecko.com/api/v3"
+    BASE_URL = settings.COINGECKO_BASE_URL
     
     async def get_crypto_price(self, coin_id: str) -> Dict:
         """Get current crypto price and market data"""
@@ -20,23 +46,24 @@ class CoinGeckoService:
                     "include_last_updated_at": "true"
                 }
                 
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        raise Exception(f"CoinGecko API error: {await response.text()}")
+                with track_provider("coingecko", "simple_price"):
+                    async with session.get(url, params=params) as response:
+                        if response.status != 200:
+                            raise Exception(f"CoinGecko API error: {await response.text()}")
                     
-                    data = await response.json()
-                    if coin_id not in data:
-                        raise Exception(f"Crypto {coin_id} not found")
+                        data = await response.json()
+                        if coin_id not in data:
+                            raise Exception(f"Crypto {coin_id} not found")
                     
-                    coin_data = data[coin_id]
-                    return {
-                        "id": coin_id,
-                        "current_price": coin_data["usd"],
-                        "market_cap": coin_data["usd_market_cap"],
-                        "volume_24h": coin_data["usd_24h_vol"],
-                        "price_change_24h": coin_data["usd_24h_change"],
-                        "last_updated": datetime.fromtimestamp(coin_data["last_updated_at"])
-                    }
+                        coin_data = data[coin_id]
+                        return {
+                            "id": coin_id,
+                            "current_price": coin_data["usd"],
+                            "market_cap": coin_data["usd_market_cap"],
+                            "volume_24h": coin_data["usd_24h_vol"],
+                            "price_change_24h": coin_data["usd_24h_change"],
+                            "last_updated": datetime.fromtimestamp(coin_data["last_updated_at"])
+                        }
             
             except Exception as e:
                 raise Exception(f"Failed to fetch crypto price for {coin_id}: {str(e)}")
@@ -52,20 +79,21 @@ class CoinGeckoService:
                     "interval": "daily"
                 }
                 
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        raise Exception(f"CoinGecko API error: {await response.text()}")
+                with track_provider("coingecko", "market_chart"):
+                    async with session.get(url, params=params) as response:
+                        if response.status != 200:
+                            raise Exception(f"CoinGecko API error: {await response.text()}")
                     
-                    data = await response.json()
-                    prices = data["prices"]  # [[timestamp, price], ...]
+                        data = await response.json()
+                        prices = data["prices"]  # [[timestamp, price], ...]
                     
-                    return [
-                        {
-                            "timestamp": datetime.fromtimestamp(price[0] / 1000),
-                            "price": price[1]
-                        }
-                        for price in prices
-                    ]
+                        return [
+                            {
+                                "timestamp": datetime.fromtimestamp(price[0] / 1000),
+                                "price": price[1]
+                            }
+                            for price in prices
+                        ]
             
             except Exception as e:
                 raise Exception(f"Failed to fetch price history for {coin_id}: {str(e)}")
@@ -84,26 +112,27 @@ class CoinGeckoService:
                     "include_last_updated_at": "true"
                 }
                 
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        raise Exception(f"CoinGecko API error: {await response.text()}")
+                with track_provider("coingecko", "simple_price"):
+                    async with session.get(url, params=params) as response:
+                        if response.status != 200:
+                            raise Exception(f"CoinGecko API error: {await response.text()}")
                     
-                    data = await response.json()
-                    results = []
+                        data = await response.json()
+                        results = []
                     
-                    for coin_id in coin_ids:
-                        if coin_id in data:
-                            coin_data = data[coin_id]
-                            results.append({
-                                "id": coin_id,
-                                "current_price": coin_data["usd"],
-                                "market_cap": coin_data["usd_market_cap"],
-                                "volume_24h": coin_data["usd_24h_vol"],
-                                "price_change_24h": coin_data["usd_24h_change"],
-                                "last_updated": datetime.fromtimestamp(coin_data["last_updated_at"])
-                            })
+                        for coin_id in coin_ids:
+                            if coin_id in data:
+                                coin_data = data[coin_id]
+                                results.append({
+                                    "id": coin_id,
+                                    "current_price": coin_data["usd"],
+                                    "market_cap": coin_data["usd_market_cap"],
+                                    "volume_24h": coin_data["usd_24h_vol"],
+                                    "price_change_24h": coin_data["usd_24h_change"],
+                                    "last_updated": datetime.fromtimestamp(coin_data["last_updated_at"])
+                                })
                     
-                    return results
+                        return results
             
             except Exception as e:
                 raise Exception(f"Failed to fetch multiple crypto prices: {str(e)}")
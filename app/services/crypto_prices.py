@@ -0,0 +1,194 @@
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from collections import deque
+import asyncio
+import time
+import aiohttp
+import numpy as np
+from app.core.config import settings
+from app.core.metrics import record_price_route, track_provider
+from app.services.coingecko_service import CoinGeckoService, coin_id_for_symbol
+from app.services.quote_cache import cached_quotes
+
+# Latency samples a provider needs before its own percentile sets the hedge delay
+MIN_LATENCY_SAMPLES = 20
+# Weight of the latest outcome in a provider's success rate
+SUCCESS_DECAY = 0.1
+
+async def gemini_prices(symbols: List[str]) -> Dict[str, float]:
+    """Last USD trade per symbol from Gemini's public ticker (unsigned), one request per symbol"""
+    async with aiohttp.ClientSession() as session:
+        async def ticker(symbol: str) -> Optional[float]:
+            url = f"{settings.GEMINI_BASE_URL}/pubticker/{symbol.lower()}usd"
+            with track_provider("gemini", "pubticker"):
+                async with session.get(url) as response:
+                    if response.status == 400:
+                        # No USD market for the symbol on Gemini
+                        return None
+                    if response.status != 200:
+                        raise Exception(f"Gemini API request failed: {await response.text()}")
+                    return float((await response.json())["last"])
+
+        results = await asyncio.gather(*(ticker(symbol) for symbol in symbols), return_exceptions=True)
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures and len(failures) == len(symbols):
+        raise failures[0]
+    return {
+        symbol: price for symbol, price in zip(symbols, results)
+        if price is not None and not isinstance(price, Exception)
+    }
+
+async def coingecko_prices(symbols: List[str]) -> Dict[str, float]:
+    """USD price per symbol from one CoinGecko simple/price request"""
+    ids = {coin_id_for_symbol(symbol): symbol for symbol in symbols}
+    coins = await CoinGeckoService().get_multiple_cryptos(list(ids))
+    return {ids[coin["id"]]: float(coin["current_price"]) for coin in coins}
+
+PRICE_SOURCES: Dict[str, Callable[[List[str]], Awaitable[Dict[str, float]]]] = {
+    "coingecko": coingecko_prices,
+    "gemini": gemini_prices,
+}
+
+class ProviderHealth:
+    """
+    Recent latencies, success rate and circuit breaker of one price provider.
+    The breaker opens after CRYPTO_BREAKER_FAILURES consecutive failures; once
+    the cooldown has passed, a single trial call closes it again or restarts it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: Deque[float] = deque(maxlen=settings.CRYPTO_LATENCY_WINDOW)
+        self.success_rate = 1.0
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+
+    def tail_latency(self, min_samples: int = 1) -> float:
+        """Recent latency percentile in seconds, or the default delay with fewer samples"""
+        if len(self.latencies) < min_samples:
+            return settings.CRYPTO_HEDGE_DEFAULT_MS / 1000
+        return float(np.percentile(self.latencies, settings.CRYPTO_HEDGE_PERCENTILE))
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait on this provider before asking another"""
+        delay = self.tail_latency(MIN_LATENCY_SAMPLES) * 1000
+        return min(max(delay, settings.CRYPTO_HEDGE_MIN_MS), settings.CRYPTO_HEDGE_MAX_MS) / 1000
+
+    def score(self) -> float:
+        """Success rate discounted by tail latency; the healthiest provider is asked first"""
+        return self.success_rate / (1 + self.tail_latency())
+
+    def available(self, now: float) -> bool:
+        if self.opened_at is None:
+            return True
+        return now - self.opened_at >= settings.CRYPTO_BREAKER_COOLDOWN_SECONDS and not self.trial
+
+    def started(self):
+        if self.opened_at is not None:
+            self.trial = True
+
+    def succeeded(self, latency: float):
+        self.latencies.append(latency)
+        self.success_rate += SUCCESS_DECAY * (1 - self.success_rate)
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def failed(self, now: float):
+        self.success_rate *= 1 - SUCCESS_DECAY
+        self.failures += 1
+        if self.trial or self.failures == settings.CRYPTO_BREAKER_FAILURES:
+            record_price_route(self.name, "breaker_open")
+            self.opened_at = now
+        self.trial = False
+
+    def abandoned(self, latency: float):
+        """A call cancelled because another provider answered first: it took at least `latency`"""
+        self.latencies.append(latency)
+        self.trial = False
+
+class CryptoPriceRouter:
+    """
+    Latest crypto prices from whichever provider answers first. The healthiest
+    provider is asked; if it has not answered within its p95 latency, fails, or
+    leaves symbols unpriced, the next one is asked for what is still missing,
+    and each symbol takes the first price to arrive. Providers whose circuit
+    is open are skipped until their cooldown ends.
+    """
+
+    def __init__(self, providers: Optional[List[str]] = None):
+        names = providers or [name.strip() for name in settings.CRYPTO_PRICE_PROVIDERS.split(",") if name.strip()]
+        self.health = {name: ProviderHealth(name) for name in names}
+
+    def ranked(self) -> List[ProviderHealth]:
+        """Providers to try, healthiest first; when every circuit is open, the one open longest"""
+        now = time.monotonic()
+        healthy = [health for health in self.health.values() if health.available(now)]
+        if not healthy:
+            return [min(self.health.values(), key=lambda health: health.opened_at)]
+        return sorted(healthy, key=lambda health: -health.score())
+
+    async def fetch(self, symbols: List[str]) -> Dict[str, float]:
+        """USD prices by symbol, hedged across providers; raises only when none priced anything"""
+        prices: Dict[str, float] = {}
+        waiting = self.ranked()
+        pending: Dict[asyncio.Task, Tuple[ProviderHealth, float]] = {}
+        errors: List[str] = []
+
+        def launch() -> float:
+            health = waiting.pop(0)
+            missing = [symbol for symbol in symbols if symbol not in prices]
+            health.started()
+            task = asyncio.create_task(
+                asyncio.wait_for(PRICE_SOURCES[health.name](missing), settings.CRYPTO_PRICE_TIMEOUT_SECONDS)
+            )
+            pending[task] = (health, time.monotonic())
+            return health.hedge_delay()
+
+        try:
+            delay = launch()
+            while pending and len(prices) < len(symbols):
+                done, _ = await asyncio.wait(
+                    pending, timeout=delay if waiting else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                hedge = not done
+                for task in done:
+                    health, started = pending.pop(task)
+                    try:
+                        fetched = task.result()
+                    except Exception as e:
+                        health.failed(time.monotonic())
+                        errors.append(f"{health.name}: {str(e) or type(e).__name__}")
+                        hedge = True
+                        continue
+                    health.succeeded(time.monotonic() - started)
+                    for symbol, price in fetched.items():
+                        prices.setdefault(symbol, price)
+                    hedge = hedge or len(prices) < len(symbols)
+                if hedge and waiting and len(prices) < len(symbols):
+                    record_price_route(waiting[0].name, "failover" if done else "hedge")
+                    delay = launch()
+        finally:
+            now = time.monotonic()
+            for task, (health, started) in pending.items():
+                task.cancel()
+                health.abandoned(now - started)
+
+        if not prices and errors:
+            raise Exception(f"No crypto price provider answered: {'; '.join(errors)}")
+        return prices
+
+    async def get_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """USD prices by ticker, from the quote cache shared by all workers where fresh"""
+        if not symbols:
+            return {}
+        return await cached_quotes("crypto", [symbol.upper() for symbol in symbols], self.fetch)
+
+# Health is per process and shared by every request, like the quote cache
+_router: Optional[CryptoPriceRouter] = None
+
+def crypto_price_router() -> CryptoPriceRouter:
+    global _router
+    if _router is None:
+        _router = CryptoPriceRouter()
+    return _router
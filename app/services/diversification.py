@@ -0,0 +1,161 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from datetime import date, timedelta
+import asyncio
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.services.price_history import PriceHistoryService, periods_per_year, shared_history
+
+# Fewer shared daily returns than this cannot support a correlation estimate
+MIN_OBSERVATIONS = 20
+
+def cluster_correlated(correlation: np.ndarray, min_correlation: float) -> np.ndarray:
+    """
+    Average-linkage hierarchical clustering on the distance 1 - correlation,
+    merging until the closest pair of groups averages below `min_correlation`.
+    Returns a group label per asset (the index of one of its members).
+    """
+    count = len(correlation)
+    distance = 1 - np.array(correlation, dtype=float)
+    np.fill_diagonal(distance, np.inf)
+    sizes = np.ones(count)
+    labels = np.arange(count)
+    cutoff = 1 - min_correlation
+    for _ in range(count - 1):
+        flat = int(np.argmin(distance))
+        keep, merged = divmod(flat, count)
+        if distance[keep, merged] > cutoff:
+            break
+        # Lance-Williams update: the merged group's average distance to every other group
+        row = (sizes[keep] * distance[keep] + sizes[merged] * distance[merged]) / (sizes[keep] + sizes[merged])
+        distance[keep, :] = row
+        distance[:, keep] = row
+        distance[keep, keep] = np.inf
+        distance[merged, :] = np.inf
+        distance[:, merged] = np.inf
+        sizes[keep] += sizes[merged]
+        labels[labels == merged] = keep
+    return labels
+
+class CorrelationStructure:
+    """Annualized volatilities, correlations and correlated groups of a set of symbols"""
+
+    def __init__(self, symbols: List[str], closes: np.ndarray, days: np.ndarray,
+                 min_correlation: float, excluded: List[str]):
+        returns = closes[1:] / closes[:-1] - 1
+        deviations = returns.std(axis=0, ddof=1)
+        self.symbols = symbols
+        self.excluded = excluded
+        self.observations = len(returns)
+        self.volatilities = deviations * np.sqrt(periods_per_year(days))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            correlation = np.corrcoef(returns, rowvar=False).reshape(len(symbols), len(symbols))
+        # A flat price series has no defined correlation; treat it as uncorrelated
+        correlation = np.nan_to_num(correlation, nan=0.0)
+        np.fill_diagonal(correlation, 1.0)
+        self.correlation = correlation
+        self.labels = cluster_correlated(correlation, min_correlation)
+
+# (sorted symbols, as-of date) -> structure, shared by every request
+_structures: "OrderedDict[Tuple[Tuple[str, ...], date], Optional[CorrelationStructure]]" = OrderedDict()
+
+def cached_structure(key: Tuple[Tuple[str, ...], date]) -> Tuple[bool, Optional[CorrelationStructure]]:
+    """(whether the key is cached, its structure), refreshing its recency"""
+    if key not in _structures:
+        return False, None
+    _structures.move_to_end(key)
+    return True, _structures[key]
+
+def remember_structure(key: Tuple[Tuple[str, ...], date], structure: Optional[CorrelationStructure]):
+    _structures[key] = structure
+    _structures.move_to_end(key)
+    while len(_structures) > settings.DIVERSIFICATION_CACHE_MAX_ENTRIES:
+        _structures.popitem(last=False)
+
+def correlation_structure(symbols: List[str], days: np.ndarray, closes: np.ndarray, excluded: List[str],
+                          min_correlation: Optional[float] = None) -> Optional[CorrelationStructure]:
+    """Structure of the shared closes, or None when they are too short (or fewer than two symbols)"""
+    if len(symbols) < 2 or len(days) <= MIN_OBSERVATIONS:
+        return None
+    if min_correlation is None:
+        min_correlation = settings.DIVERSIFICATION_CLUSTER_CORRELATION
+    return CorrelationStructure(symbols, closes, days, min_correlation, excluded)
+
+def diversification_metrics(weights: Dict[str, float], structure: Optional[CorrelationStructure]) -> Dict:
+    """
+    Concentration of value weights (summing to 1): HHI and the effective number
+    of holdings. With a correlation structure, also the diversification ratio
+    (weighted volatility over portfolio volatility), the correlated groups and
+    the effective number of independent groups, over the symbols it covers.
+    """
+    values = np.array(list(weights.values()), dtype=float)
+    hhi = float(np.sum(values ** 2))
+    metrics = {
+        "hhi": hhi,
+        "effective_holdings": 1 / hhi if hhi else None,
+        "diversification_ratio": None,
+        "average_correlation": None,
+        "effective_groups": None,
+        "correlated_groups": [],
+        "correlation_matrix": None,
+        "excluded_symbols": []
+    }
+    if structure is None:
+        return metrics
+
+    covered = np.array([weights.get(symbol, 0.0) for symbol in structure.symbols])
+    if covered.sum() <= 0:
+        return metrics
+    covered = covered / covered.sum()
+    scaled = covered * structure.volatilities
+    portfolio_volatility = float(np.sqrt(max(scaled @ structure.correlation @ scaled, 0.0)))
+    pair_weights = np.outer(covered, covered)
+    np.fill_diagonal(pair_weights, 0.0)
+
+    groups = []
+    for label in np.unique(structure.labels):
+        members = np.flatnonzero(structure.labels == label)
+        within = structure.correlation[np.ix_(members, members)]
+        pairs = len(members) * (len(members) - 1)
+        groups.append({
+            "symbols": [structure.symbols[i] for i in members],
+            "weight": float(covered[members].sum()),
+            "average_correlation": float((within.sum() - len(members)) / pairs) if pairs else None
+        })
+    groups.sort(key=lambda group: -group["weight"])
+    group_weights = np.array([group["weight"] for group in groups])
+
+    metrics.update({
+        "diversification_ratio": float(scaled.sum() / portfolio_volatility) if portfolio_volatility > 0 else None,
+        "average_correlation": (
+            float((pair_weights * structure.correlation).sum() / pair_weights.sum()) if pair_weights.sum() > 0 else None
+        ),
+        "effective_groups": float(1 / np.sum(group_weights ** 2)),
+        "correlated_groups": groups,
+        "correlation_matrix": {
+            "symbols": structure.symbols,
+            "matrix": np.round(structure.correlation, 4).tolist(),
+            "observations": structure.observations
+        },
+        "excluded_symbols": structure.excluded
+    })
+    return metrics
+
+async def stored_correlation_structure(db: AsyncSession, symbols: List[str]) -> Optional[CorrelationStructure]:
+    """Structure over daily closes in price history (backfilled as needed), computed once per symbol set and day"""
+    symbols = sorted(set(symbols))
+    end = date.today() - timedelta(days=1)
+    key = (tuple(symbols), end)
+    cached, structure = cached_structure(key)
+    if cached:
+        return structure
+    if len(symbols) < 2:
+        return None
+
+    start = end - timedelta(days=settings.DIVERSIFICATION_LOOKBACK_DAYS)
+    days, closes = await PriceHistoryService(db).aligned_closes(symbols, start, end)
+    days, closes, covered, excluded = shared_history(days, closes, symbols)
+    structure = await asyncio.to_thread(correlation_structure, covered, days, closes, excluded)
+    remember_structure(key, structure)
+    return structure
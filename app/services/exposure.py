@@ -0,0 +1,147 @@
+from typing import Dict, List
+from datetime import datetime
+from sqlalchemy import String, and_, case, cast, func, literal, select, true, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.portfolio import AssetType, FxRate, Holding, Platform, Portfolio, PriceHistory
+from app.services.fx import FxService, PRICE_CURRENCY
+
+# GROUPING() bits over (symbol, asset_type, platform): set when the column is rolled up
+_BY_SYMBOL = 0b001
+_BY_ASSET_TYPE = 0b101
+_BY_PLATFORM = 0b110
+_TOTAL = 0b111
+
+def exposure_query(user_id: int):
+    """
+    One statement for every breakdown of a user's holdings: GROUPING SETS over
+    holdings joined to their portfolios, with each holding valued at the latest
+    stored close of its symbol and converted from its currency at the latest
+    stored rate (both LATERAL index lookups). Amounts are in USD.
+    """
+    symbol = func.upper(Holding.asset_symbol)
+    price = (
+        select(PriceHistory.close, PriceHistory.date)
+        .where(PriceHistory.symbol == symbol)
+        .order_by(PriceHistory.date.desc())
+        .limit(1)
+        .lateral("price")
+    )
+    fx = (
+        select(FxRate.rate)
+        .where(FxRate.currency == Holding.currency)
+        .order_by(FxRate.date.desc())
+        .limit(1)
+        .lateral("fx")
+    )
+    per_usd = case((Holding.currency == PRICE_CURRENCY, literal(1.0)), else_=fx.c.rate)
+    quantity = func.coalesce(Holding.quantity, 0.0)
+    cost = quantity * func.coalesce(Holding.average_price, 0.0) / per_usd
+    is_cash = Holding.asset_type == AssetType.CASH
+    unpriced = and_(~is_cash, price.c.close.is_(None))
+    value = case(
+        (is_cash, quantity / per_usd),
+        (price.c.close.isnot(None), quantity * price.c.close),
+        else_=cost
+    )
+    return (
+        select(
+            func.grouping(symbol, Holding.asset_type, Holding.platform).label("rolled_up"),
+            symbol.label("symbol"),
+            Holding.asset_type,
+            Holding.platform,
+            func.sum(quantity).label("quantity"),
+            func.sum(value).label("market_value"),
+            func.sum(cost).label("cost_basis"),
+            func.count().label("holdings"),
+            func.count(func.distinct(symbol)).label("symbols"),
+            func.array_agg(func.distinct(Holding.portfolio_id)).label("portfolio_ids"),
+            func.array_agg(func.distinct(cast(Holding.platform, String))).label("platforms"),
+            func.max(price.c.date).label("price_date"),
+            func.count().filter(unpriced).label("unpriced"),
+            func.count().filter(per_usd.is_(None)).label("unconverted")
+        )
+        .select_from(Holding)
+        .join(Portfolio, Portfolio.id == Holding.portfolio_id)
+        .outerjoin(price, true())
+        .outerjoin(fx, true())
+        .where(Portfolio.user_id == user_id)
+        .group_by(func.grouping_sets(
+            tuple_(symbol, Holding.asset_type),
+            tuple_(Holding.asset_type),
+            tuple_(Holding.platform),
+            tuple_()
+        ))
+    )
+
+class ExposureService:
+    """
+    Consolidated exposure across all of a user's portfolios per symbol, asset
+    type and platform, aggregated in the database in a single round trip.
+    Symbols held in more than one portfolio or on more than one platform are
+    flagged as overlaps.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.fx_service = FxService(db)
+
+    async def consolidated_exposure(self, user_id: int, currency: str = PRICE_CURRENCY) -> Dict:
+        """Exposure of every holding the user has, in `currency`"""
+        rows = (await self.db.execute(exposure_query(user_id))).all()
+        rate = (await self.fx_service.latest_rates([currency]))[currency]
+        # The empty grouping set yields a total row even when the user has no holdings
+        total = next(row for row in rows if row.rolled_up == _TOTAL)
+        total_value = (total.market_value or 0.0) * rate
+
+        def amounts(row) -> Dict:
+            value = (row.market_value or 0.0) * rate
+            cost = (row.cost_basis or 0.0) * rate
+            return {
+                "market_value": value,
+                "cost_basis": cost,
+                "gain_loss": value - cost,
+                "weight": value / total_value if total_value else None,
+                "holdings": row.holdings,
+                "unpriced_holdings": row.unpriced
+            }
+
+        def platforms(row) -> List[str]:
+            return sorted(Platform[name].value for name in row.platforms or () if name)
+
+        by_symbol = [
+            {
+                "symbol": row.symbol,
+                "asset_type": row.asset_type.value if row.asset_type else None,
+                "quantity": row.quantity,
+                **amounts(row),
+                "portfolio_ids": sorted(row.portfolio_ids),
+                "platforms": platforms(row),
+                "overlap": len(row.portfolio_ids) > 1 or len(platforms(row)) > 1,
+                "price_date": row.price_date
+            }
+            for row in rows if row.rolled_up == _BY_SYMBOL
+        ]
+        by_symbol.sort(key=lambda item: -item["market_value"])
+        by_asset_type = sorted((
+            {"asset_type": row.asset_type.value if row.asset_type else None, "symbols": row.symbols, **amounts(row)}
+            for row in rows if row.rolled_up == _BY_ASSET_TYPE
+        ), key=lambda item: -item["market_value"])
+        by_platform = sorted((
+            {"platform": row.platform.value if row.platform else None, "symbols": row.symbols, **amounts(row)}
+            for row in rows if row.rolled_up == _BY_PLATFORM
+        ), key=lambda item: -item["market_value"])
+
+        return {
+            "currency": currency,
+            "totals": {
+                **amounts(total),
+                "portfolios": len(total.portfolio_ids or ()),
+                "symbols": total.symbols,
+                "unconverted_holdings": total.unconverted
+            },
+            "by_symbol": by_symbol,
+            "by_asset_type": by_asset_type,
+            "by_platform": by_platform,
+            "overlaps": [item["symbol"] for item in by_symbol if item["overlap"]],
+            "as_of": datetime.utcnow().isoformat()
+        }
@@ -2,6 +2,7 @@ from typing import Dict, List, Optional
 import aiohttp
 from datetime import datetime
 from app.core.config import settings
+from app.core.metrics import track_provider
 from app.models.portfolio import AssetType, Platform
 
 class FidelityAPI:
@@ -29,11 +30,12 @@ class FidelityAPI:
                 "client_secret": self.client_secret
             }
             
-            async with session.post(auth_url, data=data) as response:
-                if response.status != 200:
-                    raise Exception("Failed to get access token from Fidelity")
-                
-                token_data = await response.json()
+            with track_provider("fidelity", "oauth_token"):
+                async with session.post(auth_url, data=data) as response:
+                    if response.status != 200:
+                        raise Exception("Failed to get access token from Fidelity")
+                    
+                    token_data = await response.json()
                 self.access_token = token_data["access_token"]
                 # Assuming token expires in 1 hour, adjust based on actual Fidelity API
                 self.token_expires_at = datetime.utcnow() + datetime.timedelta(hours=1)
@@ -49,10 +51,11 @@ class FidelityAPI:
         
         async with aiohttp.ClientSession() as session:
             url = f"{self.BASE_URL}/{endpoint}"
-            async with session.request(method, url, headers=headers, **kwargs) as response:
-                if response.status not in (200, 201):
-                    raise Exception(f"Fidelity API request failed: {await response.text()}")
-                return await response.json()
+            with track_provider("fidelity", endpoint):
+                async with session.request(method, url, headers=headers, **kwargs) as response:
+                    if response.status not in (200, 201):
+                        raise Exception(f"Fidelity API request failed: {await response.text()}")
+                    return await response.json()
     
     async def get_portfolio_positions(self) -> List[Dict]:
         """
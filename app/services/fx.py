@@ -0,0 +1,182 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from datetime import date, timedelta
+import time
+import aiohttp
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.metrics import record_cache, track_provider
+from app.models.portfolio import FxRate
+
+# Alpaca, CoinGecko and Gemini prices are all quoted in US dollars
+PRICE_CURRENCY = "USD"
+# Reference rates are published on business days only
+FX_HISTORY_SLACK_DAYS = 4
+
+# Latest rates shared by every request: currency -> (fetched at, units per USD)
+_latest_cache: Dict[str, Tuple[float, float]] = {}
+
+def convert(amounts: np.ndarray, currencies: Sequence[str], to: str, rates: Dict[str, float]) -> np.ndarray:
+    """
+    Convert amounts, each in its own currency, to `to` with one rate lookup per
+    distinct currency. `rates` are units per USD.
+    """
+    amounts = np.asarray(amounts, dtype=float)
+    if not len(amounts):
+        return amounts
+    codes, inverse = np.unique(np.asarray(currencies, dtype=object), return_inverse=True)
+    per_usd = np.array([rates[code] for code in codes], dtype=float)
+    return amounts / per_usd[inverse] * rates[to]
+
+class FxService:
+    """
+    Exchange rates against the US dollar from the ECB reference feed.
+    Latest rates are cached in memory for FX_CACHE_TTL_SECONDS; daily history
+    is kept in fx_rates and only fetched for days the store does not cover.
+    """
+
+    BASE_URL = settings.FX_BASE_URL
+
+    def __init__(self, db: Optional[AsyncSession] = None):
+        self.db = db
+
+    async def latest_rates(self, currencies: Iterable[str]) -> Dict[str, float]:
+        """Units per USD for each currency; raises ValueError for currencies without a rate"""
+        wanted = {c.upper() for c in currencies} - {PRICE_CURRENCY}
+        rates = {PRICE_CURRENCY: 1.0}
+        now = time.time()
+        stale = []
+        for currency in sorted(wanted):
+            entry = _latest_cache.get(currency)
+            fresh = entry is not None and now - entry[0] < settings.FX_CACHE_TTL_SECONDS
+            record_cache("fx", fresh)
+            if fresh:
+                rates[currency] = entry[1]
+            else:
+                stale.append(currency)
+        if not stale:
+            return rates
+
+        try:
+            day, fetched = await self._fetch_latest(stale)
+            for currency, rate in fetched.items():
+                _latest_cache[currency] = (now, rate)
+            rates.update(fetched)
+            await self._store({day: fetched})
+        except Exception as e:
+            print(f"Error fetching FX rates: {str(e)}")
+
+        missing = [c for c in stale if c not in rates]
+        if missing and self.db is not None:
+            # Provider down: fall back to the most recent stored rates
+            rates.update(await self._stored_latest(missing))
+        missing = [c for c in stale if c not in rates]
+        if missing:
+            raise ValueError(f"No exchange rate for {', '.join(missing)}")
+        return rates
+
+    async def daily_rates(self, currencies: Iterable[str], start: date, end: date) -> Dict[str, np.ndarray]:
+        """
+        Units per USD on every day from start to end, carried forward over
+        weekends and holidays. Raises ValueError for currencies without rates.
+        """
+        wanted = sorted({c.upper() for c in currencies} - {PRICE_CURRENCY})
+        days = (end - start).days + 1
+        rates = {PRICE_CURRENCY: np.ones(days)}
+        if not wanted:
+            return rates
+        if self.db is None:
+            raise RuntimeError("Rate history needs a database session")
+
+        # Start a week early so the first days have a rate to carry forward
+        lookback = start - timedelta(days=7)
+        result = await self.db.execute(
+            select(FxRate.currency, func.min(FxRate.date), func.max(FxRate.date))
+            .where(FxRate.currency.in_(wanted))
+            .group_by(FxRate.currency)
+        )
+        coverage = {currency: (low, high) for currency, low, high in result.all()}
+        wanted_through = min(end, date.today() - timedelta(days=1))
+        if any(
+            currency not in coverage
+            or coverage[currency][0] > lookback + timedelta(days=FX_HISTORY_SLACK_DAYS)
+            or coverage[currency][1] < wanted_through - timedelta(days=FX_HISTORY_SLACK_DAYS)
+            for currency in wanted
+        ):
+            try:
+                await self._store(await self._fetch_history(wanted, lookback, end))
+            except Exception as e:
+                print(f"Error fetching FX history: {str(e)}")
+
+        result = await self.db.execute(
+            select(FxRate.currency, FxRate.date, FxRate.rate)
+            .where(FxRate.currency.in_(wanted), FxRate.date >= lookback, FxRate.date <= end)
+            .order_by(FxRate.currency, FxRate.date)
+        )
+        known = {currency: np.full(days + 7, np.nan) for currency in wanted}
+        for currency, day, rate in result.all():
+            known[currency][(day - lookback).days] = rate
+        for currency, series in known.items():
+            filled = np.maximum.accumulate(np.where(np.isnan(series), 0, np.arange(len(series))))
+            series = series[filled][7:]
+            if np.isnan(series).all():
+                raise ValueError(f"No exchange rate history for {currency}")
+            # Days before the first published rate take the earliest one
+            series[np.isnan(series)] = series[~np.isnan(series)][0]
+            rates[currency] = series
+        return rates
+
+    async def _fetch_latest(self, currencies: List[str]) -> Tuple[date, Dict[str, float]]:
+        async with aiohttp.ClientSession() as session:
+            params = {"from": PRICE_CURRENCY, "to": ",".join(currencies)}
+            with track_provider("fx", "latest"):
+                async with session.get(f"{self.BASE_URL}/latest", params=params) as response:
+                    if response.status != 200:
+                        raise Exception(f"FX API error: {await response.text()}")
+                    data = await response.json()
+        return date.fromisoformat(data["date"]), {c: float(r) for c, r in data["rates"].items()}
+
+    async def _fetch_history(self, currencies: List[str], start: date, end: date) -> Dict[date, Dict[str, float]]:
+        async with aiohttp.ClientSession() as session:
+            params = {"from": PRICE_CURRENCY, "to": ",".join(currencies)}
+            with track_provider("fx", "history"):
+                async with session.get(f"{self.BASE_URL}/{start.isoformat()}..{end.isoformat()}", params=params) as response:
+                    if response.status != 200:
+                        raise Exception(f"FX API error: {await response.text()}")
+                    data = await response.json()
+        return {
+            date.fromisoformat(day): {c: float(r) for c, r in rates.items()}
+            for day, rates in data["rates"].items()
+        }
+
+    async def _store(self, rates_by_day: Dict[date, Dict[str, float]]):
+        if self.db is None:
+            return
+        rows = [
+            {"currency": currency, "date": day, "rate": rate}
+            for day, rates in rates_by_day.items()
+            for currency, rate in rates.items()
+        ]
+        if not rows:
+            return
+        for begin in range(0, len(rows), 5000):
+            await self.db.execute(
+                insert(FxRate).on_conflict_do_nothing(index_elements=["currency", "date"]),
+                rows[begin:begin + 5000]
+            )
+        await self.db.commit()
+
+    async def _stored_latest(self, currencies: List[str]) -> Dict[str, float]:
+        newest = (
+            select(FxRate.currency, func.max(FxRate.date).label("date"))
+            .where(FxRate.currency.in_(currencies))
+            .group_by(FxRate.currency)
+            .subquery()
+        )
+        result = await self.db.execute(
+            select(FxRate.currency, FxRate.rate)
+            .join(newest, (FxRate.currency == newest.c.currency) & (FxRate.date == newest.c.date))
+        )
+        return dict(result.all())
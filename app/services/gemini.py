@@ -7,10 +7,12 @@ import base64
 import time
 from datetime import datetime
 from app.core.config import settings
+from app.core.metrics import track_provider
 from app.models.portfolio import AssetType, Platform
+from app.services.crypto_prices import crypto_price_router
 
 class GeminiAPI:
-    BASE_URL = "https://api.gemini.com/v1"
+    BASE_URL = settings.GEMINI_BASE_URL
     
     def __init__(self):
         if not settings.GEMINI_API_KEY or not settings.GEMINI_API_SECRET:
@@ -47,10 +49,11 @@ class GeminiAPI:
         
         async with aiohttp.ClientSession() as session:
             url = f"{self.BASE_URL}/{endpoint}"
-            async with session.request(method, url, headers=headers) as response:
-                if response.status not in (200, 201):
-                    raise Exception(f"Gemini API request failed: {await response.text()}")
-                return await response.json()
+            with track_provider("gemini", endpoint.split("/")[0]):
+                async with session.request(method, url, headers=headers) as response:
+                    if response.status not in (200, 201):
+                        raise Exception(f"Gemini API request failed: {await response.text()}")
+                    return await response.json()
     
     async def get_balances(self) -> List[Dict]:
         """
@@ -61,20 +64,23 @@ class GeminiAPI:
             balances = await self._make_request("balances")
             positions = []
             
-            # Get current prices for all assets with balance > 0
-            for balance in balances:
-                if float(balance["amount"]) > 0:
-                    # Get current price
-                    ticker = await self._make_request(f"pubticker/{balance['currency']}usd")
-                    
-                    positions.append({
-                        "asset_symbol": balance["currency"],
-                        "asset_type": AssetType.CRYPTO,
-                        "quantity": float(balance["amount"]),
-                        "current_price": float(ticker["last"]),
-                        "average_price": float(balance.get("avg_price", 0)),
-                        "platform": Platform.GEMINI
-                    })
+            # Price all assets with balance > 0 in one routed batch; unpriced assets still sync
+            held = [balance for balance in balances if float(balance["amount"]) > 0]
+            try:
+                prices = await crypto_price_router().get_prices([balance["currency"] for balance in held])
+            except Exception as e:
+                print(f"Error fetching Gemini balance prices: {str(e)}")
+                prices = {}
+            
+            for balance in held:
+                positions.append({
+                    "asset_symbol": balance["currency"],
+                    "asset_type": AssetType.CRYPTO,
+                    "quantity": float(balance["amount"]),
+                    "current_price": prices.get(balance["currency"].upper()),
+                    "average_price": float(balance.get("avg_price", 0)),
+                    "platform": Platform.GEMINI
+                })
             
             return positions
         except Exception as e:
@@ -0,0 +1,132 @@
+from typing import Any, Dict, Optional
+from datetime import datetime, timedelta
+import hashlib
+import json
+import math
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.models.portfolio import InsightCacheEntry
+from app.services.ai_insights import INSIGHTS_MODEL, INSIGHTS_PROMPT_VERSION, generate_portfolio_insights
+
+def insights_cache_key(portfolio_data: Dict) -> str:
+    """
+    Content-address a portfolio for insight caching.
+    The portfolio, its symbols, their weights rounded to INSIGHTS_WEIGHT_TOLERANCE,
+    its total value on a log scale in INSIGHTS_VALUE_TOLERANCE steps and the
+    model/prompt version take part, so small price moves still hit the cache.
+    Insights quote the portfolio's dollar values, so scaling every position
+    misses it, and no two portfolios (or users) ever share an entry.
+    """
+    values: Dict[str, float] = {}
+    for holding in portfolio_data.get("holdings", []):
+        symbol = (holding.get("symbol") or holding.get("asset_symbol") or "").upper()
+        value = holding.get("current_value")
+        if value is None:
+            value = holding.get("quantity", 0) * holding.get("average_price", 0)
+        values[symbol] = values.get(symbol, 0) + value
+    
+    total = sum(values.values())
+    tolerance = settings.INSIGHTS_WEIGHT_TOLERANCE
+    weights = sorted(
+        (symbol, round(round(value / total / tolerance) * tolerance, 6) if total else 0)
+        for symbol, value in values.items()
+    )
+    value_bucket = round(math.log(total) / math.log1p(settings.INSIGHTS_VALUE_TOLERANCE)) if total > 0 else None
+    
+    normalized = json.dumps({
+        "portfolio_id": portfolio_data.get("id"),
+        "model": INSIGHTS_MODEL,
+        "prompt_version": INSIGHTS_PROMPT_VERSION,
+        "weights": weights,
+        "value_bucket": value_bucket
+    }, sort_keys=True)
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+def _is_cacheable(insights: Any) -> bool:
+    """False when the insights or anything nested in them (e.g. the market sentiment) carries an error"""
+    if isinstance(insights, dict):
+        return "error" not in insights and all(_is_cacheable(value) for value in insights.values())
+    if isinstance(insights, list):
+        return all(_is_cacheable(value) for value in insights)
+    return True
+
+class InsightCache:
+    """Postgres-backed insight cache shared by every worker"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get(self, cache_key: str) -> Optional[Dict]:
+        """Return unexpired cached insights, recording the hit (committed, so LRU eviction sees it)"""
+        now = datetime.utcnow()
+        result = await self.db.execute(
+            update(InsightCacheEntry)
+            .where(
+                InsightCacheEntry.cache_key == cache_key,
+                InsightCacheEntry.expires_at > now
+            )
+            .values(hits=InsightCacheEntry.hits + 1, last_accessed=now)
+            .returning(InsightCacheEntry.payload)
+        )
+        payload = result.scalar_one_or_none()
+        await self.db.commit()
+        record_cache("insights", payload is not None)
+        return payload
+    
+    async def set(self, cache_key: str, insights: Dict):
+        """Store insights for INSIGHTS_CACHE_TTL_SECONDS and evict beyond the size bound; failed results are skipped"""
+        if not _is_cacheable(insights):
+            return
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=settings.INSIGHTS_CACHE_TTL_SECONDS)
+        stmt = insert(InsightCacheEntry).values(
+            cache_key=cache_key,
+            payload=insights,
+            created_at=now,
+            expires_at=expires_at,
+            last_accessed=now,
+            hits=0
+        )
+        await self.db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[InsightCacheEntry.cache_key],
+                set_={
+                    "payload": stmt.excluded.payload,
+                    "created_at": now,
+                    "expires_at": expires_at,
+                    "last_accessed": now,
+                    "hits": 0
+                }
+            )
+        )
+        await self._evict(now)
+        await self.db.commit()
+    
+    async def _evict(self, now: datetime):
+        """Drop expired entries, then the least recently used ones beyond the size bound"""
+        await self.db.execute(
+            delete(InsightCacheEntry).where(InsightCacheEntry.expires_at <= now)
+        )
+        overflow = (
+            select(InsightCacheEntry.id)
+            .order_by(InsightCacheEntry.last_accessed.desc())
+            .offset(settings.INSIGHTS_CACHE_MAX_ENTRIES)
+        )
+        await self.db.execute(
+            delete(InsightCacheEntry).where(InsightCacheEntry.id.in_(overflow))
+        )
+
+async def cached_portfolio_insights(db: AsyncSession, portfolio_data: Dict) -> Dict:
+    """Serve insights for unchanged portfolios from the cache, generating and storing them otherwise"""
+    cache = InsightCache(db)
+    cache_key = insights_cache_key(portfolio_data)
+    cached = await cache.get(cache_key)
+    if cached is not None:
+        return {**cached, "cached": True}
+    
+    insights = await generate_portfolio_insights(portfolio_data)
+    await cache.set(cache_key, insights)
+    return {**insights, "cached": False}
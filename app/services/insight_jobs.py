@@ -0,0 +1,128 @@
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import enum
+import uuid
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.tracing import current_context, span
+from app.services.insight_cache import cached_portfolio_insights
+
+class JobStatus(str, enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class InsightJob:
+    def __init__(self, portfolio_id: int, user_id: int, portfolio_data: Dict):
+        self.id = uuid.uuid4().hex
+        self.portfolio_id = portfolio_id
+        self.user_id = user_id
+        self.portfolio_data = portfolio_data
+        self.status = JobStatus.PENDING
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.merged_requests = 0
+        # The submitting request's trace, continued by the worker task
+        self.trace_context = current_context()
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "portfolio_id": self.portfolio_id,
+            "status": self.status.value,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "merged_requests": self.merged_requests,
+            "result": self.result,
+            "error": self.error
+        }
+
+class InsightJobQueue:
+    """
+    In-process queue of insight jobs served by a fixed pool of worker tasks,
+    first in first out. Pending jobs for the same portfolio are merged. Jobs
+    live in this process only: another uvicorn worker does not know them.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._jobs: Dict[str, InsightJob] = {}
+        self._pending_by_portfolio: Dict[int, InsightJob] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Spawn the worker tasks on the running event loop"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, portfolio_id: int, user_id: int, portfolio_data: Dict) -> InsightJob:
+        """Queue a job, or merge into the portfolio's pending one"""
+        self._prune()
+        job = self._pending_by_portfolio.get(portfolio_id)
+        if job is not None:
+            # Latest holdings win
+            job.portfolio_data = portfolio_data
+            job.merged_requests += 1
+            return job
+
+        if self._queue is None:
+            raise RuntimeError("Insight job queue has not been started")
+        job = InsightJob(portfolio_id, user_id, portfolio_data)
+        self._jobs[job.id] = job
+        self._pending_by_portfolio[portfolio_id] = job
+        self._queue.put_nowait(job.id)
+        return job
+
+    def get(self, job_id: str) -> Optional[InsightJob]:
+        return self._jobs.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job = self._jobs.get(await self._queue.get())
+            if job is None or job.status != JobStatus.PENDING:
+                continue
+            await self._run(job)
+
+    async def _run(self, job: InsightJob):
+        self._pending_by_portfolio.pop(job.portfolio_id, None)
+        job.status = JobStatus.RUNNING
+        job.started_at = datetime.utcnow()
+        try:
+            with span("insight_job.run", parent=job.trace_context, job_id=job.id):
+                async with AsyncSessionLocal() as session:
+                    job.result = await cached_portfolio_insights(session, job.portfolio_data)
+            job.status = JobStatus.FAILED if "error" in job.result else JobStatus.COMPLETED
+            job.error = job.result.get("error")
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.utcnow()
+            job.portfolio_data = None
+
+    def _prune(self):
+        """Forget finished jobs older than INSIGHT_JOB_RETENTION_SECONDS"""
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.INSIGHT_JOB_RETENTION_SECONDS)
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+insight_job_queue = InsightJobQueue(settings.INSIGHT_JOB_WORKERS)
@@ -1,7 +1,13 @@
 from typing import Dict, List, Optional
+import asyncio
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from app.core.config import settings
 from app.services.alpaca_service import create_alpaca_service
+from app.services.diversification import (
+    CorrelationStructure, cached_structure, correlation_structure, diversification_metrics, remember_structure
+)
+from app.services.price_history import align_closes, shared_history
 from app.services.ai_insights import generate_portfolio_insights
 from app.models.portfolio import Portfolio, Holding
 
@@ -44,7 +50,7 @@ class PortfolioAnalytics:
                 print(f"Error processing {holding.asset_symbol}: {str(e)}")
         
         # Calculate portfolio diversification
-        diversification = self._calculate_diversification(holdings_data, total_value)
+        diversification = await self._calculate_diversification(holdings_data, total_value)
         
         # Calculate historical performance
         historical_performance = await self._calculate_historical_performance(portfolio.holdings)
@@ -66,7 +72,7 @@ class PortfolioAnalytics:
             "ai_insights": ai_insights
         }
     
-    def _calculate_diversification(self, holdings_data: List[Dict], total_value: float) -> Dict:
+    async def _calculate_diversification(self, holdings_data: List[Dict], total_value: float) -> Dict:
         """Calculate portfolio diversification metrics"""
         if not holdings_data or total_value == 0:
             return {"error": "No holdings data available"}
@@ -84,13 +90,52 @@ class PortfolioAnalytics:
         sorted_allocations = sorted(allocations, key=lambda x: x["percentage"], reverse=True)
         top_holdings = sorted_allocations[:3]
         
+        # Concentration and correlation metrics on value weights per symbol
+        weights: Dict[str, float] = {}
+        for holding in holdings_data:
+            symbol = holding["symbol"].upper()
+            weights[symbol] = weights.get(symbol, 0.0) + holding["current_value"] / total_value
+        structure = await self._correlation_structure(sorted(weights))
+        
         return {
             "allocations": allocations,
             "top_holdings": top_holdings,
-            "concentration_risk": len([a for a in allocations if a["percentage"] > 20]),
-            "number_of_holdings": len(holdings_data)
+            "number_of_holdings": len(holdings_data),
+            **diversification_metrics(weights, structure)
         }
     
+    async def _correlation_structure(self, symbols: List[str]) -> Optional[CorrelationStructure]:
+        """Correlations and correlated groups over daily closes, computed once per symbol set and day"""
+        end = date.today() - timedelta(days=1)
+        key = (tuple(symbols), end)
+        cached, structure = cached_structure(key)
+        if cached:
+            return structure
+        
+        start = end - timedelta(days=settings.DIVERSIFICATION_LOOKBACK_DAYS)
+        results = await asyncio.gather(
+            *(self.alpaca_service.get_daily_closes(symbol, start, end) for symbol in symbols),
+            return_exceptions=True
+        )
+        history = {}
+        failed = False
+        for symbol, closes in zip(symbols, results):
+            if isinstance(closes, Exception):
+                failed = True
+                print(f"Error fetching closes for {symbol}: {str(closes)}")
+            elif closes:
+                history[symbol] = (
+                    np.array([day.toordinal() for day in closes], dtype=np.int64),
+                    np.array(list(closes.values()), dtype=float)
+                )
+        days, closes = align_closes(history, symbols, start, end)
+        days, closes, covered, excluded = shared_history(days, closes, symbols)
+        structure = await asyncio.to_thread(correlation_structure, covered, days, closes, excluded)
+        # Fetch errors may be transient, so only a complete answer is kept for the day
+        if not failed:
+            remember_structure(key, structure)
+        return structure
+    
     async def _calculate_historical_performance(self, holdings: List[Holding]) -> Dict:
         """Calculate historical performance metrics"""
         try:
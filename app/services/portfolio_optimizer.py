@@ -0,0 +1,373 @@
+from typing import Dict, List, Optional, Tuple
+from datetime import date, timedelta
+import asyncio
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.portfolio import AssetType, Portfolio
+from app.services.fx import PRICE_CURRENCY
+from app.services.price_history import PriceHistoryService, periods_per_year, shared_history
+
+# Fewer daily returns than this cannot support a covariance estimate
+MIN_OBSERVATIONS = 30
+# Solver stops once no weight moves by more than this in an iteration
+WEIGHT_TOLERANCE = 1e-7
+MAX_ITERATIONS = 5000
+# Iterations between attempts to finish with exact solves on the active set
+POLISH_EVERY = 10
+ACTIVE_SET_STEPS = 8
+# Powers of ten searched for the ends of the frontier
+BRACKET_DECADES = 12
+# Weights this close to a limit count as sitting on it
+BOUND_TOLERANCE = 1e-9
+# Weights below this are reported as zero
+REPORT_EPSILON = 1e-6
+
+def shrunk_covariance(returns: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Ledoit-Wolf covariance of T x N returns, shrunk toward a scaled identity.
+    Returns (covariance, shrinkage intensity in [0, 1]).
+    """
+    observations, assets = returns.shape
+    centered = returns - returns.mean(axis=0)
+    sample = centered.T @ centered / observations
+    scale = np.trace(sample) / assets
+    target_distance = (np.sum(sample ** 2) - 2 * scale * np.trace(sample) + scale ** 2 * assets) / assets
+    if target_distance <= 0:
+        return sample, 0.0
+    # Sampling error of the sample covariance, from sum_t ||x_t x_t' - S||^2
+    row_norms = np.sum(centered ** 2, axis=1)
+    sampling_error = (np.sum(row_norms ** 2) / observations - np.sum(sample ** 2)) / (observations * assets)
+    shrinkage = float(np.clip(sampling_error / target_distance, 0.0, 1.0))
+    covariance = (1 - shrinkage) * sample
+    covariance[np.diag_indices(assets)] += shrinkage * scale
+    return covariance, shrinkage
+
+def project_capped_simplex(values: np.ndarray, lower: float, upper: float) -> np.ndarray:
+    """
+    Euclidean projection onto {w : sum(w) = 1, lower <= w <= upper}, exactly:
+    w = clip(values - tau, lower, upper) with tau found from the sorted breakpoints.
+    """
+    count = len(values)
+    points = np.concatenate([values - upper, values - lower])
+    order = np.argsort(points, kind="stable")
+    taus = points[order]
+    # Past v - upper a weight leaves its upper bound, past v - lower it sits on its lower bound
+    free = np.cumsum(np.where(order < count, 1, -1))
+    # Sum of the clipped weights at each breakpoint; falls from count * upper to count * lower
+    totals = count * upper - np.concatenate([[0.0], np.cumsum(free[:-1] * np.diff(taus))])
+    segment = int(np.searchsorted(-totals, -1.0, side="right")) - 1
+    tau = taus[segment]
+    if segment < len(taus) - 1 and free[segment] > 0:
+        tau += (totals[segment] - 1.0) / free[segment]
+    return np.clip(values - tau, lower, upper)
+
+class MeanVarianceOptimizer:
+    """
+    Long-only mean-variance optimization with per-position limits over annualized
+    expected returns and covariance. Every portfolio is the solution of
+    max mu'w - gamma/2 w'Cw on the capped simplex for some risk aversion gamma,
+    solved by accelerated projected gradient (FISTA with adaptive restart).
+    """
+
+    def __init__(self, expected_returns: np.ndarray, covariance: np.ndarray,
+                 min_weight: float = 0.0, max_weight: float = 1.0):
+        count = len(expected_returns)
+        if count == 0:
+            raise ValueError("No assets to optimize")
+        if min_weight < 0 or min_weight > max_weight:
+            raise ValueError("Position limits must satisfy 0 <= min_weight <= max_weight")
+        if max_weight * count < 1 - 1e-12 or min_weight * count > 1 + 1e-12:
+            raise ValueError(f"Position limits [{min_weight}, {max_weight}] cannot be met with {count} assets")
+        self.expected_returns = np.asarray(expected_returns, dtype=float)
+        self.covariance = np.asarray(covariance, dtype=float)
+        self.min_weight = float(min_weight)
+        self.max_weight = float(max_weight)
+        self.largest_eigenvalue = float(np.linalg.eigvalsh(self.covariance)[-1])
+        self._min_variance: Optional[np.ndarray] = None
+        # Highest attainable return: fill the best assets up to the limit
+        order = np.argsort(-self.expected_returns, kind="stable")
+        weights = np.full(count, self.min_weight)
+        room = 1 - weights.sum()
+        for index in order:
+            add = min(self.max_weight - self.min_weight, room)
+            weights[index] += add
+            room -= add
+            if room <= 0:
+                break
+        self.max_return = float(self.expected_returns @ weights)
+
+    def stats(self, weights: np.ndarray, risk_free_rate: float = 0.0) -> Tuple[float, float, Optional[float]]:
+        """(expected return, volatility, Sharpe ratio) of a weight vector"""
+        expected = float(self.expected_returns @ weights)
+        volatility = float(np.sqrt(max(weights @ self.covariance @ weights, 0.0)))
+        sharpe = (expected - risk_free_rate) / volatility if volatility > 0 else None
+        return expected, volatility, sharpe
+
+    def solve(self, risk_aversion: Optional[float], start: Optional[np.ndarray] = None) -> np.ndarray:
+        """Maximize mu'w - gamma/2 w'Cw on the capped simplex; None means minimum variance"""
+        if risk_aversion is None:
+            risk_aversion, linear = 1.0, np.zeros_like(self.expected_returns)
+        else:
+            linear = self.expected_returns
+        count = len(linear)
+        weights = start if start is not None else np.full(count, 1.0 / count)
+        if self.largest_eigenvalue <= 0:
+            return project_capped_simplex(weights + linear, self.min_weight, self.max_weight)
+        step = 1.0 / (risk_aversion * self.largest_eigenvalue)
+        point, momentum = weights, 1.0
+        for iteration in range(MAX_ITERATIONS):
+            if iteration % POLISH_EVERY == 0:
+                exact = self._polish(weights, risk_aversion, linear)
+                if exact is not None:
+                    return exact
+            gradient = risk_aversion * (self.covariance @ point) - linear
+            candidate = project_capped_simplex(point - step * gradient, self.min_weight, self.max_weight)
+            change = candidate - weights
+            if np.abs(change).max() < WEIGHT_TOLERANCE:
+                return candidate
+            if (point - candidate) @ change > 0:
+                # Momentum is pointing uphill: restart from plain gradient steps
+                point, momentum = candidate, 1.0
+            else:
+                next_momentum = (1 + np.sqrt(1 + 4 * momentum ** 2)) / 2
+                point = candidate + (momentum - 1) / next_momentum * change
+                momentum = next_momentum
+            weights = candidate
+        return weights
+
+    def _polish(self, weights: np.ndarray, risk_aversion: float, linear: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Primal-dual active set: solve the KKT system exactly with the bounds active
+        at `weights` held fixed, move free weights that overshoot onto their bound
+        and release bounds whose multiplier has the wrong sign, and repeat.
+        Returns the solution once it is optimal for the full problem.
+        """
+        at_lower = weights <= self.min_weight + BOUND_TOLERANCE
+        at_upper = ~at_lower & (weights >= self.max_weight - BOUND_TOLERANCE)
+        for _ in range(ACTIVE_SET_STEPS):
+            free = ~(at_lower | at_upper)
+            size = int(free.sum())
+            if size == 0:
+                return None
+            candidate = np.where(at_upper, self.max_weight, self.min_weight)
+            candidate[free] = 0.0
+            # Free weights: C_FF w_F - eta 1 = mu_F / gamma - C_FB w_B, with 1'w_F = 1 - sum(w_B)
+            system = np.empty((size + 1, size + 1))
+            system[:size, :size] = self.covariance[np.ix_(free, free)]
+            system[:size, size] = -1.0
+            system[size, :size] = 1.0
+            system[size, size] = 0.0
+            rhs = np.empty(size + 1)
+            rhs[:size] = linear[free] / risk_aversion - self.covariance[free] @ candidate
+            rhs[size] = 1.0 - candidate.sum()
+            try:
+                solution = np.linalg.solve(system, rhs)
+            except np.linalg.LinAlgError:
+                return None
+            candidate[free] = solution[:size]
+            # Bound multipliers must point outward: raising a floored weight or cutting a capped one cannot help
+            slack = self.covariance @ candidate - linear / risk_aversion - solution[size]
+            tolerance = 1e-9 * (np.abs(slack).max() + abs(solution[size]) + 1e-12)
+            below = free & (candidate < self.min_weight - BOUND_TOLERANCE)
+            above = free & (candidate > self.max_weight + BOUND_TOLERANCE)
+            release = (at_lower & (slack < -tolerance)) | (at_upper & (slack > tolerance))
+            if not (below.any() or above.any() or release.any()):
+                return np.clip(candidate, self.min_weight, self.max_weight)
+            at_lower = (at_lower & ~release) | below
+            at_upper = (at_upper & ~release) | above
+        return None
+
+    def min_variance(self) -> np.ndarray:
+        """Minimum-variance portfolio"""
+        if self._min_variance is None:
+            self._min_variance = self.solve(None)
+        return self._min_variance
+
+    def frontier(self, points: int) -> List[Tuple[float, np.ndarray]]:
+        """
+        (risk aversion, weights) along the efficient frontier, from the
+        minimum-variance portfolio toward the highest-return one.
+        """
+        min_variance = self.min_variance()
+        low_return = float(self.expected_returns @ min_variance)
+        span = self.max_return - low_return
+        if points < 2 or span <= 1e-12:
+            return [(np.inf, min_variance)]
+
+        # Bracket risk aversion: high enough to sit on min variance, low enough to reach max return
+        high = max(np.ptp(self.expected_returns), 1e-12) / max(self.largest_eigenvalue, 1e-12)
+        weights = self.solve(high, min_variance)
+        for _ in range(BRACKET_DECADES):
+            if self.expected_returns @ weights - low_return <= 1e-3 * span:
+                break
+            high *= 10
+            weights = self.solve(high, weights)
+        solved = {high: weights}
+        low = high
+        for _ in range(2 * BRACKET_DECADES):
+            if self.max_return - self.expected_returns @ weights <= 1e-3 * span:
+                break
+            low /= 10
+            weights = self.solve(low, weights)
+            solved[low] = weights
+
+        # Space the points evenly in return: guess each one's risk aversion by
+        # interpolating log(gamma) between the points solved so far
+        top_return = float(self.expected_returns @ solved[low])
+        chosen = [low]
+        for target in np.linspace(low_return, top_return, points)[1:-1]:
+            gammas = sorted(solved, reverse=True)
+            returns = [float(self.expected_returns @ solved[g]) for g in gammas]
+            guess = float(np.exp(np.interp(target, returns, np.log(gammas))))
+            nearest = min(gammas, key=lambda g: abs(np.log(g / guess)))
+            solved[guess] = self.solve(guess, solved[nearest])
+            chosen.append(guess)
+        return [(np.inf, min_variance)] + [(g, solved[g]) for g in sorted(set(chosen), reverse=True)]
+
+    def target_return(self, target: float, frontier: List[Tuple[float, np.ndarray]]) -> np.ndarray:
+        """Minimum-variance portfolio earning at least `target`, bracketed by the frontier"""
+        if target > self.max_return + 1e-12:
+            raise ValueError(f"Target return {target:.4f} exceeds the highest attainable {self.max_return:.4f}")
+        returns = [float(self.expected_returns @ w) for _, w in frontier]
+        if target <= returns[0]:
+            return frontier[0][1]
+        above = next((i for i, r in enumerate(returns) if r >= target), None)
+        if above is None:
+            # Beyond the last frontier point: head toward the all-return end
+            high, weights = frontier[-1][0], frontier[-1][1]
+            low = high / 10
+            while self.expected_returns @ self.solve(low, weights) < target and low > 1e-12:
+                high, low = low, low / 10
+        else:
+            high, low, weights = frontier[above - 1][0], frontier[above][0], frontier[above][1]
+            if not np.isfinite(high):
+                high = low * 1e3
+        # Return falls as risk aversion rises: bisect log(gamma) for the target
+        for _ in range(40):
+            middle = np.sqrt(high * low)
+            candidate = self.solve(middle, weights)
+            if self.expected_returns @ candidate >= target:
+                low, weights = middle, candidate
+            else:
+                high = middle
+            if high / low < 1 + 1e-4:
+                break
+        return weights
+
+    def max_sharpe(self, risk_free_rate: float, frontier: List[Tuple[float, np.ndarray]]) -> np.ndarray:
+        """Tangency portfolio: best Sharpe ratio on the frontier, refined by golden-section search"""
+        sharpes = [self.stats(w, risk_free_rate)[2] for _, w in frontier]
+        scores = [s if s is not None else -np.inf for s in sharpes]
+        best = int(np.argmax(scores))
+        if len(frontier) < 3:
+            return frontier[best][1]
+        neighbours = [frontier[max(best - 1, 0)][0], frontier[min(best + 1, len(frontier) - 1)][0]]
+        finite = [g for g in neighbours + [frontier[best][0]] if np.isfinite(g)]
+        if not finite:
+            return frontier[best][1]
+        upper = np.log(max(finite) if np.isfinite(neighbours[0]) else max(finite) * 1e3)
+        lower = np.log(min(finite))
+        weights = frontier[best][1]
+        best_weights, best_score = weights, scores[best]
+        ratio = (np.sqrt(5) - 1) / 2
+
+        def score(log_gamma: float) -> Tuple[float, np.ndarray]:
+            nonlocal weights
+            weights = self.solve(float(np.exp(log_gamma)), weights)
+            sharpe = self.stats(weights, risk_free_rate)[2]
+            return (sharpe if sharpe is not None else -np.inf), weights
+
+        left, right = upper - ratio * (upper - lower), lower + ratio * (upper - lower)
+        left_score, left_weights = score(left)
+        right_score, right_weights = score(right)
+        for _ in range(30):
+            if upper - lower < 1e-3:
+                break
+            if left_score > right_score:
+                upper, right, right_score, right_weights = right, left, left_score, left_weights
+                left = upper - ratio * (upper - lower)
+                left_score, left_weights = score(left)
+            else:
+                lower, left, left_score, left_weights = left, right, right_score, right_weights
+                right = lower + ratio * (upper - lower)
+                right_score, right_weights = score(right)
+        for candidate_score, candidate in ((left_score, left_weights), (right_score, right_weights)):
+            if candidate_score > best_score:
+                best_weights, best_score = candidate, candidate_score
+        return best_weights
+
+class PortfolioOptimizer:
+    """
+    Mean-variance optimization of a portfolio's holdings (plus any candidate
+    symbols) from daily closes in local price history: shrinkage covariance,
+    minimum-variance, max-Sharpe and target-return portfolios, and the frontier.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.price_history = PriceHistoryService(db)
+
+    async def optimize_portfolio(self, portfolio: Portfolio, symbols: Optional[List[str]] = None,
+                                 lookback_days: int = 730, min_weight: float = 0.0, max_weight: float = 1.0,
+                                 target_return: Optional[float] = None, risk_free_rate: float = 0.0,
+                                 frontier_points: int = 20, currency: str = PRICE_CURRENCY) -> Dict:
+        """Optimal weights over the portfolio's non-cash holdings and `symbols` (holdings preloaded)"""
+        held: Dict[str, float] = {}
+        for holding in portfolio.holdings:
+            if holding.asset_type != AssetType.CASH:
+                held[holding.asset_symbol] = held.get(holding.asset_symbol, 0.0) + holding.quantity
+        universe = sorted(set(held) | {s.upper() for s in symbols or []})
+        if not universe:
+            raise ValueError("Portfolio has no assets to optimize")
+
+        end = date.today() - timedelta(days=1)
+        start = end - timedelta(days=lookback_days)
+        days, closes = await self.price_history.aligned_closes(universe, start, end, currency)
+        # Start once every asset has a close, so each return row is complete
+        days, closes, assets, excluded = shared_history(days, closes, universe)
+        if len(days) <= MIN_OBSERVATIONS:
+            raise ValueError(f"Not enough shared price history: {max(len(days) - 1, 0)} daily returns")
+
+        portfolio_id = portfolio.id
+
+        # Covariance, solves and frontier are CPU-bound; they run off the event loop
+        def optimize() -> Dict:
+            returns = closes[1:] / closes[:-1] - 1
+            per_year = periods_per_year(days)
+            covariance, shrinkage = shrunk_covariance(returns)
+            covariance *= per_year
+            expected = returns.mean(axis=0) * per_year
+            optimizer = MeanVarianceOptimizer(expected, covariance, min_weight, max_weight)
+
+            def report(weights: np.ndarray) -> Dict:
+                expected_return, volatility, sharpe = optimizer.stats(weights, risk_free_rate)
+                return {
+                    "weights": {s: round(float(w), 6) for s, w in zip(assets, weights) if w > REPORT_EPSILON},
+                    "expected_return": expected_return,
+                    "volatility": volatility,
+                    "sharpe_ratio": sharpe
+                }
+
+            frontier = optimizer.frontier(frontier_points)
+            values = np.array([held.get(s, 0.0) for s in assets]) * closes[-1]
+            current = report(values / values.sum()) if values.sum() > 0 else None
+            return {
+                "portfolio_id": portfolio_id,
+                "currency": currency,
+                "start": date.fromordinal(int(days[0])),
+                "end": date.fromordinal(int(days[-1])),
+                "observations": len(returns),
+                "shrinkage": shrinkage,
+                "assets": {
+                    s: {"expected_return": float(expected[i]), "volatility": float(np.sqrt(covariance[i, i]))}
+                    for i, s in enumerate(assets)
+                },
+                "excluded_symbols": excluded,
+                "current": current,
+                "min_variance": report(optimizer.min_variance()),
+                "max_sharpe": report(optimizer.max_sharpe(risk_free_rate, frontier)),
+                "target_return": report(optimizer.target_return(target_return, frontier)) if target_return is not None else None,
+                "frontier": [report(w) for _, w in frontier]
+            }
+
+        return await asyncio.to_thread(optimize)
@@ -1,8 +1,11 @@
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.fidelity import create_fidelity_client
 from app.services.gemini import create_gemini_client
+from app.services.portfolio_version import bump_portfolio_version
+from app.core.tracing import span
 from app.models.portfolio import (
     Portfolio, Holding, Transaction,
     Platform, PlatformCredential
@@ -26,7 +29,8 @@ class PortfolioSyncService:
         try:
             gemini_client = await create_gemini_client()
             if gemini_client:
-                await self._sync_gemini(user_id)
+                with span("sync.gemini", user_id=user_id):
+                    await self._sync_gemini(user_id)
                 result["success"].append("Successfully synced Gemini portfolio")
             else:
                 result["errors"].append("Gemini credentials not configured in Doppler")
@@ -43,7 +47,7 @@ class PortfolioSyncService:
         
         # Get or create Gemini portfolio
         result = await self.db.execute(
-            Portfolio.select().where(
+            select(Portfolio).where(
                 Portfolio.user_id == user_id,
                 Portfolio.name == "Gemini Portfolio"
             )
@@ -66,7 +70,7 @@ class PortfolioSyncService:
         # Update holdings
         for position in positions:
             result = await self.db.execute(
-                Holding.select().where(
+                select(Holding).where(
                     Holding.portfolio_id == portfolio.id,
                     Holding.asset_symbol == position["asset_symbol"]
                 )
@@ -90,4 +94,5 @@ class PortfolioSyncService:
                 )
                 self.db.add(holding)
         
+        await bump_portfolio_version(self.db, portfolio.id)
         await self.db.commit() 
\ No newline at end of file
@@ -0,0 +1,33 @@
+from typing import Iterable, Optional, Tuple
+from datetime import datetime
+import hashlib
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.portfolio import Portfolio
+
+async def bump_portfolio_version(db: AsyncSession, portfolio_id: int):
+    """Mark a portfolio as changed so cached representations (ETags) are invalidated"""
+    await db.execute(
+        update(Portfolio)
+        .where(Portfolio.id == portfolio_id)
+        .values(version=Portfolio.version + 1, updated_at=datetime.utcnow())
+    )
+
+def portfolio_etag(portfolio_id: int, version: int) -> str:
+    return f'"p{portfolio_id}-v{version}"'
+
+def portfolio_list_etag(versions: Iterable[Tuple[int, int]]) -> str:
+    """Aggregate ETag over (portfolio id, version) pairs ordered by id"""
+    digest = hashlib.sha256(
+        ",".join(f"{portfolio_id}:{version}" for portfolio_id, version in versions).encode()
+    ).hexdigest()
+    return f'"pl-{digest[:32]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 prescribes for this header)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
@@ -0,0 +1,222 @@
+from typing import Dict, List, Optional, Tuple
+from datetime import date, datetime, timedelta
+import asyncio
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.portfolio import PriceHistory, PriceHistoryFetch
+from app.services.alpaca_service import create_alpaca_service
+from app.services.coingecko_service import COINGECKO_IDS, create_coingecko_service, coin_id_for_symbol
+from app.services.fx import FxService, PRICE_CURRENCY
+
+# Stock bars skip weekends and holidays, so history ending this close to the wanted date is current
+PRICE_HISTORY_SLACK_DAYS = 4
+# A symbol whose backfill raised (e.g. one the provider does not list) is not asked again for this long
+PRICE_HISTORY_RETRY_HOURS = 24
+
+def is_crypto_symbol(symbol: str) -> bool:
+    """For symbols that are not holdings (no asset_type): anything CoinGecko knows is crypto"""
+    return symbol.upper() in COINGECKO_IDS
+
+def needs_backfill(stored: Optional[Tuple[int, int]], fetch: Optional[PriceHistoryFetch],
+                   first: int, through: int, retry_after: datetime) -> bool:
+    """
+    Whether the stored closes (first and last date ordinal) together with the
+    dates already asked of the provider leave part of first..through uncovered.
+    A symbol that starts trading after `first` is covered once its range has
+    been fetched, whatever the provider returned for it.
+    """
+    if fetch is not None and fetch.failed and fetch.attempted_at > retry_after:
+        return False
+    ranges = [stored] if stored else []
+    if fetch is not None and fetch.fetched_from is not None:
+        ranges.append((fetch.fetched_from.toordinal(), fetch.fetched_through.toordinal()))
+    if not ranges:
+        return True
+    low = min(start for start, _ in ranges)
+    high = max(stop for _, stop in ranges)
+    return low > first + PRICE_HISTORY_SLACK_DAYS or high < through - PRICE_HISTORY_SLACK_DAYS
+
+def align_closes(history: Dict[str, Tuple[np.ndarray, np.ndarray]], symbols: List[str],
+                 start: date, end: date) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Closes of `symbols` on a shared calendar: every day on which any of them
+    traded, between start and end. Gaps carry the last close forward; days
+    before a symbol's first close are NaN. Returns (date ordinals, T x N closes).
+    """
+    first, last = start.toordinal(), end.toordinal()
+    size = last - first + 1
+    grid = np.full((size, len(symbols)), np.nan)
+    traded = np.zeros(size, dtype=bool)
+    for column, symbol in enumerate(symbols):
+        days, closes = history.get(symbol, (np.empty(0, dtype=np.int64), np.empty(0)))
+        in_range = (days >= first) & (days <= last)
+        grid[days[in_range] - first, column] = closes[in_range]
+        traded[days[in_range] - first] = True
+    rows = np.arange(size)[:, None]
+    last_known = np.maximum.accumulate(np.where(np.isnan(grid), 0, rows), axis=0)
+    grid = grid[last_known, np.arange(len(symbols))]
+    return np.flatnonzero(traded) + first, grid[traded]
+
+def shared_history(days: np.ndarray, closes: np.ndarray, symbols: List[str]) -> Tuple[np.ndarray, np.ndarray, List[str], List[str]]:
+    """
+    Trim aligned closes to the symbols that have any history and the days on
+    which all of them have a close. Returns (days, closes, symbols kept, symbols dropped).
+    """
+    priced = ~np.isnan(closes).all(axis=0) if len(days) else np.zeros(len(symbols), dtype=bool)
+    closes = closes[:, priced]
+    complete = ~np.isnan(closes).any(axis=1)
+    first = int(np.argmax(complete)) if complete.any() else len(days)
+    kept = [s for s, ok in zip(symbols, priced) if ok]
+    dropped = [s for s, ok in zip(symbols, priced) if not ok]
+    return days[first:], closes[first:], kept, dropped
+
+def periods_per_year(days: np.ndarray) -> float:
+    """Observations per year on a calendar of date ordinals (about 252 for stocks, 365 with crypto)"""
+    return (len(days) - 1) / ((days[-1] - days[0]) / 365.25)
+
+class PriceHistoryService:
+    """
+    Daily closes from the price_history table, backfilled from Alpaca bars and
+    CoinGecko history for symbols whose stored history does not cover the range.
+    Each backfill is recorded in price_history_fetches, so symbols listed after
+    the range starts, or not at all, are not fetched on every request.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.alpaca_service = None
+        self.coingecko_service = None
+
+    async def initialize(self):
+        """Initialize services"""
+        self.alpaca_service = await create_alpaca_service()
+        self.coingecko_service = await create_coingecko_service()
+
+    async def daily_closes(self, wanted: Dict[str, Tuple[date, bool]], end: date) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Closes (date ordinals, prices) per symbol. `wanted` maps each symbol to
+        the first day needed and whether it is crypto.
+        """
+        if not wanted:
+            return {}
+        result = await self.db.execute(
+            select(PriceHistory.symbol, func.min(PriceHistory.date), func.max(PriceHistory.date))
+            .where(PriceHistory.symbol.in_(list(wanted)))
+            .group_by(PriceHistory.symbol)
+        )
+        coverage = {symbol: (low.toordinal(), high.toordinal()) for symbol, low, high in result.all()}
+        result = await self.db.execute(
+            select(PriceHistoryFetch).where(PriceHistoryFetch.symbol.in_(list(wanted)))
+        )
+        fetches = {fetch.symbol: fetch for fetch in result.scalars().all()}
+        wanted_through = min(end.toordinal(), date.today().toordinal() - 1)
+        retry_after = datetime.utcnow() - timedelta(hours=PRICE_HISTORY_RETRY_HOURS)
+        missing = [
+            (symbol, first, is_crypto)
+            for symbol, (first, is_crypto) in wanted.items()
+            if needs_backfill(coverage.get(symbol), fetches.get(symbol), first.toordinal(), wanted_through, retry_after)
+        ]
+        if missing:
+            await self._backfill(missing, end)
+
+        result = await self.db.execute(
+            select(PriceHistory.symbol, PriceHistory.date, PriceHistory.close)
+            .where(
+                PriceHistory.symbol.in_(list(wanted)),
+                PriceHistory.date >= min(first for first, _ in wanted.values()),
+                PriceHistory.date <= end
+            )
+            .order_by(PriceHistory.symbol, PriceHistory.date)
+        )
+        grouped: Dict[str, Tuple[List[int], List[float]]] = {}
+        for symbol, day, close in result.all():
+            days, closes = grouped.setdefault(symbol, ([], []))
+            days.append(day.toordinal())
+            closes.append(close)
+        return {
+            symbol: (np.array(days, dtype=np.int64), np.array(closes, dtype=float))
+            for symbol, (days, closes) in grouped.items()
+        }
+
+    async def aligned_closes(self, symbols: List[str], start: date, end: date,
+                             currency: str = PRICE_CURRENCY) -> Tuple[np.ndarray, np.ndarray]:
+        """align_closes over stored (and backfilled) history, converted into `currency` at each day's rate"""
+        history = await self.daily_closes({s: (start, is_crypto_symbol(s)) for s in symbols}, end)
+        days, closes = align_closes(history, symbols, start, end)
+        if currency != PRICE_CURRENCY and len(days):
+            per_usd = (await FxService(self.db).daily_rates([currency], start, end))[currency]
+            closes = closes * per_usd[days - start.toordinal()][:, None]
+        return days, closes
+
+    async def _backfill(self, missing: List[Tuple[str, date, bool]], end: date):
+        """Fetch daily closes for the missing symbols concurrently and store them"""
+        if self.alpaca_service is None and self.coingecko_service is None:
+            await self.initialize()
+        today = date.today()
+
+        async def fetch(symbol: str, start: date, is_crypto: bool) -> Optional[List[Dict]]:
+            if is_crypto:
+                if not self.coingecko_service:
+                    return None
+                history = await self.coingecko_service.get_crypto_history(
+                    coin_id_for_symbol(symbol), days=(today - start).days + 1
+                )
+                closes = {point["timestamp"].date(): point["price"] for point in history}
+                source = "coingecko"
+            else:
+                if not self.alpaca_service:
+                    return None
+                closes = await self.alpaca_service.get_daily_closes(symbol, start, end)
+                source = "alpaca"
+            return [
+                {"symbol": symbol, "date": day, "close": float(close), "source": source}
+                for day, close in closes.items()
+                if start <= day <= end and day < today
+            ]
+
+        rows, fetched, failed = [], [], []
+        now = datetime.utcnow()
+        through = min(end, date.fromordinal(today.toordinal() - 1))
+        results = await asyncio.gather(*(fetch(*m) for m in missing), return_exceptions=True)
+        for (symbol, start, _), result in zip(missing, results):
+            if result is None:
+                # No provider configured: nothing was asked, so nothing is recorded
+                continue
+            if isinstance(result, Exception):
+                print(f"Error backfilling price history: {str(result)}")
+                failed.append({"symbol": symbol, "attempted_at": now, "failed": True})
+            else:
+                rows.extend(result)
+                fetched.append({
+                    "symbol": symbol, "fetched_from": start, "fetched_through": through,
+                    "attempted_at": now, "failed": False
+                })
+        for begin in range(0, len(rows), 5000):
+            await self.db.execute(
+                insert(PriceHistory).on_conflict_do_nothing(index_elements=["symbol", "date"]),
+                rows[begin:begin + 5000]
+            )
+        if fetched:
+            statement = insert(PriceHistoryFetch)
+            await self.db.execute(
+                statement.on_conflict_do_update(index_elements=["symbol"], set_={
+                    "fetched_from": func.least(PriceHistoryFetch.fetched_from, statement.excluded.fetched_from),
+                    "fetched_through": func.greatest(PriceHistoryFetch.fetched_through, statement.excluded.fetched_through),
+                    "attempted_at": statement.excluded.attempted_at,
+                    "failed": False
+                }),
+                fetched
+            )
+        if failed:
+            statement = insert(PriceHistoryFetch)
+            await self.db.execute(
+                statement.on_conflict_do_update(index_elements=["symbol"], set_={
+                    "attempted_at": statement.excluded.attempted_at,
+                    "failed": True
+                }),
+                failed
+            )
+        if rows or fetched or failed:
+            await self.db.commit()
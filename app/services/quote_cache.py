@@ -0,0 +1,257 @@
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from itertools import compress
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+import numpy as np
+from app.core.config import settings
+from app.core.metrics import record_cache
+
+MAGIC = b"PQUOTES1"
+# magic, slots, slot size, slots in use; padded to one cache line
+HEADER = struct.Struct("<8sIII")
+HEADER_SIZE = 64
+# seq, key, price, fetched at (epoch seconds): one cache line per slot
+SLOT = np.dtype([("seq", "<u8"), ("key", "S40"), ("price", "<f8"), ("fetched_at", "<f8")])
+SEQ = struct.Struct("<Q")
+FIELDS = struct.Struct("<40sdd")
+USED_OFFSET = 16
+# Start over once this share of the slots is taken, so probe chains stay short
+MAX_LOAD = 0.75
+# Seqlock retries for slots caught mid-write before they count as misses
+READ_RETRIES = 3
+
+def default_cache_path() -> str:
+    """A file in /dev/shm (memory-backed on Linux), or the temp dir elsewhere"""
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "portfolio-quotes")
+
+def layout_path(path: str, slots: int) -> str:
+    """
+    The table's file for this layout. Workers configured with another slot
+    count (or running a build with another slot format) map a file of their
+    own, since resizing one that others have mapped would fault their reads.
+    """
+    return f"{path}-{MAGIC.decode().lower()}-{slots}"
+
+class SharedQuoteCache:
+    """
+    Latest prices in a memory-mapped table every worker process on the host
+    maps, so one worker's provider fetch serves them all. Keys hash to fixed
+    slots by open addressing; each process interns the slot it found a key in.
+    Reads take no lock: every slot carries a sequence number that is odd while
+    it is being written (a seqlock), and a read that saw it change is retried.
+    Writers are serialized with flock on the file.
+    """
+
+    def __init__(self, path: str, slots: int):
+        self.path = layout_path(path, slots)
+        self.slots = slots
+        self._slots: Dict[str, int] = {}
+        size = HEADER_SIZE + slots * SLOT.itemsize
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                layout = HEADER.pack(MAGIC, slots, SLOT.itemsize, 0)[:USED_OFFSET]
+                if os.fstat(self._fd).st_size == 0:
+                    # New file: start from zeroed slots
+                    os.ftruncate(self._fd, size)
+                    os.pwrite(self._fd, HEADER.pack(MAGIC, slots, SLOT.itemsize, 0), 0)
+                elif os.fstat(self._fd).st_size != size or os.pread(self._fd, USED_OFFSET, 0) != layout:
+                    # Never truncated in place: other processes may have it mapped
+                    raise ValueError(f"{self.path} holds a quote table of another layout")
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        except Exception:
+            os.close(self._fd)
+            raise
+        self._map = mmap.mmap(self._fd, size)
+        self.table = np.frombuffer(self._map, dtype=SLOT, count=slots, offset=HEADER_SIZE)
+
+    def _offset(self, slot: int) -> int:
+        return HEADER_SIZE + slot * SLOT.itemsize
+
+    def _probe(self, key: bytes) -> Tuple[Optional[int], Optional[int]]:
+        """(slot holding the key, first empty slot on its chain)"""
+        start = zlib.crc32(key) % self.slots
+        keys = self.table["key"]
+        for step in range(self.slots):
+            slot = (start + step) % self.slots
+            found = keys[slot]
+            if found == key:
+                return slot, None
+            if not found:
+                return None, slot
+        return None, None
+
+    def get_many(self, keys: Iterable[str], max_age: float) -> Dict[str, float]:
+        """Prices stored for the keys within the last `max_age` seconds"""
+        names = list(keys)
+        slots = [self._slots.get(name, -1) for name in names]
+        if -1 in slots:
+            for position, name in enumerate(names):
+                if slots[position] == -1:
+                    slot, _ = self._probe(name.encode())
+                    if slot is not None:
+                        slots[position] = self._slots[name] = slot
+            known = [slot != -1 for slot in slots]
+            names, slots = list(compress(names, known)), list(compress(slots, known))
+        prices: Dict[str, float] = {}
+        now = time.time()
+        for _ in range(READ_RETRIES):
+            if not names:
+                break
+            index = np.array(slots, dtype=np.int64)
+            # Each row is copied sequence number first; re-reading it afterwards closes the seqlock
+            rows = self.table[index]
+            before = rows["seq"]
+            stable = (before == self.table["seq"][index]) & (before % 2 == 0)
+            # The table may have been cleared and the slot reused since it was interned
+            try:
+                expected = np.array(names, dtype=SLOT["key"])
+            except UnicodeEncodeError:
+                expected = np.array([name.encode() for name in names], dtype=SLOT["key"])
+            matches = rows["key"] == expected
+            hits = stable & matches & (now - rows["fetched_at"] <= max_age)
+            prices.update(compress(zip(names, rows["price"].tolist()), hits.tolist()))
+            if not matches.all():
+                for name in compress(names, (stable & ~matches).tolist()):
+                    self._slots.pop(name, None)
+            if stable.all():
+                break
+            retry = (~stable).tolist()
+            names, slots = list(compress(names, retry)), list(compress(slots, retry))
+        return prices
+
+    def put_many(self, prices: Dict[str, float]):
+        """Store prices, each slot under its seqlock"""
+        now = time.time()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            used = struct.unpack_from("<I", self._map, USED_OFFSET)[0]
+            # Keys already stored are overwritten in place; the rest need a slot each
+            located = {}
+            for key in prices:
+                encoded = key.encode()
+                if len(encoded) > SLOT["key"].itemsize:
+                    continue
+                slot = self._slots.get(key)
+                if slot is None or self.table["key"][slot] != encoded:
+                    slot, _ = self._probe(encoded)
+                located[key] = slot
+            new = sum(slot is None for slot in located.values())
+            if used + new > self.slots * MAX_LOAD:
+                # Clear once up front, so nothing this call writes is wiped
+                self._clear()
+                used = 0
+                located = dict.fromkeys(located)
+            for key, slot in located.items():
+                encoded = key.encode()
+                price = prices[key]
+                if slot is None:
+                    slot, empty = self._probe(encoded)
+                    if slot is None:
+                        if empty is None:
+                            continue
+                        slot = empty
+                        used += 1
+                offset = self._offset(slot)
+                seq = SEQ.unpack_from(self._map, offset)[0]
+                SEQ.pack_into(self._map, offset, seq + 1)
+                FIELDS.pack_into(self._map, offset + SEQ.size, encoded, price, now)
+                SEQ.pack_into(self._map, offset, seq + 2)
+                self._slots[key] = slot
+            struct.pack_into("<I", self._map, USED_OFFSET, used)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _clear(self):
+        """Empty every slot, keeping the sequence numbers moving so readers retry. Call with the lock held."""
+        seqs = self.table["seq"]
+        seqs |= 1
+        self.table["key"] = b""
+        self.table["price"] = 0.0
+        self.table["fetched_at"] = 0.0
+        seqs += 1
+        self._slots.clear()
+
+    def clear(self):
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            self._clear()
+            struct.pack_into("<I", self._map, USED_OFFSET, 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+class LocalQuoteCache:
+    """The same interface over a dict in this process: every worker warms its own copy"""
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self._prices: Dict[str, Tuple[float, float]] = {}
+
+    def get_many(self, keys: Iterable[str], max_age: float) -> Dict[str, float]:
+        now = time.time()
+        prices = {}
+        for key in keys:
+            entry = self._prices.get(key)
+            if entry is not None and now - entry[1] <= max_age:
+                prices[key] = entry[0]
+        return prices
+
+    def put_many(self, prices: Dict[str, float]):
+        if len(self._prices) + len(prices) > self.slots * MAX_LOAD:
+            self._prices.clear()
+        now = time.time()
+        for key, price in prices.items():
+            self._prices[key] = (price, now)
+
+    def clear(self):
+        self._prices.clear()
+
+_cache: Optional[Union[SharedQuoteCache, LocalQuoteCache]] = None
+_cache_opened = False
+
+def quote_cache() -> Optional[Union[SharedQuoteCache, LocalQuoteCache]]:
+    """The process's quote cache per QUOTE_CACHE_BACKEND (shared, local or none), opened on first use"""
+    global _cache, _cache_opened
+    if not _cache_opened:
+        _cache_opened = True
+        backend = settings.QUOTE_CACHE_BACKEND
+        if backend == "shared":
+            try:
+                _cache = SharedQuoteCache(settings.QUOTE_CACHE_PATH or default_cache_path(), settings.QUOTE_CACHE_SLOTS)
+            except Exception as e:
+                print(f"Failed to open shared quote cache, caching per worker: {str(e)}")
+                _cache = LocalQuoteCache(settings.QUOTE_CACHE_SLOTS)
+        elif backend == "local":
+            _cache = LocalQuoteCache(settings.QUOTE_CACHE_SLOTS)
+    return _cache
+
+def reset_quote_cache():
+    """Reopen the cache on next use (after changing the settings)"""
+    global _cache, _cache_opened
+    _cache, _cache_opened = None, False
+
+async def cached_quotes(provider: str, symbols: List[str],
+                        fetch: Callable[[List[str]], Awaitable[Dict[str, float]]]) -> Dict[str, float]:
+    """Latest prices by symbol: fresh cached ones, and the rest fetched from the provider and stored"""
+    cache = quote_cache()
+    if cache is None:
+        return await fetch(symbols)
+    keys = {f"{provider}:{symbol}": symbol for symbol in symbols}
+    cached = cache.get_many(keys, settings.QUOTE_CACHE_TTL_SECONDS)
+    prices = {keys[key]: price for key, price in cached.items()}
+    record_cache("quotes", True, len(prices))
+    record_cache("quotes", False, len(symbols) - len(prices))
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        fetched = await fetch(missing)
+        cache.put_many({f"{provider}:{symbol}": price for symbol, price in fetched.items()})
+        prices.update(fetched)
+    return prices
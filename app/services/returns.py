@@ -0,0 +1,377 @@
+from typing import Dict, List, Optional, Tuple
+from datetime import date
+import numpy as np
+from sqlalchemy import and_, delete, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.portfolio import AssetType, Holding, HoldingValuation, Portfolio, Transaction
+from app.services.fx import FxService, PRICE_CURRENCY
+from app.services.price_history import PriceHistoryService
+
+# Below this a position is treated as closed (float residue from partial sells)
+QUANTITY_EPSILON = 1e-9
+
+def build_daily_series(
+    start: int,
+    end: int,
+    tx_days: np.ndarray,
+    tx_quantity: np.ndarray,
+    tx_price: np.ndarray,
+    price_days: np.ndarray,
+    price_close: np.ndarray,
+    opening_quantity: float = 0.0,
+    opening_price: float = np.nan
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    End-of-day quantity, market value and net flow for each day from `start` to
+    `end` (date ordinals). Transaction quantities are signed (sells negative);
+    a flow is the money put in at the transaction price. Prices come from the
+    closes, falling back to the latest trade price, and carry forward over gaps.
+    """
+    n = end - start + 1
+    in_range = tx_days <= end
+    tx_days, tx_quantity, tx_price = tx_days[in_range], tx_quantity[in_range], tx_price[in_range]
+    index = tx_days - start
+    flow = np.bincount(index, weights=tx_quantity * tx_price, minlength=n)
+    quantity = opening_quantity + np.cumsum(np.bincount(index, weights=tx_quantity, minlength=n))
+    quantity[np.abs(quantity) < QUANTITY_EPSILON] = 0.0
+
+    known = np.full(n, np.nan)
+    known[0] = opening_price
+    known[index] = tx_price  # Sorted by time, so the day's last trade wins
+    in_range = (price_days >= start) & (price_days <= end)
+    known[price_days[in_range] - start] = price_close[in_range]
+    last_known = np.maximum.accumulate(np.where(np.isnan(known), 0, np.arange(n)))
+    price = known[last_known]
+
+    value = np.where(quantity == 0, 0.0, quantity * np.nan_to_num(price))
+    return quantity, value, flow
+
+def daily_returns(value: np.ndarray, flow: np.ndarray, opening_value: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Each day's return and whether anything was invested that day. Flows count
+    at the end of their day, so the day's move is earned on the previous close;
+    a day starting from nothing is measured on the money put in.
+    """
+    previous = np.concatenate(([opening_value], value[:-1]))
+    base = np.where(previous > 0, previous, np.maximum(flow, 0))
+    invested = base > 0
+    returns = np.divide(value - previous - flow, base, out=np.zeros_like(value), where=invested)
+    return returns, invested
+
+def time_weighted_return(value: np.ndarray, flow: np.ndarray, opening_value: float) -> Optional[float]:
+    """Chain-linked daily returns; None if nothing was invested in the period"""
+    returns, invested = daily_returns(value, flow, opening_value)
+    if not invested.any():
+        return None
+    return float(np.prod(1 + returns) - 1)
+
+def xirr(amounts: np.ndarray, days: np.ndarray, guess: float = 0.1) -> Optional[float]:
+    """
+    Annual rate at which the dated cash flows (negative = paid in) have zero
+    net present value. Newton's method, falling back to bisection.
+    """
+    if not ((amounts > 0).any() and (amounts < 0).any()):
+        return None
+    years = (days - days.min()) / 365.0
+
+    def npv(rate: float) -> float:
+        with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+            return float(np.sum(amounts / (1 + rate) ** years))
+
+    rate = guess
+    with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+        for _ in range(50):
+            discount = (1 + rate) ** years
+            value = np.sum(amounts / discount)
+            derivative = np.sum(-years * amounts / (discount * (1 + rate)))
+            if derivative == 0 or not np.isfinite(derivative):
+                break
+            step = value / derivative
+            rate -= step
+            if rate <= -1 or not np.isfinite(rate):
+                break
+            if abs(step) < 1e-10:
+                return float(rate)
+
+    low, high = -0.999999, 1.0
+    while npv(high) * npv(low) > 0 and high < 1e6:
+        high *= 10
+    if npv(high) * npv(low) > 0:
+        return None
+    for _ in range(200):
+        middle = (low + high) / 2
+        if npv(low) * npv(middle) <= 0:
+            high = middle
+        else:
+            low = middle
+        if high - low < 1e-10:
+            break
+    return (low + high) / 2
+
+def money_weighted_return(value: np.ndarray, flow: np.ndarray, opening_value: float, start: int) -> Optional[float]:
+    """XIRR of the opening value, the period's flows and the closing value"""
+    days = np.concatenate(([start - 1], start + np.arange(len(flow)), [start + len(flow) - 1]))
+    amounts = np.concatenate(([-opening_value], -flow, [value[-1] if len(value) else 0.0]))
+    nonzero = amounts != 0
+    return xirr(amounts[nonzero], days[nonzero].astype(float))
+
+def return_metrics(value: np.ndarray, flow: np.ndarray, opening_value: float, start: int) -> Dict:
+    """TWR, MWR and the money behind them for one series over [start, start + len)"""
+    days = len(value)
+    twr = time_weighted_return(value, flow, opening_value)
+    closing_value = float(value[-1]) if days else 0.0
+    net_flows = float(flow.sum())
+    return {
+        "start_value": float(opening_value),
+        "end_value": closing_value,
+        "net_flows": net_flows,
+        "gain": closing_value - opening_value - net_flows,
+        "twr": twr,
+        "twr_annualized": (1 + twr) ** (365 / days) - 1 if twr is not None and days >= 365 else None,
+        "mwr": money_weighted_return(value, flow, opening_value, start)
+    }
+
+def _currency(holding: Holding) -> str:
+    return (holding.currency or PRICE_CURRENCY).upper()
+
+async def invalidate_valuations(db: AsyncSession, changed_from: Dict[int, date]):
+    """Drop cached valuations of each holding from the date its transactions changed"""
+    if not changed_from:
+        return
+    await db.execute(
+        delete(HoldingValuation).where(or_(*(
+            and_(HoldingValuation.holding_id == holding_id, HoldingValuation.date >= day)
+            for holding_id, day in changed_from.items()
+        )))
+    )
+
+class _HoldingState:
+    """What the valuation cache and the uncached transactions say about one holding"""
+
+    __slots__ = ("holding", "first", "through", "seed_quantity", "seed_price", "tx_days", "tx_quantity", "tx_price")
+
+    def __init__(self, holding: Holding):
+        self.holding = holding
+        self.first: Optional[int] = None  # First day with activity
+        self.through: Optional[int] = None  # Last cached day
+        self.seed_quantity = 0.0
+        self.seed_price = np.nan
+        self.tx_days = np.empty(0, dtype=np.int64)
+        self.tx_quantity = np.empty(0)
+        self.tx_price = np.empty(0)
+
+class ReturnsService:
+    """
+    Time- and money-weighted returns from the Transaction table and local price
+    history. Daily holding valuations are cached in holding_valuations, so a
+    request only computes the days after the cache, and a new transaction only
+    invalidates its holding from the transaction's date on. Cached amounts are
+    in USD, converted at each day's rate, and reported in any currency.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.fx_service = FxService(db)
+        self.price_history = PriceHistoryService(db)
+
+    async def portfolio_returns(self, portfolios: List[Portfolio], start: Optional[date] = None,
+                                end: Optional[date] = None, include_holdings: bool = True,
+                                currency: str = PRICE_CURRENCY) -> Dict:
+        """Returns per holding, per portfolio and across all the given portfolios (holdings preloaded), in `currency`"""
+        end = min(end or date.today(), date.today())
+        states = await self._load_states([h for p in portfolios for h in p.holdings])
+        active = [s for s in states.values() if s.first is not None]
+        if start is None:
+            start = date.fromordinal(min((s.first for s in active), default=end.toordinal()))
+        if start > end:
+            raise ValueError("start must not be after end")
+
+        # Grid index 0 is the day before start, whose close is the opening value
+        grid_start = start.toordinal() - 1
+        grid_end = end.toordinal()
+        values: Dict[int, np.ndarray] = {}
+        flows: Dict[int, np.ndarray] = {}
+        await self._fill_window(active, grid_start, grid_end, values, flows)
+        if currency != PRICE_CURRENCY:
+            per_usd = (await self.fx_service.daily_rates([currency], date.fromordinal(grid_start), end))[currency]
+            for holding_id in values:
+                values[holding_id] *= per_usd
+                flows[holding_id] *= per_usd
+
+        def metrics(ids: List[int]) -> Dict:
+            size = grid_end - grid_start + 1
+            value = np.zeros(size)
+            flow = np.zeros(size)
+            for holding_id in ids:
+                value += values[holding_id]
+                flow += flows[holding_id]
+            return return_metrics(value[1:], flow[1:], value[0], start.toordinal())
+
+        results = []
+        for portfolio in portfolios:
+            tracked = [h for h in portfolio.holdings if h.id in values]
+            result = {
+                "id": portfolio.id,
+                "name": portfolio.name,
+                **metrics([h.id for h in tracked]),
+                "untracked_symbols": sorted({h.asset_symbol for h in portfolio.holdings if h.id not in values})
+            }
+            if include_holdings:
+                result["holdings"] = [
+                    {"id": h.id, "symbol": h.asset_symbol, **metrics([h.id])}
+                    for h in tracked
+                ]
+            results.append(result)
+
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "currency": currency,
+            **metrics(list(values)),
+            "portfolios": results
+        }
+
+    async def _load_states(self, holdings: List[Holding]) -> Dict[int, _HoldingState]:
+        """Cache extent per holding plus the transactions after it"""
+        states = {h.id: _HoldingState(h) for h in holdings}
+        if not states:
+            return states
+        ids = list(states)
+
+        heads = (
+            select(
+                HoldingValuation.holding_id,
+                func.min(HoldingValuation.date).label("first"),
+                func.max(HoldingValuation.date).label("through")
+            )
+            .where(HoldingValuation.holding_id.in_(ids))
+            .group_by(HoldingValuation.holding_id)
+            .subquery()
+        )
+        result = await self.db.execute(
+            select(heads.c.holding_id, heads.c.first, heads.c.through, HoldingValuation.quantity, HoldingValuation.market_value)
+            .join(HoldingValuation, and_(
+                HoldingValuation.holding_id == heads.c.holding_id,
+                HoldingValuation.date == heads.c.through
+            ))
+        )
+        for holding_id, first, through, quantity, market_value in result.all():
+            state = states[holding_id]
+            state.first, state.through = first.toordinal(), through.toordinal()
+            state.seed_quantity = quantity
+            if quantity:
+                state.seed_price = market_value / quantity
+
+        cached_through = (
+            select(func.max(HoldingValuation.date))
+            .where(HoldingValuation.holding_id == Transaction.holding_id)
+            .scalar_subquery()
+        )
+        result = await self.db.execute(
+            select(Transaction.holding_id, Transaction.transaction_type, Transaction.quantity, Transaction.price, Transaction.timestamp)
+            .where(
+                Transaction.holding_id.in_(ids),
+                or_(cached_through.is_(None), func.date(Transaction.timestamp) > cached_through)
+            )
+            .order_by(Transaction.timestamp, Transaction.id)
+        )
+        rows = result.all()
+        if rows:
+            holding_ids = np.array([r[0] for r in rows])
+            signs = np.array([-1.0 if (r[1] or "").lower() == "sell" else 1.0 for r in rows])
+            quantity = np.array([r[2] or 0.0 for r in rows]) * signs
+            price = np.array([r[3] or 0.0 for r in rows])
+            days = np.array([r[4].toordinal() for r in rows], dtype=np.int64)
+            for holding_id in np.unique(holding_ids):
+                state = states[int(holding_id)]
+                mine = holding_ids == holding_id
+                state.tx_days, state.tx_quantity, state.tx_price = days[mine], quantity[mine], price[mine]
+                if state.first is None:
+                    state.first = int(days[mine][0])
+        return states
+
+    async def _fill_window(self, states: List[_HoldingState], grid_start: int, grid_end: int,
+                           values: Dict[int, np.ndarray], flows: Dict[int, np.ndarray]):
+        """Each holding's value and flow on every grid day: cached days read back, later days computed and cached"""
+        size = grid_end - grid_start + 1
+        for state in states:
+            values[state.holding.id] = np.zeros(size)
+            flows[state.holding.id] = np.zeros(size)
+
+        cached = [s for s in states if s.through is not None and s.through >= grid_start]
+        if cached:
+            result = await self.db.execute(
+                select(HoldingValuation.holding_id, HoldingValuation.date, HoldingValuation.market_value, HoldingValuation.net_flow)
+                .where(
+                    HoldingValuation.holding_id.in_([s.holding.id for s in cached]),
+                    HoldingValuation.date >= date.fromordinal(grid_start),
+                    HoldingValuation.date <= date.fromordinal(grid_end)
+                )
+            )
+            for holding_id, day, market_value, net_flow in result.all():
+                values[holding_id][day.toordinal() - grid_start] = market_value
+                flows[holding_id][day.toordinal() - grid_start] = net_flow
+
+        extend_from = {s.holding.id: s.through + 1 if s.through is not None else s.first for s in states}
+        stale = [s for s in states if extend_from[s.holding.id] <= grid_end]
+        if not stale:
+            return
+        prices = await self._price_history(stale, extend_from, grid_end)
+        # Transaction prices (and cash) are in the holding's currency; everything cached is USD
+        fx_start = min(extend_from[s.holding.id] for s in stale)
+        per_usd = await self.fx_service.daily_rates(
+            {_currency(s.holding) for s in stale}, date.fromordinal(fx_start), date.fromordinal(grid_end)
+        )
+
+        today = date.today().toordinal()
+        new_rows = []
+        for state in stale:
+            holding = state.holding
+            first = extend_from[holding.id]
+            usd_per_unit = 1 / per_usd[_currency(holding)][first - fx_start:]
+            in_window = state.tx_days <= grid_end
+            tx_days = state.tx_days[in_window]
+            if holding.asset_type == AssetType.CASH:
+                price_days, price_close = np.arange(first, grid_end + 1), usd_per_unit
+                complete_through = min(today - 1, grid_end)
+            else:
+                price_days, price_close = prices.get(holding.asset_symbol.upper(), (np.empty(0, dtype=np.int64), np.empty(0)))
+                # Only days whose close is known are final; later days are recomputed next time
+                complete_through = min(today - 1, grid_end, int(price_days[-1])) if len(price_days) else first - 1
+            quantity, value, flow = build_daily_series(
+                first, grid_end, tx_days, state.tx_quantity[in_window], state.tx_price[in_window] * usd_per_unit[tx_days - first],
+                price_days, price_close, state.seed_quantity, state.seed_price
+            )
+            window = slice(max(first, grid_start) - first, None)
+            values[holding.id][max(first, grid_start) - grid_start:] = value[window]
+            flows[holding.id][max(first, grid_start) - grid_start:] = flow[window]
+            for offset in range(max(0, complete_through - first + 1)):
+                new_rows.append({
+                    "holding_id": holding.id,
+                    "date": date.fromordinal(first + offset),
+                    "quantity": float(quantity[offset]),
+                    "market_value": float(value[offset]),
+                    "net_flow": float(flow[offset])
+                })
+
+        if new_rows:
+            for begin in range(0, len(new_rows), 5000):
+                await self.db.execute(
+                    insert(HoldingValuation).on_conflict_do_nothing(index_elements=["holding_id", "date"]),
+                    new_rows[begin:begin + 5000]
+                )
+            await self.db.commit()
+
+    async def _price_history(self, states: List[_HoldingState], extend_from: Dict[int, int],
+                             end: int) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Closes per symbol from each symbol's earliest needed day"""
+        wanted: Dict[str, Tuple[date, bool]] = {}
+        for state in states:
+            if state.holding.asset_type == AssetType.CASH:
+                continue
+            symbol = state.holding.asset_symbol.upper()
+            first = date.fromordinal(extend_from[state.holding.id])
+            is_crypto = state.holding.asset_type == AssetType.CRYPTO
+            wanted[symbol] = (min(first, wanted.get(symbol, (first, is_crypto))[0]), is_crypto)
+        return await self.price_history.daily_closes(wanted, date.fromordinal(end))
@@ -0,0 +1,202 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from functools import partial
+from multiprocessing import get_context, shared_memory
+import asyncio
+import secrets
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.portfolio import AssetType, Portfolio
+from app.services.fx import PRICE_CURRENCY
+from app.services.portfolio_optimizer import MIN_OBSERVATIONS, shrunk_covariance
+from app.services.price_history import PriceHistoryService, shared_history
+from app.services.risk_simulation import input_layout, run_chunk, simulate_losses
+
+# Diagonal loading tried, relative to the mean variance, when the covariance is not positive definite
+CHOLESKY_JITTER = (0.0, 1e-10, 1e-8, 1e-6, 1e-4)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _process_pool() -> ProcessPoolExecutor:
+    """
+    Simulation workers, started on first use. Spawned rather than forked: the
+    server process has an event loop and threads running.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.RISK_WORKERS, mp_context=get_context("spawn"))
+    return _pool
+
+def shutdown_risk_pool():
+    """Stop the simulation workers, if any were started"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def cholesky_factor(covariance: np.ndarray) -> np.ndarray:
+    """Lower Cholesky factor, loading the diagonal slightly when the covariance is only semi-definite"""
+    scale = float(np.trace(covariance)) / len(covariance) or 1.0
+    for jitter in CHOLESKY_JITTER:
+        try:
+            return np.linalg.cholesky(covariance + jitter * scale * np.eye(len(covariance)))
+        except np.linalg.LinAlgError:
+            continue
+    raise ValueError("Covariance matrix is not positive semi-definite")
+
+def tail_risk(losses: np.ndarray, confidence_levels: Sequence[float]) -> List[Dict[str, float]]:
+    """VaR (the loss quantile) and CVaR (mean loss at or beyond it) per confidence level"""
+    levels = []
+    for confidence in confidence_levels:
+        var = float(np.quantile(losses, confidence))
+        levels.append({"confidence": confidence, "var": var, "cvar": float(losses[losses >= var].mean())})
+    return levels
+
+def historical_losses(closes: np.ndarray, weights: np.ndarray, horizon: int) -> np.ndarray:
+    """Losses of the weights, held unchanged, over every overlapping `horizon`-day window of the closes"""
+    growth = closes[horizon:] / closes[:-horizon]
+    return 1 - growth @ weights
+
+def _chunks(paths: int) -> List[Tuple[int, int, int]]:
+    """(chunk index, first path, end) for every chunk of settings.RISK_CHUNK_PATHS paths"""
+    size = settings.RISK_CHUNK_PATHS
+    return [(index, start, min(start + size, paths)) for index, start in enumerate(range(0, paths, size))]
+
+def simulate_inline(mean: np.ndarray, factor: np.ndarray, weights: np.ndarray, horizons: Sequence[int],
+                    paths: int, seed: int) -> np.ndarray:
+    """The whole simulation in this process, chunk by chunk: the same paths the pool would draw"""
+    losses = np.empty((len(horizons), paths))
+    for chunk, start, stop in _chunks(paths):
+        losses[:, start:stop] = simulate_losses(mean, factor, weights, horizons, seed, chunk, stop - start)
+    return losses
+
+async def simulate_pooled(mean: np.ndarray, factor: np.ndarray, weights: np.ndarray, horizons: Sequence[int],
+                          paths: int, seed: int) -> np.ndarray:
+    """
+    The simulation split into chunks across the worker processes. The inputs
+    are written once to a shared memory block every worker maps, and each
+    chunk writes its losses straight into a shared output block, so nothing
+    larger than the task arguments is pickled.
+    """
+    assets = len(mean)
+    inputs = shared_memory.SharedMemory(create=True, size=(assets + 2) * assets * 8)
+    outputs = shared_memory.SharedMemory(create=True, size=max(len(horizons) * paths * 8, 1))
+    block = view = None
+    try:
+        block = np.ndarray(((assets + 2) * assets,), buffer=inputs.buf)
+        for part, values in zip(input_layout(assets), (mean, factor, weights)):
+            block[part] = values.ravel()
+        loop = asyncio.get_running_loop()
+        pool = _process_pool()
+        await asyncio.gather(*(
+            loop.run_in_executor(pool, partial(
+                run_chunk, inputs.name, outputs.name, assets, tuple(horizons), paths, seed, chunk, start, stop
+            ))
+            for chunk, start, stop in _chunks(paths)
+        ))
+        view = np.ndarray((len(horizons), paths), buffer=outputs.buf)
+        return view.copy()
+    finally:
+        block = view = None
+        for segment in (inputs, outputs):
+            segment.close()
+            segment.unlink()
+
+class RiskService:
+    """
+    Value at Risk and expected shortfall (CVaR) of a portfolio's current
+    holdings: historical, from overlapping multi-day windows of shared daily
+    history, and Monte Carlo, from correlated normal log returns drawn through
+    a Cholesky factor of the shrunk covariance. Large simulations run in
+    chunks across a process pool; the same seed gives the same figures.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.price_history = PriceHistoryService(db)
+
+    async def value_at_risk(self, portfolio: Portfolio, confidence_levels: Sequence[float] = (0.95, 0.99),
+                            horizons: Sequence[int] = (1, 10), lookback_days: int = 730,
+                            paths: int = 100_000, seed: Optional[int] = None,
+                            currency: str = PRICE_CURRENCY) -> Dict:
+        """VaR and CVaR of the non-cash holdings per horizon (trading days) and confidence level"""
+        quantities: Dict[str, float] = {}
+        for holding in portfolio.holdings:
+            if holding.asset_type != AssetType.CASH:
+                quantities[holding.asset_symbol] = quantities.get(holding.asset_symbol, 0.0) + holding.quantity
+        if not quantities:
+            raise ValueError("Portfolio has no assets to assess")
+        horizons = sorted(set(horizons))
+        confidence_levels = sorted(set(confidence_levels))
+
+        end = date.today() - timedelta(days=1)
+        symbols = sorted(quantities)
+        days, closes = await self.price_history.aligned_closes(
+            symbols, end - timedelta(days=lookback_days), end, currency
+        )
+        days, closes, assets, excluded = shared_history(days, closes, symbols)
+        if len(days) <= max(horizons) + MIN_OBSERVATIONS:
+            raise ValueError("Not enough shared price history for the longest horizon")
+        held = np.array([quantities[s] for s in assets]) * closes[-1]
+        value = float(held.sum())
+        if value <= 0:
+            raise ValueError("Portfolio has no market value to assess")
+        weights = held / value
+
+        log_returns = np.diff(np.log(closes), axis=0)
+        covariance, shrinkage = shrunk_covariance(log_returns)
+        mean = log_returns.mean(axis=0)
+        factor = cholesky_factor(covariance)
+        seed = secrets.randbits(32) if seed is None else seed
+        pooled = paths * len(assets) > settings.RISK_INLINE_MAX_DRAWS
+        if pooled:
+            simulated = await simulate_pooled(mean, factor, weights, horizons, paths, seed)
+        else:
+            simulated = await asyncio.to_thread(simulate_inline, mean, factor, weights, horizons, paths, seed)
+
+        def summarize() -> List[Dict]:
+            def amounts(levels: List[Dict[str, float]]) -> List[Dict[str, float]]:
+                return [
+                    {
+                        "confidence": level["confidence"],
+                        "var": level["var"] * value,
+                        "cvar": level["cvar"] * value,
+                        "var_pct": level["var"],
+                        "cvar_pct": level["cvar"]
+                    }
+                    for level in levels
+                ]
+
+            report = []
+            for row, horizon in enumerate(horizons):
+                history = historical_losses(closes, weights, horizon)
+                report.append({
+                    "horizon_days": horizon,
+                    "historical": {
+                        "observations": len(history),
+                        "levels": amounts(tail_risk(history, confidence_levels))
+                    },
+                    "monte_carlo": {"levels": amounts(tail_risk(simulated[row], confidence_levels))}
+                })
+            return report
+
+        return {
+            "portfolio_id": portfolio.id,
+            "currency": currency,
+            "market_value": value,
+            "start": date.fromordinal(int(days[0])),
+            "end": date.fromordinal(int(days[-1])),
+            "observations": len(days),
+            "weights": {s: float(w) for s, w in zip(assets, weights)},
+            "excluded_symbols": excluded,
+            "horizons": await asyncio.to_thread(summarize),
+            "simulation": {
+                "paths": paths,
+                "seed": seed,
+                "chunks": len(_chunks(paths)),
+                "process_pool": pooled,
+                "covariance_shrinkage": shrinkage
+            }
+        }
@@ -0,0 +1,52 @@
+"""
+Monte Carlo kernel for VaR simulations. Worker processes import only this
+module (and numpy), never the app settings or database layers.
+"""
+from typing import Sequence, Tuple
+from multiprocessing import shared_memory
+import numpy as np
+
+def chunk_generator(seed: int, chunk: int) -> np.random.Generator:
+    """Independent stream for one chunk of paths, the same whichever process draws it"""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(chunk,)))
+
+def simulate_losses(mean: np.ndarray, factor: np.ndarray, weights: np.ndarray, horizons: Sequence[int],
+                    seed: int, chunk: int, paths: int) -> np.ndarray:
+    """
+    Portfolio losses, as fractions of its value, over `paths` draws of
+    correlated daily log returns (mean `mean`, covariance factor @ factor.T)
+    scaled to each horizon. Every horizon reuses the same draws.
+    Returns (horizons x paths).
+    """
+    shocks = chunk_generator(seed, chunk).standard_normal((paths, len(mean))) @ factor.T
+    scratch = np.empty_like(shocks)
+    losses = np.empty((len(horizons), paths))
+    for row, horizon in enumerate(horizons):
+        np.multiply(shocks, np.sqrt(horizon), out=scratch)
+        scratch += horizon * mean
+        np.expm1(scratch, out=scratch)
+        np.negative(scratch @ weights, out=losses[row])
+    return losses
+
+def input_layout(assets: int) -> Tuple[slice, slice, slice]:
+    """Where the mean, covariance factor and weights sit in the shared input block"""
+    return slice(0, assets), slice(assets, assets + assets * assets), slice(assets + assets * assets, (assets + 2) * assets)
+
+def run_chunk(inputs_name: str, outputs_name: str, assets: int, horizons: Tuple[int, ...],
+              total_paths: int, seed: int, chunk: int, start: int, stop: int):
+    """Worker entry point: read the inputs from shared memory and write one chunk's losses back"""
+    inputs = shared_memory.SharedMemory(name=inputs_name)
+    outputs = shared_memory.SharedMemory(name=outputs_name)
+    block = losses = None
+    try:
+        block = np.ndarray(((assets + 2) * assets,), buffer=inputs.buf)
+        mean, factor, weights = (block[part] for part in input_layout(assets))
+        losses = np.ndarray((len(horizons), total_paths), buffer=outputs.buf)
+        losses[:, start:stop] = simulate_losses(
+            mean, factor.reshape(assets, assets), weights, horizons, seed, chunk, stop - start
+        )
+    finally:
+        # Views into the segments must go before they can be closed
+        block = mean = factor = weights = losses = None
+        inputs.close()
+        outputs.close()
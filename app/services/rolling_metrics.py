@@ -0,0 +1,230 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from datetime import date, timedelta
+import math
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.portfolio import RollingMetric
+from app.services.price_history import PriceHistoryService, align_closes, is_crypto_symbol
+
+# Running sums drift with rounding; rebuild them from the buffer this often (amortized O(1))
+RECOMPUTE_EVERY = 10_000
+METRICS = ("volatility", "beta", "correlation", "sharpe")
+
+class RollingWindow:
+    """
+    Mean, variance and covariance of the last `size` (return, benchmark return)
+    pairs, kept with Welford updates that add the newest pair and remove the one
+    leaving the window: O(1) per push regardless of the window length.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.returns = np.zeros(size)
+        self.benchmark_returns = np.zeros(size)
+        self.pushes = 0
+        self._reset()
+
+    def _reset(self):
+        self.count = 0
+        self.mean = self.benchmark_mean = 0.0
+        self.m2 = self.benchmark_m2 = self.comoment = 0.0
+
+    def _add(self, x: float, y: float):
+        self.count += 1
+        dx, dy = x - self.mean, y - self.benchmark_mean
+        self.mean += dx / self.count
+        self.benchmark_mean += dy / self.count
+        self.m2 += dx * (x - self.mean)
+        self.benchmark_m2 += dy * (y - self.benchmark_mean)
+        self.comoment += dx * (y - self.benchmark_mean)
+
+    def _remove(self, x: float, y: float):
+        if self.count <= 1:
+            self._reset()
+            return
+        self.count -= 1
+        dx, dy = x - self.mean, y - self.benchmark_mean
+        self.mean -= dx / self.count
+        self.benchmark_mean -= dy / self.count
+        self.m2 -= dx * (x - self.mean)
+        self.benchmark_m2 -= dy * (y - self.benchmark_mean)
+        self.comoment -= dx * (y - self.benchmark_mean)
+
+    def push(self, x: float, y: float):
+        """Add a pair, dropping the oldest once the window is full"""
+        slot = self.pushes % self.size
+        if self.count == self.size:
+            self._remove(float(self.returns[slot]), float(self.benchmark_returns[slot]))
+        self.returns[slot] = x
+        self.benchmark_returns[slot] = y
+        self._add(x, y)
+        self.pushes += 1
+        if self.pushes % RECOMPUTE_EVERY == 0:
+            self._reset()
+            for offset in range(self.size):
+                slot = (self.pushes + offset) % self.size
+                self._add(float(self.returns[slot]), float(self.benchmark_returns[slot]))
+
+    @property
+    def full(self) -> bool:
+        return self.count == self.size
+
+    def metrics(self, periods_per_year: float) -> Dict[str, Optional[float]]:
+        """Annualized volatility and Sharpe ratio, beta and correlation against the benchmark"""
+        if self.count < 2:
+            return dict.fromkeys(METRICS)
+        variance = max(self.m2, 0.0) / (self.count - 1)
+        benchmark_m2 = max(self.benchmark_m2, 0.0)
+        spread = math.sqrt(max(self.m2, 0.0) * benchmark_m2)
+        return {
+            "volatility": math.sqrt(variance * periods_per_year),
+            "beta": self.comoment / benchmark_m2 if benchmark_m2 > 0 else None,
+            "correlation": self.comoment / spread if spread > 0 else None,
+            "sharpe": self.mean / math.sqrt(variance) * math.sqrt(periods_per_year) if variance > 0 else None
+        }
+
+class RollingState:
+    """A symbol's window against its benchmark, fed one bar (pair of closes) at a time"""
+
+    def __init__(self, size: int, periods_per_year: float):
+        self.window = RollingWindow(size)
+        self.periods_per_year = periods_per_year
+        self.last_day: Optional[int] = None
+        self.last_close: Optional[float] = None
+        self.last_benchmark_close: Optional[float] = None
+
+    def append(self, day: int, close: float, benchmark_close: float) -> Optional[Dict[str, Optional[float]]]:
+        """
+        Take the bar closing at `day` (a date ordinal, or any increasing bar
+        index for intraday bars); returns the metrics once the window is full.
+        Bars at or before the last one are ignored, so replays are harmless.
+        """
+        if self.last_day is not None and day <= self.last_day:
+            return None
+        previous, previous_benchmark = self.last_close, self.last_benchmark_close
+        self.last_day, self.last_close, self.last_benchmark_close = day, close, benchmark_close
+        if not previous or not previous_benchmark:
+            return None
+        self.window.push(close / previous - 1, benchmark_close / previous_benchmark - 1)
+        return self.window.metrics(self.periods_per_year) if self.window.full else None
+
+# (symbol, benchmark, window size) -> state as of its last stored point, shared by every request
+_states: "OrderedDict[Tuple[str, str, int], RollingState]" = OrderedDict()
+
+def _remember(key: Tuple[str, str, int], state: RollingState):
+    _states[key] = state
+    _states.move_to_end(key)
+    while len(_states) > settings.ROLLING_STATE_MAX_ENTRIES:
+        _states.popitem(last=False)
+
+class RollingMetricsService:
+    """
+    Rolling volatility, beta, correlation and Sharpe ratio per symbol, stored in
+    rolling_metrics. Bringing a symbol up to date only feeds the bars after its
+    last stored point through its in-memory window state; the stored series
+    are served to charts as they are.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.price_history = PriceHistoryService(db)
+
+    async def update(self, symbols: List[str], window: int, benchmark: Optional[str] = None):
+        """Compute and store the points each symbol is missing, through yesterday's close"""
+        benchmark = (benchmark or settings.ROLLING_BENCHMARK).upper()
+        symbols = sorted({s.upper() for s in symbols})
+        if not symbols:
+            return
+        result = await self.db.execute(
+            select(RollingMetric.symbol, func.max(RollingMetric.date))
+            .where(
+                RollingMetric.symbol.in_(symbols),
+                RollingMetric.benchmark == benchmark,
+                RollingMetric.window_size == window
+            )
+            .group_by(RollingMetric.symbol)
+        )
+        stored = {symbol: last.toordinal() for symbol, last in result.all()}
+        end = date.today() - timedelta(days=1)
+        earliest = end - timedelta(days=settings.ROLLING_HISTORY_DAYS)
+
+        # A state that sits on the last stored point needs only the bars after it;
+        # otherwise the window is rebuilt from the bars just before that point.
+        # The choice is kept: a concurrent update may move the cached state on
+        # while the closes load, and a fresh window fed from here would never fill
+        starts, resumed = {}, {}
+        for symbol in symbols:
+            state = _states.get((symbol, benchmark, window))
+            if symbol in stored and state is not None and state.last_day == stored[symbol]:
+                starts[symbol] = date.fromordinal(stored[symbol])
+                resumed[symbol] = state
+            elif symbol in stored:
+                starts[symbol] = max(earliest, date.fromordinal(stored[symbol]) - timedelta(days=2 * window + 10))
+            else:
+                starts[symbol] = earliest
+        first = min(starts.values())
+        wanted = {s: (start, is_crypto_symbol(s)) for s, start in starts.items()}
+        wanted[benchmark] = (first, is_crypto_symbol(benchmark))
+        history = await self.price_history.daily_closes(wanted, end)
+
+        rows = []
+        for symbol in symbols:
+            key = (symbol, benchmark, window)
+            days, closes = align_closes(history, [symbol, benchmark], starts[symbol], end)
+            usable = ~np.isnan(closes).any(axis=1)
+            days, closes = days[usable], closes[usable]
+            state = resumed.get(symbol) or RollingState(window, 365 if is_crypto_symbol(symbol) else 252)
+            for day, (close, benchmark_close) in zip(days.tolist(), closes.tolist()):
+                point = state.append(day, close, benchmark_close)
+                if point is not None and day > stored.get(symbol, 0):
+                    rows.append({
+                        "symbol": symbol, "benchmark": benchmark, "window_size": window,
+                        "date": date.fromordinal(day), **point
+                    })
+            cached = _states.get(key)
+            if cached is None or cached is state or (state.last_day or 0) >= (cached.last_day or 0):
+                _remember(key, state)
+
+        for begin in range(0, len(rows), 5000):
+            await self.db.execute(
+                insert(RollingMetric).on_conflict_do_nothing(
+                    index_elements=["symbol", "benchmark", "window_size", "date"]
+                ),
+                rows[begin:begin + 5000]
+            )
+        if rows:
+            await self.db.commit()
+
+    async def series(self, symbols: List[str], window: int, benchmark: Optional[str] = None,
+                     start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, Dict[str, List]]:
+        """Stored series per symbol, brought up to date first: columnar dates and metric values"""
+        benchmark = (benchmark or settings.ROLLING_BENCHMARK).upper()
+        symbols = sorted({s.upper() for s in symbols})
+        await self.update(symbols, window, benchmark)
+        query = (
+            select(
+                RollingMetric.symbol, RollingMetric.date, RollingMetric.volatility,
+                RollingMetric.beta, RollingMetric.correlation, RollingMetric.sharpe
+            )
+            .where(
+                RollingMetric.symbol.in_(symbols),
+                RollingMetric.benchmark == benchmark,
+                RollingMetric.window_size == window
+            )
+            .order_by(RollingMetric.symbol, RollingMetric.date)
+        )
+        if start:
+            query = query.where(RollingMetric.date >= start)
+        if end:
+            query = query.where(RollingMetric.date <= end)
+        series = {s: {"dates": [], **{m: [] for m in METRICS}} for s in symbols}
+        for symbol, day, *values in (await self.db.execute(query)).all():
+            points = series[symbol]
+            points["dates"].append(day)
+            for metric, value in zip(METRICS, values):
+                points[metric].append(value)
+        return series
@@ -0,0 +1,211 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+import numpy as np
+
+SECONDS_PER_DAY = 86400.0
+
+def _timestamp(value: Any) -> float:
+    """Epoch seconds; naive datetimes are taken as UTC, like the dates rendered from them"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+def _group_cumsum(values: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Cumulative sum restarting at every group boundary (rows must be grouped)"""
+    total = np.cumsum(values)
+    offsets = total[starts] - values[starts]
+    return total - np.repeat(offsets, counts)
+
+# Per symbol: (open quantity, and the quantity, cost and quantity-weighted time of the buys since it was last flat)
+PositionState = Dict[str, Tuple[float, float, float, float]]
+
+def summarize_transactions(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate transaction rows per symbol without any per-row Python arithmetic.
+    Realized P&L, win rate and holding periods use the average cost of the buys
+    made since the position was last flat.
+    """
+    return summarize_with_positions(transactions)[0]
+
+def summarize_with_positions(transactions: List[Dict[str, Any]],
+                             opening: Optional[PositionState] = None) -> Tuple[Dict[str, Any], PositionState]:
+    """
+    summarize_transactions for one period of a longer history: positions still
+    open from earlier periods (`opening`) carry their cost basis in, and the
+    positions left open at the end are returned for the next period.
+    """
+    opening = {symbol: state for symbol, state in (opening or {}).items() if state[0] > 0}
+    if not transactions:
+        return {"total_trades": 0, "symbols": []}, opening
+
+    # Open positions enter as one synthetic row per symbol, ahead of its trades
+    carried = list(opening)
+    symbols = np.array([tx["asset_symbol"] for tx in transactions] + carried)
+    real = np.concatenate((np.ones(len(transactions), dtype=bool), np.zeros(len(carried), dtype=bool)))
+    is_buy = np.array([str(tx["transaction_type"]).lower() == "buy" for tx in transactions] + [True] * len(carried))
+    quantity = np.array([tx["quantity"] for tx in transactions] + [0.0] * len(carried), dtype=float)
+    price = np.array([tx["price"] for tx in transactions] + [0.0] * len(carried), dtype=float)
+    ts = np.array([_timestamp(tx["timestamp"]) for tx in transactions] + [0.0] * len(carried), dtype=float)
+    carried_state = np.array([opening[symbol] for symbol in carried], dtype=float).reshape(-1, 4)
+
+    names, codes = np.unique(symbols, return_inverse=True)
+    order = np.lexsort((ts, real, codes))
+    codes, real, is_buy, quantity, price, ts = (
+        codes[order], real[order], is_buy[order], quantity[order], price[order], ts[order]
+    )
+
+    counts = np.bincount(codes, minlength=len(names))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    notional = quantity * price
+
+    net = np.where(is_buy, quantity, -quantity)
+    buy_qty = np.where(is_buy, quantity, 0.0)
+    buy_cost = buy_qty * price
+    buy_time = buy_qty * ts
+    synthetic = np.flatnonzero(~real)
+    source = order[synthetic] - len(transactions)
+    net[synthetic], buy_qty[synthetic], buy_cost[synthetic], buy_time[synthetic] = carried_state[source].T
+
+    # Open quantity after each row; selling more than is held floors it at zero
+    running = _group_cumsum(net, starts, counts)
+    floor = np.empty_like(running)
+    for start, count in zip(starts, counts):
+        floor[start:start + count] = np.minimum.accumulate(running[start:start + count])
+    position = running - np.minimum(floor, 0.0)
+    flat = position <= 1e-9 * np.maximum(quantity, 1.0)
+
+    # The cost basis restarts after every row that leaves the position flat
+    segment_start = np.zeros(len(codes), dtype=bool)
+    segment_start[starts] = True
+    segment_start[1:] |= flat[:-1]
+    segment_starts = np.flatnonzero(segment_start)
+    segment_counts = np.diff(np.append(segment_starts, len(codes)))
+
+    # Average cost and quantity-weighted buy time of the segment's buys up to each row
+    cum_buy_qty = _group_cumsum(buy_qty, segment_starts, segment_counts)
+    cum_buy_cost = _group_cumsum(buy_cost, segment_starts, segment_counts)
+    cum_buy_time = _group_cumsum(buy_time, segment_starts, segment_counts)
+
+    # A sell closes at most what was open before it
+    held = np.concatenate(([0.0], position[:-1]))
+    held[starts] = 0.0
+    closed_quantity = np.minimum(quantity, held)
+    closing = real & ~is_buy & (cum_buy_qty > 0) & (closed_quantity > 0)
+    safe_qty = np.where(cum_buy_qty > 0, cum_buy_qty, 1.0)
+    avg_cost = cum_buy_cost / safe_qty
+    pnl = np.where(closing, (price - avg_cost) * closed_quantity, 0.0)
+    held_days = np.where(closing, (ts - cum_buy_time / safe_qty) / SECONDS_PER_DAY, 0.0)
+
+    size = len(names)
+    trades = np.bincount(codes, weights=real, minlength=size).astype(int)
+    buys = np.bincount(codes, weights=real & is_buy, minlength=size)
+    turnover = np.bincount(codes, weights=notional, minlength=size)
+    net_quantity = np.bincount(codes, weights=np.where(real, net, 0.0), minlength=size)
+    realized = np.bincount(codes, weights=pnl, minlength=size)
+    closed = np.bincount(codes, weights=closing, minlength=size)
+    wins = np.bincount(codes, weights=closing & (pnl > 0), minlength=size)
+    closed_qty = np.bincount(codes, weights=np.where(closing, closed_quantity, 0.0), minlength=size)
+    held_weighted = np.bincount(codes, weights=held_days * np.where(closing, closed_quantity, 0.0), minlength=size)
+    ends = starts + counts - 1
+    # Synthetic rows sort first, so a symbol's first real trade follows them
+    firsts = starts + counts - trades
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        win_rate = np.where(closed > 0, wins / closed, np.nan)
+        holding_days = np.where(closed_qty > 0, held_weighted / closed_qty, np.nan)
+
+    per_symbol = [
+        {
+            "symbol": str(names[i]),
+            "trades": int(trades[i]),
+            "buys": int(buys[i]),
+            "sells": int(trades[i] - buys[i]),
+            "turnover": float(turnover[i]),
+            "net_quantity": float(net_quantity[i]),
+            "realized_pnl": float(realized[i]),
+            "win_rate": None if np.isnan(win_rate[i]) else float(win_rate[i]),
+            "avg_holding_days": None if np.isnan(holding_days[i]) else float(holding_days[i]),
+            "first_trade": datetime.utcfromtimestamp(ts[firsts[i]]).date().isoformat(),
+            "last_trade": datetime.utcfromtimestamp(ts[ends[i]]).date().isoformat()
+        }
+        for i in np.argsort(-turnover)
+        if trades[i]
+    ]
+
+    closing_positions: PositionState = {
+        str(names[i]): (
+            float(position[ends[i]]), float(cum_buy_qty[ends[i]]),
+            float(cum_buy_cost[ends[i]]), float(cum_buy_time[ends[i]])
+        )
+        for i in range(size)
+        if not flat[ends[i]]
+    }
+
+    total_closed = closed.sum()
+    return {
+        "total_trades": int(len(transactions)),
+        "first_trade": datetime.utcfromtimestamp(ts[real].min()).isoformat(),
+        "last_trade": datetime.utcfromtimestamp(ts[real].max()).isoformat(),
+        "total_turnover": float(turnover.sum()),
+        "realized_pnl": float(realized.sum()),
+        "win_rate": float(wins.sum() / total_closed) if total_closed else None,
+        "symbols": per_symbol
+    }, closing_positions
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English/numeric text)"""
+    return len(text) // 4 + 1
+
+def format_summary(summary: Dict[str, Any], token_budget: int) -> str:
+    """Render aggregates as compact text, dropping the smallest symbols once the budget is spent"""
+    win_rate = summary.get("win_rate")
+    lines = [
+        f"Trades: {summary['total_trades']} between {summary.get('first_trade')} and {summary.get('last_trade')}",
+        f"Turnover: ${summary.get('total_turnover', 0):,.2f}, realized P&L: ${summary.get('realized_pnl', 0):,.2f}, "
+        f"win rate: {'n/a' if win_rate is None else f'{win_rate:.0%}'}",
+        "symbol,trades,buys,sells,turnover,net_qty,realized_pnl,win_rate,avg_hold_days,first,last"
+    ]
+    used = estimate_tokens("\n".join(lines))
+    symbols = summary.get("symbols", [])
+
+    for i, s in enumerate(symbols):
+        symbol_win_rate = "" if s["win_rate"] is None else f"{s['win_rate']:.2f}"
+        holding_days = "" if s["avg_holding_days"] is None else f"{s['avg_holding_days']:.1f}"
+        line = (
+            f"{s['symbol']},{s['trades']},{s['buys']},{s['sells']},{s['turnover']:.2f},"
+            f"{s['net_quantity']:g},{s['realized_pnl']:.2f},{symbol_win_rate},{holding_days},"
+            f"{s['first_trade']},{s['last_trade']}"
+        )
+        cost = estimate_tokens(line)
+        if used + cost > token_budget:
+            lines.append(f"({len(symbols) - i} smaller symbols omitted)")
+            break
+        lines.append(line)
+        used += cost
+
+    return "\n".join(lines)
+
+def format_trade_tail(transactions: List[Dict[str, Any]], size: int, token_budget: int) -> str:
+    """Render the most recent trades, thinning them evenly until they fit the budget"""
+    if not transactions or size <= 0 or token_budget <= 0:
+        return ""
+
+    ts = np.array([_timestamp(tx["timestamp"]) for tx in transactions])
+    recent = np.argsort(ts)[-size:]
+    while len(recent):
+        text = "\n".join(
+            f"{transactions[i]['transaction_type'].upper()} {transactions[i]['asset_symbol']} "
+            f"{transactions[i]['quantity']:g} @ {transactions[i]['price']:.2f} on {transactions[i]['timestamp']}"
+            for i in recent
+        )
+        if estimate_tokens(text) <= token_budget:
+            return text
+        if len(recent) == 1:
+            break
+        # Keep every other trade, always including the latest
+        recent = recent[::-1][::2][::-1]
+    return ""
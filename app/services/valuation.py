@@ -0,0 +1,124 @@
+from typing import Dict, List, Optional
+from datetime import datetime
+import asyncio
+import numpy as np
+from app.models.portfolio import AssetType, Portfolio
+from app.services.alpaca_service import create_alpaca_service
+from app.services.crypto_prices import crypto_price_router
+from app.services.fx import FxService, PRICE_CURRENCY, convert
+
+class PortfolioValuationService:
+    """Values any number of portfolios against one batched price fetch"""
+
+    def __init__(self):
+        self.alpaca_service = None
+
+    async def initialize(self):
+        """Initialize services"""
+        self.alpaca_service = await create_alpaca_service()
+
+    async def get_prices(self, stock_symbols: List[str], crypto_symbols: List[str]) -> Dict[str, float]:
+        """Fetch current prices for deduplicated symbols, stocks and crypto concurrently"""
+        prices = {}
+
+        async def stocks():
+            if stock_symbols and self.alpaca_service:
+                prices.update(await self.alpaca_service.get_latest_prices(stock_symbols))
+
+        async def cryptos():
+            if crypto_symbols:
+                prices.update(await crypto_price_router().get_prices(crypto_symbols))
+
+        for result in await asyncio.gather(stocks(), cryptos(), return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f"Error fetching prices: {str(result)}")
+        return prices
+
+    async def value_portfolios(self, portfolios: List[Portfolio], currency: str = PRICE_CURRENCY,
+                               fx_service: Optional[FxService] = None) -> Dict:
+        """
+        Value portfolios with preloaded holdings, in `currency`.
+        Holdings without a current price are valued at cost and reported as unpriced.
+        Costs are converted at today's rate.
+        """
+        holdings = [(p_index, h) for p_index, p in enumerate(portfolios) for h in p.holdings]
+        symbols = np.array([h.asset_symbol.upper() for _, h in holdings], dtype=object)
+        is_crypto = np.array([h.asset_type == AssetType.CRYPTO for _, h in holdings], dtype=bool)
+        is_cash = np.array([h.asset_type == AssetType.CASH for _, h in holdings], dtype=bool)
+
+        prices = await self.get_prices(
+            sorted(set(symbols[~is_crypto & ~is_cash])),
+            sorted(set(symbols[is_crypto]))
+        )
+
+        owner = np.array([p_index for p_index, _ in holdings], dtype=np.int64)
+        quantity = np.array([h.quantity or 0.0 for _, h in holdings], dtype=float)
+        average_price = np.array([h.average_price or 0.0 for _, h in holdings], dtype=float)
+        current_price = np.array([prices.get(symbol, np.nan) for symbol in symbols], dtype=float)
+        current_price[is_cash] = 1.0
+        priced = ~np.isnan(current_price)
+        current_price = np.where(priced, current_price, average_price)
+
+        # Market prices are in USD; costs, cash and unpriced holdings in the holding's currency
+        holding_currency = np.array([(h.currency or PRICE_CURRENCY).upper() for _, h in holdings], dtype=object)
+        value_currency = np.where(priced & ~is_cash, PRICE_CURRENCY, holding_currency)
+        rates = await (fx_service or FxService()).latest_rates({currency, *holding_currency})
+        cost = convert(quantity * average_price, holding_currency, currency, rates)
+        value = convert(quantity * current_price, value_currency, currency, rates)
+        size = len(portfolios)
+        portfolio_value = np.bincount(owner, weights=value, minlength=size)
+        portfolio_cost = np.bincount(owner, weights=cost, minlength=size)
+        holding_counts = np.bincount(owner, minlength=size)
+
+        unpriced: Dict[int, set] = {}
+        for i in np.flatnonzero(~priced):
+            unpriced.setdefault(int(owner[i]), set()).add(symbols[i])
+
+        asset_types = np.array([h.asset_type.value if h.asset_type else "unknown" for _, h in holdings], dtype=object)
+        by_asset_type = {
+            asset_type: float(value[asset_types == asset_type].sum())
+            for asset_type in sorted(set(asset_types))
+        }
+
+        total_value = float(portfolio_value.sum())
+        total_cost = float(portfolio_cost.sum())
+        return {
+            "portfolios": [
+                {
+                    "id": portfolio.id,
+                    "name": portfolio.name,
+                    "holdings_count": int(holding_counts[i]),
+                    **_totals(float(portfolio_value[i]), float(portfolio_cost[i])),
+                    "unpriced_symbols": sorted(unpriced.get(i, ()))
+                }
+                for i, portfolio in enumerate(portfolios)
+            ],
+            "totals": {
+                "portfolios": size,
+                "holdings": len(holdings),
+                "symbols": len(set(symbols)),
+                **_totals(total_value, total_cost),
+                "by_asset_type": by_asset_type
+            },
+            "currency": currency,
+            "as_of": datetime.utcnow().isoformat()
+        }
+
+def _totals(value: float, cost: float) -> Dict:
+    gain_loss = value - cost
+    return {
+        "total_value": value,
+        "cost_basis": cost,
+        "gain_loss": gain_loss,
+        "gain_loss_percentage": (gain_loss / cost * 100) if cost else None
+    }
+
+async def create_valuation_service() -> Optional[PortfolioValuationService]:
+    """Create and initialize the valuation service"""
+    try:
+        service = PortfolioValuationService()
+        await service.initialize()
+        return service
+    except Exception as e:
+        print(f"Failed to create valuation service: {str(e)}")
+        return None
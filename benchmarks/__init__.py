@@ -0,0 +1,11 @@
+import os
+
+# Settings are read when app modules are imported; benchmarks never need real credentials
+for _key, _default in (
+    ("DATABASE_URL", "postgresql://bench@localhost/bench"),
+    ("JWT_SECRET", "bench"),
+    ("GEMINI_API_KEY", "bench"),
+    ("GEMINI_API_SECRET", "bench"),
+    ("OPENAI_API_KEY", "bench")
+):
+    os.environ.setdefault(_key, _default)
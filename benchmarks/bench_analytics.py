@@ -0,0 +1,109 @@
+"""Transaction aggregation and the per-holding analytics path"""
+from datetime import date
+import numpy as np
+from app.models.portfolio import Holding, Portfolio
+from app.services.portfolio_analytics import create_portfolio_analytics
+from app.services.portfolio_optimizer import MeanVarianceOptimizer, shrunk_covariance
+from app.services.backtest import calendar_rebalance_days, drawdown_periods, performance_metrics, simulate_rebalancing
+from app.services.rolling_metrics import RollingState
+from app.services.diversification import correlation_structure, diversification_metrics
+from app.services.risk import cholesky_factor, historical_losses, simulate_inline, tail_risk
+from app.schemas.portfolio import RebalanceFrequency
+from app.services.transaction_summary import format_summary, summarize_transactions
+from benchmarks.synthetic import (
+    stock_symbols, synthetic_holdings, synthetic_returns, synthetic_transactions, transaction_records
+)
+
+def bench_summarize_transactions(measure, transactions):
+    symbols = stock_symbols(200)
+    records = transaction_records(synthetic_transactions(transactions, symbols), symbols)
+    summary = measure(lambda: summarize_transactions(records), items=transactions, rounds=5, unit="rows")
+    assert summary["total_trades"] == transactions
+
+def bench_format_summary(measure):
+    symbols = stock_symbols(2000)
+    summary = summarize_transactions(transaction_records(synthetic_transactions(100_000, symbols), symbols))
+    measure(lambda: format_summary(summary, 2000), items=len(summary["symbols"]), unit="symbols")
+
+def bench_mean_variance_optimizer(measure, assets):
+    """Two years of daily returns: covariance, min variance, 20-point frontier, max Sharpe and a target return"""
+    returns = synthetic_returns(504, assets)
+
+    def optimize():
+        covariance, _ = shrunk_covariance(returns)
+        optimizer = MeanVarianceOptimizer(returns.mean(axis=0) * 252, covariance * 252, max_weight=0.1)
+        frontier = optimizer.frontier(20)
+        optimizer.max_sharpe(0.02, frontier)
+        optimizer.target_return(0.2, frontier)
+        return frontier
+
+    frontier = measure(optimize, items=assets, rounds=5, unit="assets")
+    assert len(frontier) == 20
+
+def bench_backtest(measure):
+    """Ten years x 200 assets, monthly rebalancing plus a 2% drift band, 10 bps costs"""
+    closes = np.cumprod(1 + synthetic_returns(2520, 200), axis=0) * 100
+    days = np.arange(2520) * 7 // 5 + date(2015, 1, 5).toordinal()
+    weights = np.full(200, 1 / 200)
+    calendar = calendar_rebalance_days(days, RebalanceFrequency.MONTHLY)
+
+    def backtest():
+        run = simulate_rebalancing(closes, weights, calendar, 0.02, 0.001)
+        return run, performance_metrics(run["values"], days), drawdown_periods(run["values"], days)
+
+    run, _, _ = measure(backtest, items=2520, rounds=5, unit="days")
+    assert run["rebalanced"].sum() >= calendar.sum()
+
+def bench_rolling_metrics_append(measure):
+    """New bars through a one-year window: cost per bar must not grow with the window"""
+    closes = np.cumprod(1 + synthetic_returns(50_000, 2), axis=0) * 100
+
+    def append():
+        state = RollingState(252, 252)
+        for day, (close, benchmark_close) in enumerate(closes.tolist()):
+            point = state.append(day, close, benchmark_close)
+        return point
+
+    point = measure(append, items=len(closes), rounds=3, unit="bars")
+    assert point["volatility"] > 0
+
+def bench_monte_carlo_var(measure, assets):
+    """20k correlated paths at 1 and 10 days, one process, plus historical VaR/CVaR over two years"""
+    returns = synthetic_returns(504, assets)
+    closes = np.cumprod(1 + returns, axis=0) * 100
+    weights = np.full(assets, 1 / assets)
+    covariance, _ = shrunk_covariance(returns)
+    factor = cholesky_factor(covariance)
+
+    def value_at_risk():
+        losses = simulate_inline(returns.mean(axis=0), factor, weights, (1, 10), 20_000, 7)
+        simulated = [tail_risk(row, (0.95, 0.99)) for row in losses]
+        historical = [tail_risk(historical_losses(closes, weights, h), (0.95, 0.99)) for h in (1, 10)]
+        return simulated, historical
+
+    simulated, historical = measure(value_at_risk, items=20_000, rounds=3, unit="paths")
+    assert simulated[1][1]["var"] > simulated[0][1]["var"] > 0
+    assert historical[0][1]["cvar"] >= historical[0][1]["var"]
+
+def bench_diversification_metrics(measure, assets):
+    """One year of closes: correlations, correlated groups, HHI and diversification ratio (uncached)"""
+    closes = np.cumprod(1 + synthetic_returns(253, assets), axis=0) * 100
+    days = np.arange(253) * 7 // 5 + date(2024, 1, 2).toordinal()
+    symbols = [f"S{i:04d}" for i in range(assets)]
+    weights = dict(zip(symbols, np.full(assets, 1 / assets)))
+
+    def diversification():
+        return diversification_metrics(weights, correlation_structure(symbols, days, closes, []))
+
+    metrics = measure(diversification, items=assets, rounds=5, unit="assets")
+    assert metrics["effective_holdings"] == assets or abs(metrics["effective_holdings"] - assets) < 1e-6
+    assert metrics["diversification_ratio"] > 1
+
+def bench_portfolio_metrics(measure, run_async, stubs, loop):
+    """Prices, bars and betas fetched holding by holding, plus AI insights"""
+    analytics = loop.run_until_complete(create_portfolio_analytics())
+    portfolio = Portfolio(id=1, name="Analytics", holdings=[
+        Holding(**h) for h in synthetic_holdings(20, crypto_share=0)
+    ])
+    result = measure(run_async(analytics.calculate_portfolio_metrics, portfolio), items=20, rounds=3, unit="holdings")
+    assert len(result["holdings"]) == 20
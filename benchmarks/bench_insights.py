@@ -0,0 +1,68 @@
+"""AI insights and transaction analysis against the stub LLM"""
+import asyncio
+from app.services import ai_insights
+from benchmarks.synthetic import (
+    insights_portfolio_data, stock_symbols, synthetic_holdings, synthetic_transactions, transaction_records
+)
+
+def _clear_sentiment_cache():
+    ai_insights._sentiment_cache.clear()
+
+def bench_insights_cold(measure, run_async, stubs):
+    """Every round re-fetches per-symbol sentiment"""
+    data = insights_portfolio_data(synthetic_holdings(40))
+    result = measure(
+        run_async(ai_insights.generate_portfolio_insights, data),
+        rounds=5,
+        setup=_clear_sentiment_cache,
+        unit="requests"
+    )
+    assert "error" not in result, result
+
+def bench_insights_warm(measure, run_async, stubs):
+    """Sentiment served from the per-symbol cache; one LLM call per request"""
+    data = insights_portfolio_data(synthetic_holdings(40))
+    measure(run_async(ai_insights.generate_portfolio_insights, data), rounds=5, unit="requests")
+
+def bench_insights_concurrent(measure, run_async, stubs):
+    """10 users asking at once; bounded by LLM_MAX_CONCURRENCY"""
+    portfolios = [insights_portfolio_data(synthetic_holdings(20, seed=i)) for i in range(10)]
+
+    async def burst():
+        return await asyncio.gather(*[ai_insights.generate_portfolio_insights(p) for p in portfolios])
+
+    results = measure(run_async(burst), items=len(portfolios), rounds=3, setup=_clear_sentiment_cache, unit="requests")
+    assert all("error" not in r for r in results)
+
+def bench_insights_stream(measure, run_async, stubs):
+    data = insights_portfolio_data(synthetic_holdings(40))
+
+    async def consume():
+        return [event async for event in ai_insights.stream_portfolio_insights(data)]
+
+    events = measure(run_async(consume), rounds=5, unit="requests")
+    assert events[-1][0] == "result"
+
+def bench_transaction_analysis(measure, run_async, stubs, transactions):
+    """Single prompt below TRANSACTION_MAP_REDUCE_THRESHOLD rows, map-reduce above"""
+    symbols = stock_symbols(100)
+    records = transaction_records(synthetic_transactions(transactions, symbols), symbols)
+    result = measure(run_async(ai_insights.analyze_transaction_history, records), items=transactions, rounds=3, unit="rows")
+    assert "error" not in result, result
+
+def bench_sentiment_owner_cancelled(measure, run_async, stubs):
+    """A request waiting on another's sentiment fetch still completes when that request is cancelled"""
+    holdings = [{"symbol": symbol} for symbol in stock_symbols(20)]
+
+    async def abandoned_owner():
+        owner = asyncio.create_task(ai_insights.analyze_market_sentiment(holdings))
+        while not ai_insights._sentiment_inflight:
+            await asyncio.sleep(0)
+        waiter = asyncio.create_task(ai_insights.analyze_market_sentiment(holdings))
+        await asyncio.sleep(0)
+        owner.cancel()
+        return await asyncio.wait_for(waiter, timeout=30)
+
+    result = measure(run_async(abandoned_owner), rounds=3, setup=_clear_sentiment_cache, unit="requests")
+    assert "error" not in result, result
+    assert len(result["sentiment_analysis"]) == len(holdings)
@@ -0,0 +1,86 @@
+"""
+Latest prices across worker processes, as uvicorn runs them: one quote table
+shared by every worker on the host against a cache in each worker.
+
+Dashboard requests for a handful of portfolios land on random workers. With
+a cache per worker, every worker fetches each portfolio's prices once; with
+the shared table, the first fetch serves all of them.
+"""
+from multiprocessing import get_context
+import asyncio
+import os
+import tempfile
+import numpy as np
+import pytest
+from benchmarks.synthetic import stock_symbols
+
+WORKERS = 4
+PORTFOLIOS = 8
+SYMBOLS_PER_PORTFOLIO = 100
+REQUESTS = 32
+
+def _worker(connection, backend: str, path: str):
+    """A stand-in app worker: prices each batch of symbols it is sent through AlpacaService"""
+    from app.core.config import settings
+    from app.services.alpaca_service import create_alpaca_service
+    from app.services.quote_cache import quote_cache, reset_quote_cache
+
+    settings.QUOTE_CACHE_BACKEND = backend
+    settings.QUOTE_CACHE_PATH = path
+    reset_quote_cache()
+    loop = asyncio.new_event_loop()
+    service = loop.run_until_complete(create_alpaca_service())
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        if message == "clear":
+            quote_cache().clear()
+            connection.send(0)
+        else:
+            connection.send(len(loop.run_until_complete(service.get_latest_prices(message))))
+    loop.close()
+
+@pytest.mark.parametrize("backend", ["shared", "local"])
+def bench_quote_cache_workers(measure, benchmark, stubs, backend):
+    rng = np.random.default_rng(0)
+    universe = stock_symbols(1000)
+    portfolios = [
+        sorted(rng.choice(universe, SYMBOLS_PER_PORTFOLIO, replace=False).tolist()) for _ in range(PORTFOLIOS)
+    ]
+    routes = rng.integers(WORKERS, size=REQUESTS)
+    path = os.path.join(tempfile.mkdtemp(prefix="portfolio-quotes-"), "quotes")
+    context = get_context("spawn")
+    connections, processes = [], []
+    for _ in range(WORKERS):
+        parent, child = context.Pipe()
+        process = context.Process(target=_worker, args=(child, backend, path), daemon=True)
+        process.start()
+        connections.append(parent)
+        processes.append(process)
+
+    def clear():
+        for connection in connections:
+            connection.send("clear")
+        for connection in connections:
+            connection.recv()
+
+    def serve():
+        priced = 0
+        for request, worker in enumerate(routes):
+            connections[worker].send(portfolios[request % PORTFOLIOS])
+            priced += connections[worker].recv()
+        return priced
+
+    try:
+        clear()
+        before = stubs.counters()["alpaca"]["requests"]
+        priced = measure(serve, items=REQUESTS, rounds=3, setup=clear, unit="requests")
+        rounds = 4 if benchmark.stats is not None else 1
+        benchmark.extra_info["provider_requests_per_round"] = (stubs.counters()["alpaca"]["requests"] - before) / rounds
+    finally:
+        for connection in connections:
+            connection.send(None)
+        for process in processes:
+            process.join(timeout=10)
+    assert priced == REQUESTS * SYMBOLS_PER_PORTFOLIO
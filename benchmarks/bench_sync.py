@@ -0,0 +1,19 @@
+"""POST /sync's Gemini path against the Gemini stub and a scratch database"""
+import pytest
+from app.services.portfolio_sync import PortfolioSyncService
+from benchmarks.synthetic import seed_database
+
+@pytest.fixture(scope="module")
+def sync_user(loop, bench_db):
+    created = loop.run_until_complete(seed_database(bench_db, users=1, portfolios_per_user=0))
+    return created["users"][0]
+
+def bench_sync_gemini(measure, run_async, stubs, bench_db, sync_user, synced_balances):
+    stubs.gemini_book["balances"] = synced_balances
+
+    async def sync():
+        async with bench_db() as session:
+            return await PortfolioSyncService(session).sync_user_portfolios(sync_user)
+
+    result = measure(run_async(sync), items=synced_balances, rounds=5, unit="positions")
+    assert not result["errors"], result["errors"]
@@ -0,0 +1,61 @@
+"""Batched valuation (dashboard path) and crypto price routing against the provider stubs"""
+import pytest
+from app.models.portfolio import Holding, Portfolio
+from app.services.crypto_prices import CryptoPriceRouter
+from app.services.valuation import create_valuation_service
+from benchmarks.synthetic import synthetic_holdings
+
+CRYPTO_SYMBOLS = ["BTC", "ETH", "SOL", "DOGE", "ADA", "LINK"]
+CRYPTO_LOOKUPS = 10
+
+def _portfolios(count: int, holdings_each: int):
+    return [
+        Portfolio(id=p, name=f"Portfolio {p}", holdings=[
+            Holding(**h) for h in synthetic_holdings(holdings_each, seed=p)
+        ])
+        for p in range(count)
+    ]
+
+def bench_value_portfolio(measure, run_async, stubs, loop, holdings):
+    service = loop.run_until_complete(create_valuation_service())
+    portfolios = _portfolios(1, holdings)
+    result = measure(run_async(service.value_portfolios, portfolios), items=holdings, unit="holdings")
+    assert result["totals"]["holdings"] == holdings
+    assert not result["portfolios"][0]["unpriced_symbols"]
+
+def bench_value_many_portfolios(measure, run_async, stubs, loop):
+    service = loop.run_until_complete(create_valuation_service())
+    portfolios = _portfolios(50, 100)
+    result = measure(run_async(service.value_portfolios, portfolios), items=len(portfolios), unit="portfolios")
+    assert result["totals"]["portfolios"] == 50
+
+@pytest.mark.parametrize("scenario", ["healthy", "slow_tail", "failing"])
+@pytest.mark.parametrize("providers", ["coingecko", "coingecko,gemini"])
+def bench_crypto_price_routing(measure, benchmark, run_async, stubs, providers, scenario):
+    """
+    Crypto quotes from CoinGecko alone against the hedged router over CoinGecko
+    and Gemini, while CoinGecko is healthy, has a long latency tail, or fails
+    a third of its requests. Failed lookups per round land in extra_info.
+    """
+    router = CryptoPriceRouter(providers.split(","))
+    profile = stubs.profiles["coingecko"]
+    saved = (profile.jitter_ms, profile.error_rate)
+    if scenario == "slow_tail":
+        profile.jitter_ms = 400
+    elif scenario == "failing":
+        profile.error_rate = 0.3
+    failed = []
+
+    async def lookups():
+        for _ in range(CRYPTO_LOOKUPS):
+            try:
+                await router.fetch(CRYPTO_SYMBOLS)
+            except Exception:
+                failed.append(1)
+
+    try:
+        measure(run_async(lookups), items=CRYPTO_LOOKUPS, rounds=5, unit="lookups")
+    finally:
+        profile.jitter_ms, profile.error_rate = saved
+    rounds = 6 if benchmark.stats is not None else 1
+    benchmark.extra_info["failed_lookups_per_round"] = len(failed) / rounds
@@ -0,0 +1,153 @@
+"""
+pytest-benchmark suites for valuation, analytics, sync and insights.
+
+Everything runs against synthetic data, a scratch database and the local
+provider stand-ins in benchmarks.stub_servers, so nothing leaves the machine:
+
+    pytest benchmarks/
+    pytest benchmarks/ --stub-latency-ms 80 --stub-error-rate 0.02
+    pytest benchmarks/ --bench-full                  # up to 10k holdings / 10M transactions
+    pytest benchmarks/ --benchmark-autosave          # then `pytest-benchmark compare`
+
+Besides pytest-benchmark's own table, p50/p95/p99 latency and throughput for
+every benchmark are printed at the end of the run.
+"""
+from typing import Callable, Dict, List
+import asyncio
+import os
+import tempfile
+import threading
+import numpy as np
+import pytest
+from benchmarks.stub_servers import PROVIDERS, StubServers, reserve_sockets, stub_environment
+
+# Settings load when the suites import the app, so the stubs' ports are fixed here
+_SOCKETS = reserve_sockets(len(PROVIDERS))
+os.environ.update(stub_environment({
+    name: f"http://127.0.0.1:{sock.getsockname()[1]}" for name, sock in zip(PROVIDERS, _SOCKETS)
+}))
+# Price every round against the stubs; bench_quote_cache picks its backends itself
+os.environ.setdefault("QUOTE_CACHE_BACKEND", "none")
+BENCH_DATABASE_URL = os.environ.get(
+    "BENCH_DATABASE_URL",
+    f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='portfolio-bench-')}/bench.db"
+)
+
+_RESULTS: List[Dict] = []
+
+def pytest_addoption(parser):
+    group = parser.getgroup("portfolio benchmarks")
+    group.addoption("--stub-latency-ms", type=float, default=50, help="Base latency of the market-data stubs")
+    group.addoption("--stub-jitter-ms", type=float, default=20, help="Mean of the exponential latency tail")
+    group.addoption("--stub-error-rate", type=float, default=0.0, help="Fraction of stub requests answered with 429/5xx")
+    group.addoption("--llm-ttft-ms", type=float, default=300, help="Stub LLM time to first token")
+    group.addoption("--llm-tokens-per-second", type=float, default=80, help="Stub LLM generation speed")
+    group.addoption("--bench-full", action="store_true", help="Include the largest data sizes")
+
+def pytest_generate_tests(metafunc):
+    """Size parameters scale with --bench-full"""
+    full = metafunc.config.getoption("--bench-full")
+    sizes = {
+        "holdings": [100, 1000, 10000] if full else [100, 1000],
+        "transactions": [10_000, 100_000, 1_000_000, 10_000_000] if full else [10_000, 100_000],
+        "synced_balances": [10, 100, 500] if full else [10, 100],
+        "assets": [100, 500, 1000] if full else [100, 500]
+    }
+    for name, values in sizes.items():
+        if name in metafunc.fixturenames:
+            metafunc.parametrize(name, values)
+
+@pytest.fixture(scope="session")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+@pytest.fixture(scope="session")
+def stubs(pytestconfig) -> StubServers:
+    """
+    The stand-ins serve from their own thread and loop, so code under test that
+    blocks its loop (sync SDK calls) delays itself rather than the providers.
+    """
+    servers = StubServers(sockets=_SOCKETS)
+    servers.set_profile(
+        latency_ms=pytestconfig.getoption("--stub-latency-ms"),
+        jitter_ms=pytestconfig.getoption("--stub-jitter-ms"),
+        error_rate=pytestconfig.getoption("--stub-error-rate"),
+        providers=("alpaca", "coingecko", "gemini", "fx")
+    )
+    servers.set_profile(error_rate=pytestconfig.getoption("--stub-error-rate"), providers=("openai",))
+    servers.llm.time_to_first_token_ms = pytestconfig.getoption("--llm-ttft-ms")
+    servers.llm.tokens_per_second = pytestconfig.getoption("--llm-tokens-per-second")
+    stub_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=stub_loop.run_forever, name="provider-stubs", daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(servers.start(), stub_loop).result()
+    yield servers
+    asyncio.run_coroutine_threadsafe(servers.stop(), stub_loop).result()
+    stub_loop.call_soon_threadsafe(stub_loop.stop)
+    thread.join()
+    stub_loop.close()
+
+@pytest.fixture(scope="session")
+def bench_db(loop):
+    """Session factory for a scratch database with the app's schema"""
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.core.database import Base
+    import app.models.portfolio  # noqa: F401  (registers the tables)
+
+    engine = create_async_engine(BENCH_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1))
+
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+    loop.run_until_complete(reset())
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    loop.run_until_complete(engine.dispose())
+
+@pytest.fixture
+def run_async(loop) -> Callable:
+    """run_async(coroutine_function, *args) -> a zero-argument callable for benchmark()"""
+    def wrap(coroutine_function, *args, **kwargs):
+        return lambda: loop.run_until_complete(coroutine_function(*args, **kwargs))
+    return wrap
+
+@pytest.fixture
+def measure(benchmark, request):
+    """
+    measure(fn, items=N, rounds=R, setup=None): benchmark `fn` for R rounds and
+    record latency percentiles and throughput (items per second).
+    """
+    def run(fn, items: int = 1, rounds: int = 10, setup=None, unit: str = "items"):
+        result = benchmark.pedantic(fn, setup=setup, rounds=rounds, iterations=1, warmup_rounds=1 if rounds > 1 else 0)
+        if benchmark.stats is None:
+            # --benchmark-disable
+            return result
+        times = np.array(benchmark.stats.stats.data, dtype=float)
+        p50, p95, p99 = np.percentile(times, [50, 95, 99])
+        summary = {
+            "p50_ms": p50 * 1000,
+            "p95_ms": p95 * 1000,
+            "p99_ms": p99 * 1000,
+            "throughput": items / times.mean(),
+            "unit": f"{unit}/s"
+        }
+        benchmark.extra_info.update(summary)
+        _RESULTS.append({"name": request.node.name, **summary})
+        return result
+    return run
+
+def pytest_terminal_summary(terminalreporter):
+    if not _RESULTS:
+        return
+    width = max(len(r["name"]) for r in _RESULTS)
+    terminalreporter.section("latency percentiles and throughput")
+    terminalreporter.write_line(f"{'benchmark':<{width}}  {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}  throughput")
+    for r in _RESULTS:
+        terminalreporter.write_line(
+            f"{r['name']:<{width}}  {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} {r['p99_ms']:>10.2f}  "
+            f"{r['throughput']:,.1f} {r['unit']}"
+        )
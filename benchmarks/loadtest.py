@@ -0,0 +1,400 @@
+"""
+End-to-end HTTP load test: boots the app under uvicorn against a database and
+the provider stand-ins, then drives an open-loop request mix at a stepped
+target rate and reports per-route latency, errors and where the app saturates.
+
+    python -m benchmarks.loadtest --database-url postgresql://postgres@localhost/loadtest
+    python -m benchmarks.loadtest --rates 10,20,40,80,160 --step-seconds 30 --workers 1
+    python -m benchmarks.loadtest --mix token=1,portfolios=4,portfolio=4,sync=1,insights=1
+    python -m benchmarks.loadtest --compare benchmarks/results/<earlier run>.json
+
+The database is dropped and re-seeded on every run, so point it at a scratch
+database. Requests are issued on a Poisson schedule independent of responses,
+and latency is measured from each request's scheduled start, so a backed-up
+server shows up as latency rather than as a lower offered rate. Results are
+written to benchmarks/results/<timestamp>-<commit>.json.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import aiohttp
+import numpy as np
+from benchmarks.stub_servers import StubServers
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+PASSWORD = "loadtest-password"
+
+# name -> (label, method, path); {id} is one of the requesting user's portfolios
+ROUTES: Dict[str, Tuple[str, str, str]] = {
+    "token": ("POST /auth/token", "POST", "/api/v1/auth/token"),
+    "portfolios": ("GET /portfolios/", "GET", "/api/v1/portfolios/"),
+    "portfolio": ("GET /portfolios/{id}", "GET", "/api/v1/portfolios/{id}"),
+    "sync": ("POST /portfolios/sync", "POST", "/api/v1/portfolios/sync"),
+    "insights": ("GET /portfolios/{id}/insights", "GET", "/api/v1/portfolios/{id}/insights")
+}
+DEFAULT_MIX = "token=1,portfolios=4,portfolio=4,sync=1,insights=1"
+
+class VirtualUser:
+    """A seeded account with its bearer token and portfolio ids"""
+
+    def __init__(self, email: str, portfolio_ids: List[int]):
+        self.email = email
+        self.portfolio_ids = portfolio_ids
+        self.token: Optional[str] = None
+
+class StepResult:
+    """Latencies and outcomes for one target rate"""
+
+    def __init__(self, target_rate: float):
+        self.target_rate = target_rate
+        self.latencies: Dict[str, List[float]] = {label: [] for label, _, _ in ROUTES.values()}
+        self.errors: Dict[str, Dict[str, int]] = {label: {} for label, _, _ in ROUTES.values()}
+        self.sent = 0
+        self.dropped = 0
+        self.duration = 0.0
+
+    def record(self, label: str, latency: float, error: Optional[str]):
+        self.latencies[label].append(latency)
+        if error is not None:
+            self.errors[label][error] = self.errors[label].get(error, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        routes = {}
+        all_latencies: List[float] = []
+        total_errors = 0
+        for label, latencies in self.latencies.items():
+            if not latencies:
+                continue
+            all_latencies.extend(latencies)
+            errors = sum(self.errors[label].values())
+            total_errors += errors
+            routes[label] = {"requests": len(latencies), "errors": errors, "error_kinds": self.errors[label], **_percentiles(latencies)}
+        completed = len(all_latencies)
+        return {
+            "target_rate": self.target_rate,
+            "achieved_rate": completed / self.duration if self.duration else 0.0,
+            "sent": self.sent,
+            "completed": completed,
+            "dropped": self.dropped,
+            "errors": total_errors,
+            "error_rate": total_errors / completed if completed else 0.0,
+            # Little's law: requests in the server on average
+            "mean_in_flight": sum(all_latencies) / 1000 / self.duration if self.duration else 0.0,
+            **_percentiles(all_latencies),
+            "routes": routes
+        }
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "max_ms": float(max(latencies))}
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ROUTES:
+            raise argparse.ArgumentTypeError(f"Unknown route '{name}' (choose from {', '.join(ROUTES)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _git_revision() -> Dict[str, Any]:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root, capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": "unknown", "dirty": None}
+    return {"commit": sha, "dirty": dirty}
+
+async def seed(args) -> List[VirtualUser]:
+    """Reset the schema and insert the synthetic accounts the workload logs in as"""
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.core.database import Base
+    from app.core.security import get_password_hash
+    from benchmarks.synthetic import seed_database
+
+    engine = create_async_engine(args.database_url.replace("postgresql://", "postgresql+asyncpg://", 1))
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        created = await seed_database(
+            sessionmaker(engine, class_=AsyncSession, expire_on_commit=False),
+            users=args.users,
+            portfolios_per_user=args.portfolios_per_user,
+            holdings_per_portfolio=args.holdings,
+            password_hash=get_password_hash(PASSWORD)
+        )
+    finally:
+        await engine.dispose()
+    per_user = args.portfolios_per_user
+    return [
+        VirtualUser(f"bench{u}@example.com", created["portfolios"][u * per_user:(u + 1) * per_user])
+        for u in range(args.users)
+    ]
+
+def start_app(args, stub_env: Dict[str, str], port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        **stub_env,
+        "DATABASE_URL": args.database_url,
+        "DATABASE_ECHO": "false",
+        "PYTHONUNBUFFERED": "1"
+    }
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers),
+        "--log-level", "warning", "--no-access-log",
+        # No websocket routes, and the websockets the Alpaca SDK pins is too old for uvicorn
+        "--ws", "none"
+    ]
+    return subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+async def wait_until_healthy(session: aiohttp.ClientSession, base_url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited during startup (code {process.returncode})")
+        try:
+            async with session.get(f"{base_url}/health") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError(f"App not healthy after {timeout:.0f}s")
+
+async def issue(session: aiohttp.ClientSession, base_url: str, name: str, user: VirtualUser) -> Optional[str]:
+    """Send one request; returns an error kind, or None on success"""
+    _, method, path = ROUTES[name]
+    url = base_url + path.replace("{id}", str(random.choice(user.portfolio_ids)))
+    kwargs: Dict[str, Any] = {}
+    if name == "token":
+        kwargs["data"] = {"username": user.email, "password": PASSWORD}
+    else:
+        kwargs["headers"] = {"Authorization": f"Bearer {user.token}"}
+    try:
+        async with session.request(method, url, **kwargs) as response:
+            body = await response.read()
+            if response.status >= 400:
+                return f"http_{response.status}"
+            if name == "token":
+                user.token = json.loads(body)["access_token"]
+            elif name == "insights" and b'"error"' in body and "error" in json.loads(body):
+                # Provider failures are reported in a 200 body
+                return "insights_error"
+    except asyncio.TimeoutError:
+        return "timeout"
+    except aiohttp.ClientError as e:
+        return type(e).__name__
+    return None
+
+async def run_step(session: aiohttp.ClientSession, base_url: str, users: List[VirtualUser], mix: Dict[str, float],
+                   rate: float, duration: float, max_in_flight: int) -> StepResult:
+    """Offer `rate` requests/second for `duration` seconds, Poisson arrivals"""
+    result = StepResult(rate)
+    names, weights = list(mix), list(mix.values())
+    in_flight: set = set()
+    loop = asyncio.get_running_loop()
+
+    async def one(name: str, scheduled: float):
+        error = await issue(session, base_url, name, random.choice(users))
+        result.record(ROUTES[name][0], (loop.time() - scheduled) * 1000, error)
+
+    start = loop.time()
+    scheduled = start
+    while True:
+        scheduled += random.expovariate(rate)
+        if scheduled - start >= duration:
+            break
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            # The client refuses to queue without bound; count it against the server
+            result.dropped += 1
+            continue
+        task = asyncio.create_task(one(random.choices(names, weights)[0], scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+        result.sent += 1
+    if in_flight:
+        await asyncio.wait(list(in_flight))
+    result.duration = loop.time() - start
+    return result
+
+def saturated(step: Dict[str, Any], args) -> Optional[str]:
+    """Why this step is past saturation, or None if the app kept up"""
+    if step["p99_ms"] > args.p99_slo_ms:
+        return f"p99 {step['p99_ms']:.0f} ms > {args.p99_slo_ms:.0f} ms"
+    if step["error_rate"] > args.error_budget:
+        return f"error rate {step['error_rate']:.1%} > {args.error_budget:.1%}"
+    if step["dropped"]:
+        return f"{step['dropped']} requests over --max-in-flight"
+    if step["achieved_rate"] < 0.9 * step["target_rate"]:
+        return f"achieved {step['achieved_rate']:.1f}/s of {step['target_rate']:.1f}/s"
+    return None
+
+def print_step(step: Dict[str, Any]):
+    print(f"\n== target {step['target_rate']:g} req/s: achieved {step['achieved_rate']:.1f} req/s, "
+          f"{step['errors']} errors, {step['dropped']} dropped, mean in flight {step['mean_in_flight']:.1f}")
+    width = max([len(label) for label in step["routes"]] + [5])
+    print(f"  {'route':<{width}} {'reqs':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, route in list(step["routes"].items()) + [("all", step)]:
+        print(f"  {label:<{width}} {route.get('requests', step['completed']):>7} {route['errors']:>7} "
+              f"{route['p50_ms']:>9.1f} {route['p95_ms']:>9.1f} {route['p99_ms']:>9.1f}")
+    if step["saturated"]:
+        print(f"  saturated: {step['saturated']}")
+
+def compare(current: Dict[str, Any], baseline_path: str):
+    """Per-route p99 at each shared target rate, against an earlier results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n== p99 vs {baseline['git']['commit']} ({os.path.basename(baseline_path)})")
+    base_steps = {step["target_rate"]: step for step in baseline["steps"]}
+    for step in current["steps"]:
+        base = base_steps.get(step["target_rate"])
+        if base is None:
+            continue
+        print(f"  target {step['target_rate']:g} req/s")
+        for label, route in list(step["routes"].items()) + [("all", step)]:
+            before = base if label == "all" else base["routes"].get(label)
+            if not before:
+                continue
+            change = (route["p99_ms"] / before["p99_ms"] - 1) * 100 if before["p99_ms"] else 0.0
+            print(f"    {label:<32} {before['p99_ms']:>9.1f} -> {route['p99_ms']:>9.1f} ms ({change:+.0f}%)")
+    print(f"  max sustained rate: {baseline['max_sustained_rate']} -> {current['max_sustained_rate']} req/s")
+
+def start_stubs(args) -> Tuple[StubServers, asyncio.AbstractEventLoop, threading.Thread]:
+    """Stubs get their own thread so client load does not delay provider responses"""
+    servers = StubServers()
+    servers.set_profile(args.stub_latency_ms, args.stub_jitter_ms, args.stub_error_rate, providers=("alpaca", "coingecko", "gemini", "fx"))
+    servers.set_profile(error_rate=args.stub_error_rate, providers=("openai",))
+    servers.llm.time_to_first_token_ms = args.llm_ttft_ms
+    servers.llm.tokens_per_second = args.llm_tokens_per_second
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name="provider-stubs", daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(servers.start(), loop).result()
+    return servers, loop, thread
+
+def stop_stubs(servers: StubServers, loop: asyncio.AbstractEventLoop, thread: threading.Thread):
+    asyncio.run_coroutine_threadsafe(servers.stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+async def run(args) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    servers, stub_loop, stub_thread = start_stubs(args)
+    users = await seed(args)
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = start_app(args, servers.environment(), port)
+    steps: List[Dict[str, Any]] = []
+    try:
+        timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+        connector = aiohttp.TCPConnector(limit=args.max_in_flight)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            await wait_until_healthy(session, base_url, process)
+            # Everyone logs in once so authenticated routes start with a token
+            errors = await asyncio.gather(*(issue(session, base_url, "token", user) for user in users))
+            failed = [e for e in errors if e is not None]
+            if failed:
+                raise RuntimeError(f"{len(failed)} of {len(users)} logins failed: {sorted(set(failed))}")
+            if args.warmup_seconds:
+                await run_step(session, base_url, users, mix, args.rates[0], args.warmup_seconds, args.max_in_flight)
+
+            for rate in args.rates:
+                step = (await run_step(session, base_url, users, mix, rate, args.step_seconds, args.max_in_flight)).summary()
+                step["saturated"] = saturated(step, args)
+                step["providers"] = servers.counters()
+                steps.append(step)
+                print_step(step)
+                if step["saturated"] and not args.keep_going:
+                    break
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        stop_stubs(servers, stub_loop, stub_thread)
+
+    sustained = [step["target_rate"] for step in steps if not step["saturated"]]
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "host": platform.node(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("compare", "output")},
+        "mix": mix,
+        "max_sustained_rate": max(sustained) if sustained else None,
+        "steps": steps
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API across its main routes at stepped request rates")
+    parser.add_argument("--database-url", default=os.environ.get("LOADTEST_DATABASE_URL", "postgresql://postgres@localhost/portfolio_loadtest"),
+                        help="Scratch database; dropped and re-seeded (default: $LOADTEST_DATABASE_URL)")
+    parser.add_argument("--rates", type=lambda s: [float(r) for r in s.split(",")], default=[5, 10, 20, 40, 80],
+                        help="Target request rates to step through, requests/second")
+    parser.add_argument("--step-seconds", type=float, default=30)
+    parser.add_argument("--warmup-seconds", type=float, default=5)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Route weights (default {DEFAULT_MIX})")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--portfolios-per-user", type=int, default=2)
+    parser.add_argument("--holdings", type=int, default=50, help="Holdings per portfolio")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--request-timeout", type=float, default=30)
+    parser.add_argument("--p99-slo-ms", type=float, default=1000, help="A step whose p99 exceeds this is saturated")
+    parser.add_argument("--error-budget", type=float, default=0.01, help="A step whose error rate exceeds this is saturated")
+    parser.add_argument("--keep-going", action="store_true", help="Run every rate even after saturation")
+    parser.add_argument("--stub-latency-ms", type=float, default=50)
+    parser.add_argument("--stub-jitter-ms", type=float, default=20)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-ttft-ms", type=float, default=300)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=80)
+    parser.add_argument("--output", help="Results file (default benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args()
+    parse_mix(args.mix)
+
+    # The app's settings are read at import, by the seeding code here and by the server process
+    os.environ["DATABASE_URL"] = args.database_url
+    results = asyncio.run(run(args))
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{results['git']['commit']}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nmax sustained rate: {results['max_sustained_rate']} req/s; results written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
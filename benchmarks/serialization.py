@@ -0,0 +1,74 @@
+"""
+Serialization cost of GET /portfolios/{id} per 10k holdings.
+
+Compares FastAPI's default path (response_model validation + jsonable_encoder +
+json.dumps) against the orm_response path (single from_attributes validation,
+model_dump and orjson).
+
+    python -m benchmarks.serialization [--holdings 10000] [--repeat 5]
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime
+from types import SimpleNamespace
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from app.core.responses import orm_response
+from app.schemas.portfolio import PortfolioWithHoldings
+
+def build_portfolio(holdings: int) -> SimpleNamespace:
+    """An ORM-like portfolio row with preloaded holdings"""
+    now = datetime.utcnow()
+    return SimpleNamespace(
+        id=1,
+        user_id=1,
+        name="Benchmark",
+        description="Synthetic portfolio",
+        created_at=now,
+        updated_at=now,
+        holdings=[
+            SimpleNamespace(
+                id=i,
+                portfolio_id=1,
+                asset_symbol=f"SYM{i}",
+                asset_type="stock",
+                quantity=float(i % 500 + 1),
+                average_price=100.0 + i % 37,
+                platform="fidelity",
+                created_at=now,
+                updated_at=now
+            )
+            for i in range(holdings)
+        ]
+    )
+
+def default_path(portfolio: SimpleNamespace) -> bytes:
+    model = PortfolioWithHoldings.model_validate(portfolio, from_attributes=True)
+    content = jsonable_encoder(model)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def orjson_path(adapter: TypeAdapter, portfolio: SimpleNamespace) -> bytes:
+    return orm_response(adapter, portfolio).body
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--holdings", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    portfolio = build_portfolio(args.holdings)
+    adapter = TypeAdapter(PortfolioWithHoldings)
+    assert json.loads(default_path(portfolio)) == json.loads(orjson_path(adapter, portfolio))
+
+    scale = 10000 / args.holdings
+    before = min(timeit.repeat(lambda: default_path(portfolio), number=1, repeat=args.repeat)) * scale
+    after = min(timeit.repeat(lambda: orjson_path(adapter, portfolio), number=1, repeat=args.repeat)) * scale
+
+    print(f"holdings: {args.holdings}")
+    print(f"default  (validate + jsonable_encoder + json): {before * 1000:8.2f} ms / 10k holdings")
+    print(f"orjson   (validate once + model_dump + orjson): {after * 1000:8.2f} ms / 10k holdings")
+    print(f"speedup: {before / after:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Stand-in for the OpenAI chat completions API.
+
+Answers deterministically in the shapes ai_insights parses (per-symbol
+sentiment JSON, sectioned analysis JSON) and models generation time as
+time-to-first-token plus output tokens / tokens_per_second, so prompt and
+response sizes show up in benchmark latencies the way they do in production.
+"""
+from typing import Any, Dict, List
+import asyncio
+import json
+import re
+import time
+import uuid
+from aiohttp import web
+
+_ASSETS_LINE = re.compile(r"for these assets:\s*(.+)")
+_SECTION_LINE = re.compile(r"^\s*\d+\.\s*(.+?)\s*$", re.MULTILINE)
+
+class StubLLM:
+    def __init__(self, time_to_first_token_ms: float = 300, tokens_per_second: float = 80, max_output_tokens: int = 400):
+        self.time_to_first_token_ms = time_to_first_token_ms
+        self.tokens_per_second = tokens_per_second
+        self.max_output_tokens = max_output_tokens
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def reply(self, messages: List[Dict[str, str]]) -> str:
+        """Deterministic content for a chat request"""
+        prompt = messages[-1]["content"] if messages else ""
+        assets = _ASSETS_LINE.search(prompt)
+        if assets:
+            symbols = [s.strip() for s in assets.group(1).split(",") if s.strip()]
+            return json.dumps({
+                symbol: {
+                    "sentiment_score": round(((sum(map(ord, symbol)) % 21) - 10) / 10, 1),
+                    "outlook": f"{symbol} is expected to track its sector.",
+                    "key_factors": ["earnings", "rates", "sector momentum"]
+                }
+                for symbol in symbols
+            })
+        sections = _SECTION_LINE.findall(prompt) or ["Summary"]
+        return json.dumps({
+            section: f"Synthetic {section.lower()} for benchmarking. " * 3
+            for section in sections
+        })
+
+    @staticmethod
+    def tokens(text: str) -> int:
+        return max(1, len(text) // 4)
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        messages = body.get("messages", [])
+        content = self.reply(messages)
+        chunks = _split_tokens(content)[: body.get("max_tokens") or self.max_output_tokens]
+        prompt_tokens = sum(self.tokens(m.get("content", "")) for m in messages)
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += len(chunks)
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = body.get("model", "stub")
+        per_token = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+
+        await asyncio.sleep(self.time_to_first_token_ms / 1000)
+        if not body.get("stream"):
+            await asyncio.sleep(per_token * len(chunks))
+            return web.json_response({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(chunks)},
+                    "finish_reason": "stop"
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(chunks),
+                    "total_tokens": prompt_tokens + len(chunks)
+                }
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def event(delta: Dict[str, Any], finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        await event({"role": "assistant", "content": ""})
+        for token in chunks:
+            await event({"content": token})
+            await asyncio.sleep(per_token)
+        await event({}, "stop")
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+def _split_tokens(text: str) -> List[str]:
+    """~4 characters per token, matching estimate_tokens"""
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
@@ -0,0 +1,400 @@
+"""
+Local aiohttp stand-ins for the market-data and AI providers the app calls.
+
+Each provider runs on its own port with a StubProfile (base latency, an
+exponential latency tail and an error rate) that can be changed while running.
+Point the app at them with `StubServers.environment()`:
+
+    ALPACA_BASE_URL / APCA_API_DATA_URL  alpaca_trade_api REST + market data (v2)
+    COINGECKO_BASE_URL                    /simple/price, /coins/{id}/market_chart
+    GEMINI_BASE_URL                       /balances, /pubticker/{symbol}, /mytrades
+    OPENAI_BASE_URL                       /chat/completions (StubLLM, streaming too)
+
+Standalone (e.g. for a uvicorn-served app):
+
+    python -m benchmarks.stub_servers --latency-ms 40 --error-rate 0.01
+"""
+from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta, timezone
+import math
+import argparse
+import asyncio
+import random
+import socket
+from aiohttp import web
+from benchmarks.stub_llm import StubLLM
+
+# No app imports here: the stubs' URLs have to be in the environment before settings load
+PROVIDERS = ("alpaca", "coingecko", "gemini", "openai", "fx")
+# Units per USD around which the FX stand-in moves
+FX_REFERENCE = {"EUR": 0.92, "GBP": 0.79, "JPY": 150.0, "CHF": 0.88, "CAD": 1.36, "AUD": 1.52}
+GEMINI_SYMBOLS = ("BTC", "ETH", "SOL", "LTC", "DOGE", "LINK", "AVAX", "DOT")
+
+def reference_price(symbol: str) -> float:
+    """Deterministic per-symbol (or coin id) price, shared with the synthetic data"""
+    seed = sum((i + 1) * ord(c) for i, c in enumerate(symbol.upper()))
+    return round(5 + (seed * 7919 % 49500) / 100, 2)
+
+class StubProfile:
+    """Latency model and failure rate for one stub provider"""
+
+    def __init__(self, latency_ms: float = 50, jitter_ms: float = 20, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+
+    def delay(self) -> float:
+        jitter = random.expovariate(1 / self.jitter_ms) if self.jitter_ms > 0 else 0
+        return (self.latency_ms + jitter) / 1000
+
+    def fails(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+def _iso(ts: datetime) -> str:
+    return ts.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+def _trade(symbol: str) -> Dict:
+    return {
+        "t": _iso(datetime.now(timezone.utc)),
+        "x": "V",
+        "p": reference_price(symbol),
+        "s": 100,
+        "c": ["@"],
+        "i": 1,
+        "z": "C"
+    }
+
+def _asset(symbol: str) -> Dict:
+    return {
+        "id": symbol,
+        "class": "us_equity",
+        "exchange": "NASDAQ",
+        "symbol": symbol,
+        "name": f"{symbol} Synthetic Inc.",
+        "status": "active",
+        "tradable": True
+    }
+
+def _close_on(symbol: str, day: date) -> float:
+    """A symbol's close on a calendar day, the same whichever window it is requested in"""
+    phase = reference_price(symbol)
+    noise = random.Random(f"{symbol}:{day.toordinal()}").gauss(0, 0.01)
+    return round(reference_price(symbol) * math.exp(0.15 * math.sin(day.toordinal() / 45 + phase) + noise), 4)
+
+def _days(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+def alpaca_app(profile: StubProfile) -> web.Application:
+    routes = web.RouteTableDef()
+
+    @routes.get("/v2/stocks/trades/latest")
+    async def latest_trades(request):
+        symbols = [s for s in request.query.get("symbols", "").split(",") if s]
+        return web.json_response({"trades": {s: _trade(s) for s in symbols}})
+
+    @routes.get("/v2/stocks/{symbol}/trades/latest")
+    async def latest_trade(request):
+        symbol = request.match_info["symbol"]
+        return web.json_response({"symbol": symbol, "trade": _trade(symbol)})
+
+    @routes.get("/v2/stocks/{symbol}/bars")
+    async def bars(request):
+        symbol = request.match_info["symbol"]
+        today = datetime.now(timezone.utc).date()
+        if "start" in request.query:
+            start = date.fromisoformat(request.query["start"][:10])
+            end = date.fromisoformat(request.query["end"][:10]) if "end" in request.query else today
+            days = _days(start, min(end, today))
+        else:
+            days = _days(today - timedelta(days=int(request.query.get("limit", 30)) - 1), today)
+        return web.json_response({
+            "symbol": symbol,
+            "next_page_token": None,
+            "bars": [
+                {
+                    "t": _iso(datetime.combine(day, datetime.min.time(), timezone.utc)),
+                    "o": round(close * 0.995, 4),
+                    "h": round(close * 1.01, 4),
+                    "l": round(close * 0.99, 4),
+                    "c": close,
+                    "v": 100000 + i,
+                    "n": 1000,
+                    "vw": close
+                }
+                for i, (day, close) in enumerate((day, _close_on(symbol, day)) for day in days)
+            ]
+        })
+
+    @routes.get("/v2/assets/{symbol}")
+    async def asset(request):
+        return web.json_response(_asset(request.match_info["symbol"]))
+
+    @routes.get("/v2/assets")
+    async def assets(request):
+        return web.json_response([_asset(f"S{i:04d}") for i in range(1000)])
+
+    return _provider_app(routes, profile)
+
+def coingecko_app(profile: StubProfile) -> web.Application:
+    routes = web.RouteTableDef()
+
+    @routes.get("/simple/price")
+    async def simple_price(request):
+        now = int(datetime.now(timezone.utc).timestamp())
+        data = {}
+        for coin_id in filter(None, request.query.get("ids", "").split(",")):
+            price = reference_price(coin_id)
+            data[coin_id] = {
+                "usd": price,
+                "usd_market_cap": price * 1e9,
+                "usd_24h_vol": price * 1e7,
+                "usd_24h_change": 1.5,
+                "last_updated_at": now
+            }
+        return web.json_response(data)
+
+    @routes.get("/coins/{coin_id}/market_chart")
+    async def market_chart(request):
+        coin_id = request.match_info["coin_id"]
+        today = datetime.now(timezone.utc).date()
+        days = _days(today - timedelta(days=int(request.query.get("days", 30)) - 1), today)
+        return web.json_response({
+            "prices": [
+                [int(datetime.combine(day, datetime.min.time(), timezone.utc).timestamp() * 1000), _close_on(coin_id, day)]
+                for day in days
+            ]
+        })
+
+    return _provider_app(routes, profile)
+
+def _fx_rate(currency: str, day: date) -> float:
+    return round(FX_REFERENCE[currency] * math.exp(0.05 * math.sin(day.toordinal() / 60 + len(currency) + ord(currency[0]))), 6)
+
+def fx_app(profile: StubProfile) -> web.Application:
+    """ECB-style reference rates (Frankfurter API shape), business days only"""
+    routes = web.RouteTableDef()
+
+    def currencies(request) -> List[str]:
+        wanted = request.query.get("to")
+        return [c for c in (wanted.split(",") if wanted else FX_REFERENCE) if c in FX_REFERENCE]
+
+    def last_business_day(day: date) -> date:
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+        return day
+
+    @routes.get("/latest")
+    async def latest(request):
+        day = last_business_day(datetime.now(timezone.utc).date())
+        return web.json_response({
+            "amount": 1.0,
+            "base": "USD",
+            "date": day.isoformat(),
+            "rates": {c: _fx_rate(c, day) for c in currencies(request)}
+        })
+
+    @routes.get("/{start}..{end}")
+    async def history(request):
+        start = date.fromisoformat(request.match_info["start"])
+        end = min(date.fromisoformat(request.match_info["end"]), datetime.now(timezone.utc).date())
+        wanted = currencies(request)
+        return web.json_response({
+            "amount": 1.0,
+            "base": "USD",
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+            "rates": {
+                day.isoformat(): {c: _fx_rate(c, day) for c in wanted}
+                for day in _days(start, end) if day.weekday() < 5
+            }
+        })
+
+    return _provider_app(routes, profile)
+
+def gemini_app(profile: StubProfile, book: Dict[str, int]) -> web.Application:
+    """`book["balances"]` sizes the account returned by /balances and can change while running"""
+    routes = web.RouteTableDef()
+
+    @routes.route("*", "/balances")
+    async def get_balances(request):
+        count = book["balances"]
+        symbols = (GEMINI_SYMBOLS * (count // len(GEMINI_SYMBOLS) + 1))[:count]
+        return web.json_response([
+            {
+                "type": "exchange",
+                "currency": symbol if i < len(GEMINI_SYMBOLS) else f"{symbol}{i}",
+                "amount": str(round(1 + i * 0.5, 4)),
+                "available": str(round(1 + i * 0.5, 4)),
+                "avg_price": str(round(reference_price(symbol) * 0.9, 4))
+            }
+            for i, symbol in enumerate(symbols)
+        ])
+
+    @routes.get("/pubticker/{pair}")
+    async def pubticker(request):
+        symbol = request.match_info["pair"].upper().removesuffix("USD")
+        price = reference_price(symbol)
+        return web.json_response({
+            "bid": str(price * 0.999),
+            "ask": str(price * 1.001),
+            "last": str(price),
+            "volume": {"timestamp": int(datetime.now(timezone.utc).timestamp() * 1000)}
+        })
+
+    @routes.route("*", "/mytrades")
+    async def mytrades(request):
+        now = datetime.now(timezone.utc).timestamp()
+        return web.json_response([
+            {
+                "symbol": f"{symbol}USD",
+                "amount": str(1 if i % 3 else -1),
+                "price": str(reference_price(symbol)),
+                "timestamp": now - i * 3600,
+                "type": "Buy" if i % 3 else "Sell"
+            }
+            for i, symbol in enumerate(GEMINI_SYMBOLS * 5)
+        ])
+
+    return _provider_app(routes, profile)
+
+def openai_app(profile: StubProfile, llm: StubLLM) -> web.Application:
+    routes = web.RouteTableDef()
+
+    @routes.post("/chat/completions")
+    async def chat_completions(request):
+        return await llm.handle(request)
+
+    return _provider_app(routes, profile)
+
+def _provider_app(routes: web.RouteTableDef, profile: StubProfile) -> web.Application:
+    """Application whose every request pays the profile's latency and may fail"""
+
+    @web.middleware
+    async def latency_and_errors(request, handler):
+        profile.requests += 1
+        await asyncio.sleep(profile.delay())
+        if profile.fails():
+            profile.errors += 1
+            return web.json_response({"error": {"message": "stub provider error"}}, status=random.choice((429, 500, 503)))
+        return await handler(request)
+
+    app = web.Application(middlewares=[latency_and_errors])
+    app.router.add_routes(routes)
+    return app
+
+def reserve_sockets(count: int, host: str = "127.0.0.1") -> List[socket.socket]:
+    """
+    Bind listening sockets on free ports now, so their URLs can go into the
+    environment before the app (and its settings) are imported.
+    """
+    sockets = []
+    for _ in range(count):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, 0))
+        sock.listen(1024)
+        sock.setblocking(False)
+        sockets.append(sock)
+    return sockets
+
+def stub_environment(urls: Dict[str, str]) -> Dict[str, str]:
+    """Settings overrides pointing every provider client at the stubs"""
+    return {
+        "ALPACA_API_KEY": "stub",
+        "ALPACA_SECRET_KEY": "stub",
+        "ALPACA_BASE_URL": urls["alpaca"],
+        "APCA_API_DATA_URL": urls["alpaca"],
+        "COINGECKO_BASE_URL": urls["coingecko"],
+        "GEMINI_BASE_URL": urls["gemini"],
+        "OPENAI_BASE_URL": urls["openai"],
+        "FX_BASE_URL": urls["fx"],
+        "OPENAI_API_KEY": "stub"
+    }
+
+class StubServers:
+    """All provider stand-ins, each on its own port"""
+
+    def __init__(self, profiles: Optional[Dict[str, StubProfile]] = None, llm: Optional[StubLLM] = None,
+                 sockets: Optional[List[socket.socket]] = None, host: str = "127.0.0.1"):
+        self.profiles = {name: StubProfile() for name in PROVIDERS}
+        self.profiles["openai"] = StubProfile(latency_ms=20, jitter_ms=10)
+        self.profiles.update(profiles or {})
+        self.llm = llm or StubLLM()
+        self.gemini_book = {"balances": 8}
+        self.host = host
+        self.sockets = dict(zip(PROVIDERS, sockets or reserve_sockets(len(PROVIDERS), host)))
+        self.apps = {
+            "alpaca": alpaca_app(self.profiles["alpaca"]),
+            "coingecko": coingecko_app(self.profiles["coingecko"]),
+            "gemini": gemini_app(self.profiles["gemini"], self.gemini_book),
+            "openai": openai_app(self.profiles["openai"], self.llm),
+            "fx": fx_app(self.profiles["fx"])
+        }
+        self._runners: List[web.AppRunner] = []
+
+    def url(self, provider: str) -> str:
+        return f"http://{self.host}:{self.sockets[provider].getsockname()[1]}"
+
+    def environment(self) -> Dict[str, str]:
+        return stub_environment({name: self.url(name) for name in PROVIDERS})
+
+    def set_profile(self, latency_ms: Optional[float] = None, jitter_ms: Optional[float] = None,
+                    error_rate: Optional[float] = None, providers=PROVIDERS):
+        for name in providers:
+            profile = self.profiles[name]
+            if latency_ms is not None:
+                profile.latency_ms = latency_ms
+            if jitter_ms is not None:
+                profile.jitter_ms = jitter_ms
+            if error_rate is not None:
+                profile.error_rate = error_rate
+
+    def counters(self) -> Dict[str, Dict[str, int]]:
+        return {name: {"requests": p.requests, "errors": p.errors} for name, p in self.profiles.items()}
+
+    async def start(self):
+        for name, app in self.apps.items():
+            # Latest-trade lookups put every symbol in the query string
+            runner = web.AppRunner(app, access_log=None, handler_args={"max_line_size": 262144})
+            await runner.setup()
+            await web.SockSite(runner, self.sockets[name]).start()
+            self._runners.append(runner)
+
+    async def stop(self):
+        for runner in self._runners:
+            await runner.cleanup()
+        self._runners = []
+
+    async def __aenter__(self) -> "StubServers":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+async def _serve(args):
+    servers = StubServers()
+    servers.set_profile(args.latency_ms, args.jitter_ms, args.error_rate)
+    servers.llm.time_to_first_token_ms = args.llm_ttft_ms
+    servers.llm.tokens_per_second = args.llm_tokens_per_second
+    async with servers:
+        for key, value in servers.environment().items():
+            print(f"{key}={value}", flush=True)
+        await asyncio.Event().wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the provider stand-ins until interrupted")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-ttft-ms", type=float, default=300)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=80)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
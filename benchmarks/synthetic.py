@@ -0,0 +1,209 @@
+"""
+Deterministic synthetic users, portfolios, holdings and transaction histories.
+
+Large transaction histories are generated column-wise with numpy (10M rows fit
+in a few hundred MB); `transaction_records` turns a slice into the dict rows
+the services take.
+"""
+from typing import Any, Dict, Iterator, List, Optional
+from datetime import datetime
+import numpy as np
+from sqlalchemy import insert
+from app.models.portfolio import AssetType, Holding, Platform, Portfolio, Transaction, User
+from app.services.coingecko_service import COINGECKO_IDS
+from app.services.diversification import diversification_metrics
+from benchmarks.stub_servers import reference_price
+
+CRYPTO_SYMBOLS = [symbol for symbol in COINGECKO_IDS if symbol not in ("USDC", "USDT", "DAI")]
+HISTORY_START = datetime(2015, 1, 2)
+
+def stock_symbols(count: int) -> List[str]:
+    """A stable universe of made-up tickers (S0000, S0001, ...)"""
+    return [f"S{i:04d}" for i in range(count)]
+
+def synthetic_holdings(count: int, seed: int = 0, universe: int = 1000, crypto_share: float = 0.1) -> List[Dict[str, Any]]:
+    """
+    Holding rows (HoldingBase fields). Stocks are drawn from a `universe` of
+    tickers so large books repeat symbols the way real ones do; a symbol is
+    never repeated on the same platform within one call.
+    """
+    rng = np.random.default_rng(seed)
+    stocks = stock_symbols(max(universe, count))
+    is_crypto = rng.random(count) < crypto_share
+    crypto_picks = rng.integers(0, len(CRYPTO_SYMBOLS), count)
+    stock_picks = rng.permutation(len(stocks))[:count] if count > universe else rng.choice(universe, count, replace=False)
+    quantity = np.round(rng.lognormal(3, 1.2, count), 4)
+    drift = rng.normal(1.0, 0.25, count).clip(0.2, 3)
+
+    holdings = []
+    seen_crypto = set()
+    for i in range(count):
+        if is_crypto[i] and CRYPTO_SYMBOLS[crypto_picks[i]] not in seen_crypto:
+            symbol = CRYPTO_SYMBOLS[crypto_picks[i]]
+            seen_crypto.add(symbol)
+            asset_type, platform = AssetType.CRYPTO, Platform.GEMINI
+        else:
+            symbol = stocks[stock_picks[i]]
+            asset_type, platform = AssetType.STOCK, Platform.FIDELITY
+        holdings.append({
+            "asset_symbol": symbol,
+            "asset_type": asset_type,
+            "quantity": float(quantity[i]),
+            "average_price": round(reference_price(symbol) / float(drift[i]), 4),
+            "platform": platform
+        })
+    return holdings
+
+def synthetic_transactions(rows: int, symbols: List[str], seed: int = 0, start: datetime = HISTORY_START) -> Dict[str, np.ndarray]:
+    """
+    Column-wise transaction history over `symbols`: symbol index, is_buy,
+    quantity, price and unix timestamp, sorted by time. Roughly 60% buys so
+    positions accumulate; prices random-walk around each symbol's reference.
+    """
+    rng = np.random.default_rng(seed)
+    symbol_index = rng.integers(0, len(symbols), rows)
+    span_seconds = (datetime.utcnow() - start).total_seconds()
+    ts = np.sort(rng.uniform(0, span_seconds, rows)) + start.timestamp()
+    base = np.array([reference_price(s) for s in symbols])
+    walk = np.exp(rng.normal(0, 0.02, rows).cumsum() / np.sqrt(max(rows, 1)) * 8)
+    return {
+        "symbol_index": symbol_index,
+        "is_buy": rng.random(rows) < 0.6,
+        "quantity": np.round(rng.lognormal(1.5, 1.0, rows), 4),
+        "price": np.round(base[symbol_index] * walk, 4),
+        "timestamp": ts
+    }
+
+def synthetic_returns(days: int, assets: int, seed: int = 0, factors: int = 5) -> np.ndarray:
+    """
+    Daily returns (days x assets) from a factor model: shared market and sector
+    factors plus idiosyncratic noise, with a small per-asset drift.
+    """
+    rng = np.random.default_rng(seed)
+    loadings = rng.normal(1.0, 0.5, (assets, factors)) / factors
+    common = rng.normal(0, 0.01, (days, factors)) @ loadings.T
+    return common + rng.normal(0, 0.015, (days, assets)) + rng.normal(0.0004, 0.0003, assets)
+
+def transaction_records(columns: Dict[str, np.ndarray], symbols: List[str], start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Dict rows in the shape analyze_transaction_history / summarize_transactions take"""
+    stop = len(columns["timestamp"]) if stop is None else stop
+    names = np.array(symbols, dtype=object)[columns["symbol_index"][start:stop]]
+    kinds = np.where(columns["is_buy"][start:stop], "buy", "sell")
+    return [
+        {
+            "asset_symbol": symbol,
+            "transaction_type": kind,
+            "quantity": quantity,
+            "price": price,
+            "timestamp": datetime.utcfromtimestamp(ts)
+        }
+        for symbol, kind, quantity, price, ts in zip(
+            names, kinds,
+            columns["quantity"][start:stop].tolist(),
+            columns["price"][start:stop].tolist(),
+            columns["timestamp"][start:stop].tolist()
+        )
+    ]
+
+def _chunks(rows: List[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+async def seed_database(
+    session_factory,
+    users: int = 1,
+    portfolios_per_user: int = 2,
+    holdings_per_portfolio: int = 100,
+    transactions_per_holding: int = 0,
+    password_hash: str = "",
+    seed: int = 0,
+    chunk_size: int = 5000
+) -> Dict[str, List[int]]:
+    """
+    Insert synthetic users (bench{n}@example.com), their portfolios, holdings and
+    transactions with multi-row inserts. Returns the created ids.
+    """
+    created: Dict[str, List[int]] = {"users": [], "portfolios": [], "holdings": []}
+    now = datetime.utcnow()
+    async with session_factory() as session:
+        for u in range(users):
+            result = await session.execute(
+                insert(User).returning(User.id),
+                [{"email": f"bench{u}@example.com", "hashed_password": password_hash, "full_name": f"Bench User {u}"}]
+            )
+            user_id = result.scalar_one()
+            created["users"].append(user_id)
+
+            for p in range(portfolios_per_user):
+                result = await session.execute(
+                    insert(Portfolio).returning(Portfolio.id),
+                    [{"user_id": user_id, "name": f"Portfolio {p}", "description": "Synthetic", "created_at": now, "updated_at": now}]
+                )
+                portfolio_id = result.scalar_one()
+                created["portfolios"].append(portfolio_id)
+
+                holdings = [
+                    {**h, "portfolio_id": portfolio_id, "last_updated": now, "created_at": now, "updated_at": now}
+                    for h in synthetic_holdings(holdings_per_portfolio, seed=seed + u * 1000 + p)
+                ]
+                holding_ids: List[int] = []
+                for chunk in _chunks(holdings, chunk_size):
+                    result = await session.execute(
+                        insert(Holding).returning(Holding.id, sort_by_parameter_order=True), chunk
+                    )
+                    holding_ids.extend(result.scalars().all())
+                created["holdings"].extend(holding_ids)
+
+                if transactions_per_holding and holding_ids:
+                    symbols = [h["asset_symbol"] for h in holdings]
+                    columns = synthetic_transactions(transactions_per_holding * len(holdings), symbols, seed=seed + p)
+                    total = len(columns["timestamp"])
+                    for begin in range(0, total, chunk_size):
+                        records = transaction_records(columns, symbols, begin, begin + chunk_size)
+                        indexes = columns["symbol_index"][begin:begin + chunk_size].tolist()
+                        await session.execute(insert(Transaction), [
+                            {
+                                "holding_id": holding_ids[index],
+                                "transaction_type": record["transaction_type"],
+                                "quantity": record["quantity"],
+                                "price": record["price"],
+                                "timestamp": record["timestamp"],
+                                "platform": holdings[index]["platform"]
+                            }
+                            for index, record in zip(indexes, records)
+                        ])
+        await session.commit()
+    return created
+
+def insights_portfolio_data(holdings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The portfolio_data dict generate_portfolio_insights takes, valued at reference prices"""
+    rows = []
+    for h in holdings:
+        price = reference_price(h["asset_symbol"])
+        value = price * h["quantity"]
+        rows.append({
+            "symbol": h["asset_symbol"],
+            "quantity": h["quantity"],
+            "current_price": price,
+            "average_price": h["average_price"],
+            "current_value": value,
+            "gain_loss": value - h["average_price"] * h["quantity"],
+            "gain_loss_percentage": (price / h["average_price"] - 1) * 100 if h["average_price"] else 0.0
+        })
+    total = sum(r["current_value"] for r in rows)
+    allocations = sorted(
+        ({"symbol": r["symbol"], "percentage": r["current_value"] / total * 100} for r in rows),
+        key=lambda a: a["percentage"],
+        reverse=True
+    )
+    return {
+        "holdings": rows,
+        "total_value": total,
+        "diversification": {
+            "allocations": allocations,
+            "top_holdings": allocations[:3],
+            "number_of_holdings": len(rows),
+            # No correlation structure: the stub history is not loaded for prompt benchmarks
+            **diversification_metrics({a["symbol"]: a["percentage"] / 100 for a in allocations}, None)
+        }
+    }
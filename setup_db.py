@@ -3,6 +3,18 @@ from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from app.core.config import settings
 import re
 
+# Columns and indexes added to existing tables; create_all only creates missing
+# tables, so databases created before them need these. Each statement is idempotent.
+SCHEMA_UPGRADES = [
+    ("portfolios", "ALTER TABLE portfolios ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITHOUT TIME ZONE"),
+    ("portfolios", "ALTER TABLE portfolios ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1"),
+    ("holdings", "ALTER TABLE holdings ADD COLUMN IF NOT EXISTS created_at TIMESTAMP WITHOUT TIME ZONE"),
+    ("holdings", "ALTER TABLE holdings ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITHOUT TIME ZONE"),
+    ("portfolios", "ALTER TABLE portfolios ADD COLUMN IF NOT EXISTS currency VARCHAR(3) NOT NULL DEFAULT 'USD'"),
+    ("holdings", "ALTER TABLE holdings ADD COLUMN IF NOT EXISTS currency VARCHAR(3) NOT NULL DEFAULT 'USD'"),
+    ("holdings", "CREATE INDEX IF NOT EXISTS ix_holdings_portfolio_id ON holdings (portfolio_id)"),
+]
+
 def create_database():
     # Extract database name from URL
     match = re.match(r'postgresql://[^:]+:[^@]+@[^:]+(?::\d+)?/([^?]+)', settings.DATABASE_URL)
@@ -45,9 +57,35 @@ def create_database():
     
     return True
 
+def upgrade_schema():
+    """Bring tables of an existing database up to the current models"""
+    print("Upgrading schema...")
+    
+    try:
+        conn = psycopg2.connect(settings.DATABASE_URL)
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = conn.cursor()
+        
+        # Tables that do not exist yet are created with every column by create_all
+        cursor.execute("SELECT tablename FROM pg_tables WHERE schemaname = current_schema()")
+        tables = {row[0] for row in cursor.fetchall()}
+        for table, statement in SCHEMA_UPGRADES:
+            if table in tables:
+                cursor.execute(statement)
+        print("✅ Schema is up to date.")
+        
+        cursor.close()
+        conn.close()
+        
+    except Exception as e:
+        print(f"❌ Error upgrading schema: {str(e)}")
+        return False
+    
+    return True
+
 if __name__ == "__main__":
     print("Setting up database...")
-    if create_database():
+    if create_database() and upgrade_schema():
         print("\nNext steps:")
         print("1. Run 'python test_connection.py' to test connections")
         print("2. Run 'uvicorn app.main:app --reload' to start the application") 
\ No newline at end of file
@@ -0,0 +1,14 @@
+import os
+
+# Settings are read when app modules are imported; tests never need real credentials
+# or providers (the FX feed points at a closed port, so a fetch fails at once)
+for _key, _default in (
+    ("DATABASE_URL", "postgresql://test@localhost/test"),
+    ("JWT_SECRET", "test"),
+    ("GEMINI_API_KEY", "test"),
+    ("GEMINI_API_SECRET", "test"),
+    ("OPENAI_API_KEY", "test"),
+    ("FX_BASE_URL", "http://127.0.0.1:9"),
+    ("QUOTE_CACHE_BACKEND", "none")
+):
+    os.environ.setdefault(_key, _default)
@@ -0,0 +1,48 @@
+"""
+Shared fixtures. Tests are plain functions; the async ones run their body with
+`run_db`, which gives it a session on a scratch SQLite database carrying the
+app's schema (Postgres-only statements are not exercised here).
+"""
+from typing import Awaitable, Callable, TypeVar
+import asyncio
+import pytest
+
+T = TypeVar("T")
+
+@pytest.fixture
+def run_db(tmp_path) -> Callable[[Callable[..., Awaitable[T]]], T]:
+    """Run `test(session, sessions)` against a fresh database in its own event loop"""
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.core.database import Base
+    import app.models.portfolio  # noqa: F401  (registers the tables)
+
+    def run(test):
+        async def main():
+            engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/test.db")
+            try:
+                async with engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.create_all)
+                sessions = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+                async with sessions() as session:
+                    return await test(session, sessions)
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
+
+@pytest.fixture
+def portfolio_row():
+    """Insert a user and an empty USD portfolio; returns the portfolio"""
+    from app.models.portfolio import Portfolio, User
+
+    async def create(session, user_id: int = 1):
+        session.add(User(id=user_id, email=f"user{user_id}@example.com", hashed_password="x", full_name="Test"))
+        portfolio = Portfolio(user_id=user_id, name="Main")
+        session.add(portfolio)
+        await session.commit()
+        return portfolio
+
+    return create
@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import func, select
+from app.models.portfolio import Holding, Portfolio
+from app.schemas.portfolio import BulkMode
+from app.services.bulk_writes import BulkWriteError, BulkWriteService
+
+ITEMS = [
+    {"asset_symbol": "AAPL", "asset_type": "stock", "quantity": 10, "average_price": 150, "platform": "fidelity"},
+    {"asset_symbol": "MSFT", "asset_type": "stock", "quantity": -1, "average_price": 300, "platform": "fidelity"},
+    {"asset_symbol": "BTC", "asset_type": "crypto", "quantity": 0.5, "average_price": 30000, "platform": "gemini"},
+    {"asset_symbol": "aapl", "asset_type": "stock", "quantity": 1, "average_price": 150, "platform": "fidelity"},
+    {"asset_symbol": "ETH", "asset_type": "crypto", "quantity": 1, "average_price": 2000}
+]
+
+async def _state(session, portfolio_id: int):
+    count = await session.scalar(select(func.count(Holding.id)).where(Holding.portfolio_id == portfolio_id))
+    version = await session.scalar(select(Portfolio.version).where(Portfolio.id == portfolio_id))
+    return count, version
+
+def test_atomic_batch_with_an_invalid_item_writes_nothing(run_db, portfolio_row):
+    async def test(session, _):
+        portfolio = await portfolio_row(session)
+        with pytest.raises(BulkWriteError) as raised:
+            await BulkWriteService(session).create_holdings(portfolio.id, ITEMS, BulkMode.ATOMIC)
+        return raised.value.response, await _state(session, portfolio.id)
+
+    response, (count, version) = run_db(test)
+    assert (count, version) == (0, 1)
+    assert response.created == 0
+    assert response.failed == 3
+    assert [r.status for r in response.results] == ["skipped", "failed", "skipped", "failed", "failed"]
+
+def test_best_effort_batch_writes_the_valid_items(run_db, portfolio_row):
+    async def test(session, _):
+        portfolio = await portfolio_row(session)
+        response = await BulkWriteService(session).create_holdings(portfolio.id, ITEMS, BulkMode.BEST_EFFORT)
+        return response, await _state(session, portfolio.id)
+
+    response, (count, version) = run_db(test)
+    assert (count, version) == (2, 2)
+    assert (response.created, response.failed) == (2, 3)
+    results = response.results
+    assert [r.status for r in results] == ["created", "failed", "created", "failed", "failed"]
+    assert results[0].id != results[2].id
+    assert "negative" in results[1].error
+    assert "duplicate" in results[3].error
+    assert "platform" in results[4].error
+
+def test_transactions_must_reference_holdings_of_the_portfolio(run_db, portfolio_row):
+    async def test(session, _):
+        mine = await portfolio_row(session, user_id=1)
+        other = await portfolio_row(session, user_id=2)
+        service = BulkWriteService(session)
+        created = await service.create_holdings(mine.id, ITEMS[:1], BulkMode.ATOMIC)
+        foreign = await service.create_holdings(other.id, ITEMS[2:3], BulkMode.ATOMIC)
+        return await service.create_transactions(mine.id, [
+            {"holding_id": created.results[0].id, "transaction_type": "BUY", "quantity": 2, "price": 155, "platform": "fidelity"},
+            {"holding_id": foreign.results[0].id, "transaction_type": "buy", "quantity": 1, "price": 1, "platform": "gemini"},
+            {"holding_id": created.results[0].id, "transaction_type": "transfer", "quantity": 1, "price": 1, "platform": "fidelity"}
+        ], BulkMode.BEST_EFFORT)
+
+    response = run_db(test)
+    assert [r.status for r in response.results] == ["created", "failed", "failed"]
+    assert "not found" in response.results[1].error
+    assert "transaction_type" in response.results[2].error
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from app.services.diversification import cluster_correlated, correlation_structure, diversification_metrics
+
+BLOCKS = np.array([
+    [1.0, 0.9, 0.1, 0.1],
+    [0.9, 1.0, 0.1, 0.1],
+    [0.1, 0.1, 1.0, 0.8],
+    [0.1, 0.1, 0.8, 1.0]
+])
+
+def test_clusters_form_within_the_correlated_blocks():
+    assert cluster_correlated(BLOCKS, 0.7).tolist() == [0, 0, 2, 2]
+
+def test_clusters_stay_apart_above_every_correlation():
+    assert cluster_correlated(BLOCKS, 0.95).tolist() == [0, 1, 2, 3]
+
+def test_clusters_merge_on_average_linkage():
+    # The blocks average 0.1 to each other, so they merge only at or below it
+    assert len(set(cluster_correlated(BLOCKS, 0.1).tolist())) == 1
+    assert len(set(cluster_correlated(BLOCKS, 0.11).tolist())) == 2
+
+def test_concentration_without_a_structure():
+    metrics = diversification_metrics({"A": 0.5, "B": 0.25, "C": 0.25}, None)
+    assert metrics["hhi"] == pytest.approx(0.375)
+    assert metrics["effective_holdings"] == pytest.approx(1 / 0.375)
+    assert metrics["diversification_ratio"] is None
+    assert metrics["correlated_groups"] == []
+
+def test_short_history_has_no_structure():
+    days = np.arange(10)
+    assert correlation_structure(["A", "B"], days, np.ones((10, 2)), []) is None
+
+def test_structure_groups_assets_that_move_together():
+    rng = np.random.default_rng(11)
+    days = np.arange(738000, 738000 + 253)
+    a = 100 * np.cumprod(1 + rng.normal(0, 0.01, len(days)))
+    c = 100 * np.cumprod(1 + rng.normal(0, 0.02, len(days)))
+    # B is A at twice the price: same returns, correlation 1
+    closes = np.column_stack([a, 2 * a, c])
+    structure = correlation_structure(["A", "B", "C"], days, closes, ["D"], min_correlation=0.7)
+    returns = closes[1:] / closes[:-1] - 1
+    np.testing.assert_allclose(structure.correlation, np.corrcoef(returns, rowvar=False))
+    assert structure.labels.tolist() == [0, 0, 2]
+
+    metrics = diversification_metrics({"A": 0.25, "B": 0.25, "C": 0.5}, structure)
+    weights = np.array([0.25, 0.25, 0.5])
+    scaled = weights * structure.volatilities
+    assert metrics["diversification_ratio"] == pytest.approx(scaled.sum() / np.sqrt(scaled @ structure.correlation @ scaled))
+    assert [group["symbols"] for group in metrics["correlated_groups"]] in (
+        [["A", "B"], ["C"]], [["C"], ["A", "B"]]
+    )
+    assert metrics["effective_groups"] == pytest.approx(2.0)
+    assert metrics["excluded_symbols"] == ["D"]
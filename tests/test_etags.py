@@ -0,0 +1,65 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from app.api.v1.endpoints.portfolio import create_holding, read_portfolio
+from app.models.portfolio import Holding
+from app.schemas.portfolio import HoldingCreate
+from app.services.portfolio_version import bump_portfolio_version, etag_matches, portfolio_etag, portfolio_list_etag
+
+HOLDING = {"asset_symbol": "AAPL", "asset_type": "stock", "quantity": 1, "average_price": 100, "platform": "fidelity"}
+
+def test_etag_matching_is_weak_and_accepts_lists():
+    etag = portfolio_etag(3, 7)
+    assert etag == '"p3-v7"'
+    assert etag_matches('W/"p3-v7"', etag)
+    assert etag_matches('"p1-v1", "p3-v7"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"p3-v6"', etag)
+    assert not etag_matches(None, etag)
+
+def test_list_etag_changes_with_any_version():
+    assert portfolio_list_etag([(1, 1), (2, 1)]) == portfolio_list_etag([(1, 1), (2, 1)])
+    assert portfolio_list_etag([(1, 1), (2, 1)]) != portfolio_list_etag([(1, 1), (2, 2)])
+
+def test_read_portfolio_revalidates_until_the_portfolio_changes(run_db, portfolio_row):
+    async def test(session, _):
+        portfolio = await portfolio_row(session)
+        first = await read_portfolio(portfolio.id, None, session, portfolio.user_id)
+        etag = first.headers["ETag"]
+        unchanged = await read_portfolio(portfolio.id, etag, session, portfolio.user_id)
+        await bump_portfolio_version(session, portfolio.id)
+        await session.commit()
+        changed = await read_portfolio(portfolio.id, etag, session, portfolio.user_id)
+        return first, unchanged, changed
+
+    first, unchanged, changed = run_db(test)
+    assert first.status_code == 200
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == first.headers["ETag"]
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != first.headers["ETag"]
+
+def test_read_portfolio_of_another_user_is_not_found(run_db, portfolio_row):
+    async def test(session, _):
+        portfolio = await portfolio_row(session, user_id=1)
+        await read_portfolio(portfolio.id, None, session, 2)
+
+    with pytest.raises(HTTPException) as raised:
+        run_db(test)
+    assert raised.value.status_code == 404
+
+def test_create_holding_goes_into_the_path_portfolio_and_bumps_it(run_db, portfolio_row):
+    async def test(session, _):
+        mine = await portfolio_row(session, user_id=1)
+        other = await portfolio_row(session, user_id=2)
+        # A portfolio id in the body is ignored
+        holding = HoldingCreate.model_validate({**HOLDING, "portfolio_id": other.id})
+        created = await create_holding(mine.id, holding, session, mine.user_id)
+        stored = (await session.execute(select(Holding.portfolio_id))).scalars().all()
+        etag = (await read_portfolio(mine.id, None, session, mine.user_id)).headers["ETag"]
+        return created, stored, etag, mine.id
+
+    created, stored, etag, portfolio_id = run_db(test)
+    assert created.portfolio_id == portfolio_id
+    assert stored == [portfolio_id]
+    assert etag == portfolio_etag(portfolio_id, 2)
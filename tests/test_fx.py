@@ -0,0 +1,41 @@
+from datetime import date
+import numpy as np
+import pytest
+from app.models.portfolio import FxRate
+from app.services.fx import FxService, convert
+
+def test_convert_looks_up_each_currency_once():
+    rates = {"USD": 1.0, "EUR": 0.5, "GBP": 0.25}
+    converted = convert(np.array([10.0, 10.0, 4.0]), ["EUR", "USD", "GBP"], "EUR", rates)
+    # 10 EUR stays 10 EUR, 10 USD is 5 EUR, 4 GBP is 16 USD, so 8 EUR
+    np.testing.assert_allclose(converted, [10.0, 5.0, 8.0])
+
+def test_daily_rates_carry_forward_over_unpublished_days(run_db):
+    # Friday 2024-03-01 and Monday 2024-03-04; the weekend takes Friday's rate
+    published = {date(2024, 2, 23): 0.90, date(2024, 3, 1): 0.92, date(2024, 3, 4): 0.93}
+
+    async def test(session, _):
+        session.add_all(FxRate(currency="EUR", date=day, rate=rate) for day, rate in published.items())
+        await session.commit()
+        return await FxService(session).daily_rates(["eur"], date(2024, 2, 29), date(2024, 3, 5))
+
+    rates = run_db(test)
+    np.testing.assert_allclose(rates["USD"], np.ones(6))
+    # Feb 29 carries the Feb 23 rate; Mar 5 carries Monday's
+    np.testing.assert_allclose(rates["EUR"], [0.90, 0.92, 0.92, 0.92, 0.93, 0.93])
+
+def test_daily_rates_before_the_first_published_rate_take_the_earliest(run_db):
+    async def test(session, _):
+        session.add(FxRate(currency="GBP", date=date(2024, 3, 4), rate=0.8))
+        await session.commit()
+        # History starts after the lookback, so a fetch is tried; the feed is unreachable in tests
+        return await FxService(session).daily_rates(["GBP"], date(2024, 3, 1), date(2024, 3, 5))
+
+    np.testing.assert_allclose(run_db(test)["GBP"], [0.8] * 5)
+
+def test_daily_rates_without_history_raise(run_db):
+    async def test(session, _):
+        return await FxService(session).daily_rates(["JPY"], date(2024, 3, 1), date(2024, 3, 5))
+
+    with pytest.raises(ValueError, match="JPY"):
+        run_db(test)
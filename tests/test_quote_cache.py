@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from app.services import quote_cache as quotes
+from app.services.quote_cache import LocalQuoteCache, SharedQuoteCache, cached_quotes, layout_path
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "quotes")
+
+def test_workers_on_the_same_file_share_prices(path):
+    writer, reader = SharedQuoteCache(path, 64), SharedQuoteCache(path, 64)
+    writer.put_many({"alpaca:AAPL": 190.5, "gemini:BTCUSD": 65000.0})
+    assert reader.get_many(["alpaca:AAPL", "gemini:BTCUSD", "alpaca:MSFT"], 60) == {
+        "alpaca:AAPL": 190.5, "gemini:BTCUSD": 65000.0
+    }
+    writer.put_many({"alpaca:AAPL": 191.0})
+    assert reader.get_many(["alpaca:AAPL"], 60) == {"alpaca:AAPL": 191.0}
+    # Stale prices are misses
+    assert reader.get_many(["alpaca:AAPL"], -1) == {}
+
+def test_slot_mid_write_is_a_miss_until_its_sequence_is_even(path):
+    cache = SharedQuoteCache(path, 64)
+    cache.put_many({"alpaca:AAPL": 190.5})
+    slot = cache._slots["alpaca:AAPL"]
+    cache.table["seq"][slot] += 1
+    assert cache.get_many(["alpaca:AAPL"], 60) == {}
+    cache.table["seq"][slot] += 1
+    assert cache.get_many(["alpaca:AAPL"], 60) == {"alpaca:AAPL": 190.5}
+
+def test_batch_that_fills_the_table_keeps_all_its_keys(path):
+    # 8 slots start over past 6 in use
+    cache = SharedQuoteCache(path, 8)
+    cache.put_many({f"k{i}": float(i) for i in range(5)})
+    cache.put_many({"Z1": 1.0, "Z2": 2.0})
+    assert SharedQuoteCache(path, 8).get_many(["Z1", "Z2", "k0"], 60) == {"Z1": 1.0, "Z2": 2.0}
+
+def test_reused_slot_is_not_served_for_the_old_key(path):
+    cache, other = SharedQuoteCache(path, 8), SharedQuoteCache(path, 8)
+    cache.put_many({"old": 1.0})
+    assert other.get_many(["old"], 60) == {"old": 1.0}
+    cache.clear()
+    cache.put_many({"new": 2.0})
+    assert other.get_many(["old", "new"], 60) == {"new": 2.0}
+
+def test_each_slot_count_maps_its_own_file(path):
+    assert layout_path(path, 64) != layout_path(path, 128)
+    SharedQuoteCache(path, 64).put_many({"a": 1.0})
+    assert SharedQuoteCache(path, 128).get_many(["a"], 60) == {}
+
+def test_file_of_another_layout_is_refused(path):
+    with open(layout_path(path, 64), "wb") as f:
+        f.write(b"\0" * 100)
+    with pytest.raises(ValueError, match="another layout"):
+        SharedQuoteCache(path, 64)
+
+def test_cached_quotes_fetches_only_the_missing_symbols(monkeypatch):
+    monkeypatch.setattr(quotes, "_cache", LocalQuoteCache(64))
+    monkeypatch.setattr(quotes, "_cache_opened", True)
+    requested = []
+
+    async def fetch(symbols):
+        requested.append(symbols)
+        return {symbol: 10.0 for symbol in symbols}
+
+    async def main():
+        await cached_quotes("alpaca", ["AAPL"], fetch)
+        return await cached_quotes("alpaca", ["AAPL", "MSFT"], fetch)
+
+    assert asyncio.run(main()) == {"AAPL": 10.0, "MSFT": 10.0}
+    assert requested == [["AAPL"], ["MSFT"]]
@@ -0,0 +1,63 @@
+from datetime import date
+import numpy as np
+import pytest
+from app.services.returns import build_daily_series, money_weighted_return, return_metrics, time_weighted_return, xirr
+
+def test_xirr_two_cash_flows():
+    # 1000 paid in, 1100 back a year later
+    assert xirr(np.array([-1000.0, 1100.0]), np.array([0.0, 365.0])) == pytest.approx(0.10, abs=1e-9)
+
+def test_xirr_falls_back_to_bisection_when_newton_overshoots():
+    # From a 5000% guess the first Newton step lands below -100%, so bisection finds the rate
+    assert xirr(np.array([-1000.0, 1100.0]), np.array([0.0, 365.0]), guess=50.0) == pytest.approx(0.10, abs=1e-8)
+
+def test_xirr_zeroes_the_net_present_value():
+    amounts = np.array([-1000.0, -500.0, 1800.0])
+    days = np.array([0.0, 182.0, 365.0])
+    rate = xirr(amounts, days)
+    assert np.sum(amounts / (1 + rate) ** (days / 365)) == pytest.approx(0.0, abs=1e-6)
+
+def test_xirr_needs_money_both_ways():
+    assert xirr(np.array([-1000.0, -100.0]), np.array([0.0, 365.0])) is None
+
+def test_twr_chains_across_a_deposit():
+    # 100 gains 10%, then 100 more is deposited at the end of day 2 after another 10% gain
+    value = np.array([110.0, 221.0])
+    flow = np.array([0.0, 100.0])
+    assert time_weighted_return(value, flow, 100.0) == pytest.approx(0.21)
+
+def test_twr_measures_a_first_day_on_the_money_put_in():
+    # Nothing held before; 100 bought on day 1 closes at 105
+    assert time_weighted_return(np.array([105.0]), np.array([100.0]), 0.0) == pytest.approx(0.05)
+
+def test_twr_is_none_without_investment():
+    assert time_weighted_return(np.zeros(3), np.zeros(3), 0.0) is None
+
+def test_mwr_matches_the_equivalent_xirr():
+    start = date(2024, 1, 1).toordinal()
+    value = np.zeros(366)
+    value[-1] = 1100.0
+    flow = np.zeros(366)
+    # Opening value of 1000 the day before the period, 1100 at its end
+    assert money_weighted_return(value, flow, 1000.0, start) == pytest.approx(0.10, abs=1e-3)
+
+def test_return_metrics_reports_the_gain_net_of_flows():
+    metrics = return_metrics(np.array([110.0, 221.0]), np.array([0.0, 100.0]), 100.0, date(2024, 1, 1).toordinal())
+    assert metrics["gain"] == pytest.approx(21.0)
+    assert metrics["net_flows"] == pytest.approx(100.0)
+    assert metrics["twr_annualized"] is None
+
+def test_daily_series_carries_prices_forward_and_values_flows_at_trade_price():
+    start = 100
+    quantity, value, flow = build_daily_series(
+        start, start + 4,
+        tx_days=np.array([start, start + 2]),
+        tx_quantity=np.array([10.0, -4.0]),
+        tx_price=np.array([5.0, 7.0]),
+        price_days=np.array([start + 1]),
+        price_close=np.array([6.0])
+    )
+    np.testing.assert_allclose(quantity, [10, 10, 6, 6, 6])
+    # Day 0 at the trade price, day 1 at the close, days 2-4 at the sell price carried forward
+    np.testing.assert_allclose(value, [50, 60, 42, 42, 42])
+    np.testing.assert_allclose(flow, [50, 0, -28, 0, 0])
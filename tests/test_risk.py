@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from app.services.risk import cholesky_factor, historical_losses, tail_risk
+
+def test_tail_risk_on_a_known_loss_vector():
+    # Losses 0, 1, ..., 100: the 95% quantile is 95 and the tail beyond it averages 97.5
+    [level] = tail_risk(np.arange(101, dtype=float), [0.95])
+    assert level == {"confidence": 0.95, "var": pytest.approx(95.0), "cvar": pytest.approx(97.5)}
+
+def test_tail_risk_reports_every_level_in_order():
+    losses = np.arange(101, dtype=float)
+    levels = tail_risk(losses, [0.5, 0.99])
+    assert [level["var"] for level in levels] == pytest.approx([50.0, 99.0])
+    assert [level["cvar"] for level in levels] == pytest.approx([75.0, 99.5])
+
+def test_historical_losses_over_overlapping_windows():
+    closes = np.array([[100.0, 50.0], [110.0, 50.0], [99.0, 55.0]])
+    weights = np.array([0.5, 0.5])
+    # Day 1: +10% and flat is a 5% gain; day 2: -10% and +10% breaks even
+    np.testing.assert_allclose(historical_losses(closes, weights, 1), [-0.05, 0.0], atol=1e-12)
+    # Over both days: -1% and +10% is a 4.5% gain
+    np.testing.assert_allclose(historical_losses(closes, weights, 2), [-0.045], atol=1e-12)
+
+def test_cholesky_factor_reproduces_the_covariance():
+    covariance = np.array([[0.04, 0.01], [0.01, 0.09]])
+    factor = cholesky_factor(covariance)
+    np.testing.assert_allclose(factor @ factor.T, covariance)
+
+def test_cholesky_factor_loads_a_semi_definite_diagonal():
+    # Perfectly correlated assets: singular, but still usable after a small jitter
+    covariance = np.array([[0.04, 0.04], [0.04, 0.04]])
+    factor = cholesky_factor(covariance)
+    np.testing.assert_allclose(factor @ factor.T, covariance, atol=1e-8)
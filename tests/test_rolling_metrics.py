@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from app.services import rolling_metrics
+from app.services.rolling_metrics import RollingState, RollingWindow
+
+def _expected(x: np.ndarray, y: np.ndarray, periods_per_year: float) -> dict:
+    volatility = np.std(x, ddof=1)
+    return {
+        "volatility": volatility * np.sqrt(periods_per_year),
+        "beta": np.cov(x, y)[0, 1] / np.var(y, ddof=1),
+        "correlation": np.corrcoef(x, y)[0, 1],
+        "sharpe": x.mean() / volatility * np.sqrt(periods_per_year)
+    }
+
+def test_window_matches_numpy_over_the_last_pairs():
+    rng = np.random.default_rng(7)
+    x = rng.normal(0.001, 0.02, 500)
+    y = 0.5 * x + rng.normal(0, 0.01, 500)
+    window = RollingWindow(30)
+    for i in range(len(x)):
+        window.push(x[i], y[i])
+        if i >= 1:
+            start = max(0, i - 29)
+            metrics = window.metrics(252)
+            for name, value in _expected(x[start:i + 1], y[start:i + 1], 252).items():
+                assert metrics[name] == pytest.approx(value, rel=1e-7), (i, name)
+    assert window.full
+
+def test_window_recomputes_from_the_buffer(monkeypatch):
+    monkeypatch.setattr(rolling_metrics, "RECOMPUTE_EVERY", 50)
+    rng = np.random.default_rng(3)
+    x, y = rng.normal(0, 0.02, 120), rng.normal(0, 0.01, 120)
+    window = RollingWindow(20)
+    for a, b in zip(x, y):
+        window.push(a, b)
+    assert window.metrics(365)["volatility"] == pytest.approx(np.std(x[-20:], ddof=1) * np.sqrt(365))
+
+def test_window_with_fewer_than_two_pairs_has_no_metrics():
+    window = RollingWindow(5)
+    window.push(0.01, 0.02)
+    assert window.metrics(252) == dict.fromkeys(rolling_metrics.METRICS)
+
+def test_flat_benchmark_has_no_beta():
+    window = RollingWindow(3)
+    for x in (0.01, -0.02, 0.03):
+        window.push(x, 0.0)
+    metrics = window.metrics(252)
+    assert metrics["beta"] is None and metrics["correlation"] is None
+    assert metrics["volatility"] == pytest.approx(np.std([0.01, -0.02, 0.03], ddof=1) * np.sqrt(252))
+
+def test_state_turns_closes_into_returns_and_ignores_replays():
+    state = RollingState(2, 252)
+    assert state.append(1, 100.0, 50.0) is None
+    assert state.append(2, 110.0, 55.0) is None
+    # A replayed bar leaves the window alone
+    assert state.append(2, 999.0, 1.0) is None
+    point = state.append(3, 99.0, 50.0)
+    # Returns +10%/-10% against +10%/-9.09%
+    expected = _expected(np.array([0.10, -0.10]), np.array([0.10, 50 / 55 - 1]), 252)
+    assert point == pytest.approx(expected)
+    assert state.append(3, 120.0, 60.0) is None
+    assert state.window.pushes == 2
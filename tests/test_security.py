@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+import pytest
+from app.core import security
+from app.core.security import RevocationSync, VerifiedTokenCache, create_access_token, decode_access_token
+from app.models.portfolio import RevokedToken
+
+@pytest.fixture(autouse=True)
+def token_cache(monkeypatch):
+    cache = VerifiedTokenCache(max_size=10, max_revoked=2)
+    monkeypatch.setattr(security, "token_cache", cache)
+    return cache
+
+def _token(sub: str) -> str:
+    return create_access_token({"sub": sub}, timedelta(minutes=5))
+
+def test_decode_caches_the_verified_payload(token_cache):
+    token = _token("1")
+    payload = decode_access_token(token)
+    assert payload["sub"] == "1"
+    assert token_cache.get(VerifiedTokenCache.digest(token)) == payload
+    assert decode_access_token("not a token") is None
+
+def test_revoked_token_is_evicted_and_rejected(token_cache):
+    token, other = _token("1"), _token("1")
+    payload = decode_access_token(token)
+    digest = VerifiedTokenCache.digest(token)
+    token_cache.revoke(digest, payload)
+    assert token_cache.get(digest) is None
+    assert decode_access_token(token) is None
+    # Only that token: another one for the same subject still verifies
+    assert decode_access_token(other)["sub"] == "1"
+
+def test_revocations_past_the_cap_widen_to_the_subject(token_cache):
+    tokens = [_token(sub) for sub in ("1", "2", "3")]
+    for token in tokens:
+        token_cache.revoke(VerifiedTokenCache.digest(token), decode_access_token(token))
+    # The oldest revocation became one for every token subject 1 held
+    assert len(token_cache._revoked_tokens) == 2
+    assert all(decode_access_token(token) is None for token in tokens)
+    assert decode_access_token(_token("1"))["sub"] == "1"
+
+def test_sync_applies_revocations_recorded_by_other_workers(run_db, monkeypatch, token_cache):
+    token = _token("1")
+    payload = decode_access_token(token)
+    digest = VerifiedTokenCache.digest(token)
+
+    async def test(session, sessions):
+        monkeypatch.setattr(security, "AsyncSessionLocal", sessions)
+        now = datetime.utcnow()
+        session.add_all([
+            RevokedToken(token_digest=digest, user_id="1", expires_at=datetime.utcfromtimestamp(payload["exp"]), revoked_at=now),
+            # Already expired: nothing left to reject
+            RevokedToken(token_digest="0" * 64, user_id="2", expires_at=now - timedelta(minutes=1), revoked_at=now)
+        ])
+        await session.commit()
+        sync = RevocationSync()
+        await sync.sync()
+        return sync
+
+    sync = run_db(test)
+    assert sync._synced_at is not None
+    assert token_cache.get(digest) is None
+    assert decode_access_token(token) is None
+    assert not token_cache.is_revoked("0" * 64)